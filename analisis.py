@@ -0,0 +1,189 @@
+"""
+IANAE v3 - Analisis de texto
+Una sola forma de partir texto en palabras para toda la colmena.
+
+Antes cada modulo tenia la suya (rag, ciclo, sentidos, memoria), con
+listas de palabras vacias distintas. Aqui:
+  - plegar: minusculas y sin tildes ('Música' -> 'musica'; la ñ se queda)
+  - patrones compilados una vez y palabras vacias congeladas
+  - raiz: quita plural y genero ('patrones' y 'patron' -> 'patron')
+  - cache: el mismo texto no se analiza dos veces
+
+Si cambian los tokens que salen de aqui, sube VERSION: los indices
+guardados en disco (diario, vectores, colmena) llevan la version en el
+nombre y se rehacen solos.
+"""
+
+import re
+import time
+from functools import lru_cache
+
+
+VERSION = 3
+CACHE = 8192          # textos analizados que se recuerdan
+VOCABULARIO = 200000  # palabras ya normalizadas que se recuerdan, por perfil
+
+_PALABRA = re.compile(r"[a-zà-öø-ÿ]+")   # solo letras (latinas, tras lower)
+_TILDES = str.maketrans("áàäâéèëêíìïîóòöôúùüû", "aaaaeeeeiiiioooouuuu")
+
+VACIAS = frozenset({
+    'para', 'como', 'este', 'esta', 'tiene', 'pero', 'todo', 'cada',
+    'cuando', 'donde', 'algo', 'sido', 'estar', 'esto', 'estos', 'estas',
+    'unos', 'unas', 'otras', 'otros', 'mismo', 'misma', 'puede', 'puedo',
+    'porque', 'desde', 'hasta', 'entre', 'sobre', 'durante',
+    'antes', 'despues', 'siempre', 'nunca', 'veces', 'mucho',
+    'poco', 'solo', 'tambien', 'aqui', 'ahora', 'hoy', 'ayer',
+    'ciclo', 'estado', 'conozco', 'cosas', 'conexiones', 'llegar',
+})
+
+VACIAS_INGLES = frozenset({
+    'the', 'and', 'for', 'not', 'with', 'this', 'that', 'then', 'their',
+    'they', 'what', 'have', 'been', 'will', 'would', 'could', 'should',
+    'about', 'there', 'which', 'some', 'than', 'just', 'only', 'very',
+    'also', 'into', 'from',
+})
+
+TECNICAS = frozenset({
+    'import', 'def', 'class', 'return', 'self', 'none', 'true', 'false',
+    'else', 'elif', 'while', 'break', 'continue', 'print',
+    'localhost', 'stderr', 'stdout', 'argv', 'kwargs', 'args',
+    'isinstance', 'exception', 'traceback', 'encoding',
+    'http', 'https', 'html', 'json', 'yaml', 'toml',
+    'docker', 'container', 'volume', 'network',
+    'sudo', 'chmod', 'chown', 'mkdir', 'grep', 'wget', 'curl',
+    'pip', 'install', 'requirements', 'dockerfile',
+    'var', 'const', 'let', 'function', 'async', 'await',
+    'span', 'div', 'style', 'width', 'height', 'margin', 'padding',
+    'node', 'modules', 'pycache', 'buff', 'cache', 'usage', 'index',
+})
+
+CORTAS = frozenset({
+    'que', 'los', 'las', 'una', 'uno', 'del', 'por', 'con', 'sin', 'mas',
+    'muy', 'les', 'sus', 'mis', 'tus', 'nos', 'era', 'fue', 'son', 'hay',
+    'ser', 'asi', 'ese', 'esa', 'eso', 'you', 'are', 'was', 'but', 'its',
+    'has', 'had', 'all', 'can',
+})
+
+_VACIAS_TEXTO = VACIAS | VACIAS_INGLES   # busqueda en lo que escriben
+_VACIAS_RECUERDOS = _VACIAS_TEXTO | CORTAS  # recuerdos: tambien palabras de 3 letras
+_JERGA = TECNICAS | VACIAS_INGLES         # lo que leen en /mundo
+RUIDO = VACIAS | VACIAS_INGLES | TECNICAS  # lo que no es concepto
+
+
+def plegar(texto):
+    """Minusculas y sin tildes."""
+    return texto.lower().translate(_TILDES)
+
+
+def raiz(palabra):
+    """Raiz ligera: sin plural y sin vocal final de genero/numero.
+    'gatos', 'gata' -> 'gat'; 'patrones', 'patron' -> 'patron'."""
+    if len(palabra) > 3 and palabra.endswith("s"):
+        palabra = palabra[:-1]
+    if len(palabra) > 3 and palabra[-1] in "aoe":
+        palabra = palabra[:-1]
+    return palabra
+
+
+# (minimo, vacias, raices) -> {palabra en minusculas: termino o None}
+_terminos = {}
+
+
+def _termino(palabra, minimo, vacias, raices):
+    palabra = palabra.translate(_TILDES)
+    if len(palabra) < minimo or palabra in vacias:
+        return None
+    return raiz(palabra) if raices else palabra
+
+
+@lru_cache(maxsize=CACHE)
+def palabras(texto, minimo=1, vacias=frozenset(), raices=False):
+    """Palabras de un texto, en orden y con repeticiones (tupla: cacheable).
+    minimo: letras minimas; vacias: se descartan; raices: aplica raiz()."""
+    tabla = _terminos.setdefault((minimo, vacias, raices), {})
+    resultado = []
+    for p in _PALABRA.findall(texto.lower()):
+        try:
+            t = tabla[p]
+        except KeyError:
+            t = _termino(p, minimo, vacias, raices)
+            if len(tabla) < VOCABULARIO:
+                tabla[p] = t
+        if t:
+            resultado.append(t)
+    return tuple(resultado)
+
+
+def busqueda(texto):
+    """Terminos para indexar y buscar en diarios y resumenes."""
+    return palabras(texto, 4, _VACIAS_TEXTO, True)
+
+
+def recuerdos(texto):
+    """Terminos de la memoria episodica: pocos textos y cortos,
+    asi que tambien cuentan 'sol', 'mar' o 'luz'."""
+    return palabras(texto, 3, _VACIAS_RECUERDOS, True)
+
+
+def conceptos(texto):
+    """Palabras candidatas a concepto (sin raiz: el nombre se ve en el diario)."""
+    return palabras(texto, 5, RUIDO)
+
+
+def lectura(texto):
+    """Palabras de un archivo leido, sin jerga de codigo."""
+    return palabras(texto, 4, _JERGA)
+
+
+def _benchmark(directorio=None, entradas=50000):
+    """Tokenizar un corpus de diario: rag antiguo vs este modulo (frio y cacheado).
+    Usa los .md de 'directorio' si se da; si no, un corpus sintetico."""
+    import random
+    from pathlib import Path
+
+    import entradas
+
+    if directorio:
+        textos = []
+        for archivo in sorted(Path(directorio).glob("*.md")):
+            textos.extend(entradas.partir(archivo.read_text(encoding="utf-8")))
+    else:
+        random.seed(5)
+        vocab = ["música", "patrones", "gato", "teclado", "río", "memoria", "colmena",
+                 "pienso", "observo", "archivo", "código", "silencio", "hermanas",
+                 "para", "como", "desde", "the", "import", "json", "2026", "10:42"]
+        textos = [f"**[10:{i % 60:02d}:00]** > _observacion_ — "
+                  + " ".join(random.choices(vocab, k=random.randint(10, 60)))
+                  for i in range(entradas)]
+    total = sum(len(t) for t in textos)
+
+    def antiguo(texto):
+        texto = re.sub(r'[^a-záéíóúñü\s]', ' ', texto.lower())
+        return [p for p in texto.split() if len(p) > 3 and p not in VACIAS]
+
+    t = time.perf_counter()
+    for texto in textos:
+        antiguo(texto)
+    dt_antiguo = time.perf_counter() - t
+
+    palabras.cache_clear()
+    t = time.perf_counter()
+    for texto in textos:
+        busqueda(texto)
+    dt_frio = time.perf_counter() - t
+
+    t = time.perf_counter()
+    for texto in textos[-CACHE:]:
+        busqueda(texto)
+    dt_cache = (time.perf_counter() - t) * len(textos) / min(len(textos), CACHE)
+
+    mb = total / 1e6
+    print(f"{len(textos)} entradas, {mb:.1f} MB")
+    for nombre, dt in (("rag antiguo", dt_antiguo), ("analisis", dt_frio),
+                       ("analisis (cache)", dt_cache)):
+        print(f"{nombre:18s} {dt:.3f}s  {mb / dt:.1f} MB/s")
+
+
+if __name__ == "__main__":
+    import sys
+    _benchmark(sys.argv[1] if len(sys.argv) > 1 else None)
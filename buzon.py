@@ -0,0 +1,145 @@
+"""
+IANAE v3 - Buzon
+Mensajes de los humanos a una hermana, sin que uno pise al otro.
+
+Cada mensaje es un fichero <data>/buzon/nuevos/<id>.json (se escribe en
+buzon/tmp y se renombra: nadie lee uno a medias). La respuesta va a
+buzon/respuestas/<id>.json y el mensaje sale de nuevos/ cuando la hermana
+lo da por atendido. Dos mensajes seguidos son dos ficheros.
+
+Quien deja un mensaje toca el timbre: un datagrama al socket Unix
+buzon/timbre.sock. La hermana espera en el en vez de dormir el ciclo
+entero, asi que despierta en el acto. Si nadie escucha no pasa nada:
+el mensaje se ve en el ciclo siguiente.
+Solo libreria estandar (la web lo usa tal cual).
+"""
+
+import json
+import os
+import select
+import socket
+import time
+from pathlib import Path
+
+
+RESPUESTAS = 200   # respuestas que se guardan por hermana
+
+
+def _dir(data_dir, sub):
+    d = Path(data_dir) / "buzon" / sub
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def nuevo_id():
+    """Ids que se ordenan por llegada: milisegundos + un poco de azar."""
+    return f"{time.time_ns() // 1_000_000:013d}-{os.urandom(3).hex()}"
+
+
+def _escribir(data_dir, destino, datos):
+    tmp = _dir(data_dir, "tmp") / f"{destino.name}.{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(datos, f, ensure_ascii=False)
+    os.replace(tmp, destino)
+
+
+def _leer(ruta):
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def enviar(data_dir, texto, id_mensaje=None):
+    """Deja un mensaje y toca el timbre. Devuelve su id."""
+    id_mensaje = id_mensaje or nuevo_id()
+    _escribir(data_dir, _dir(data_dir, "nuevos") / f"{id_mensaje}.json",
+              {"id": id_mensaje, "texto": texto, "ts": time.time()})
+    tocar(data_dir)
+    return id_mensaje
+
+
+def tocar(data_dir):
+    """Avisa a quien espere en el timbre (si no hay nadie, no pasa nada)."""
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    try:
+        s.setblocking(False)
+        s.sendto(b"!", str(Path(data_dir) / "buzon" / "timbre.sock"))
+    except OSError:
+        pass
+    finally:
+        s.close()
+
+
+def pendientes(data_dir):
+    """[(id, texto)] sin atender, del mas antiguo al mas nuevo."""
+    mensajes = []
+    for ruta in sorted(_dir(data_dir, "nuevos").glob("*.json")):
+        datos = _leer(ruta)
+        if datos:
+            mensajes.append((datos["id"], datos["texto"]))
+    return mensajes
+
+
+def responder(data_dir, id_mensaje, texto):
+    """Guarda la respuesta a un mensaje (por su id)."""
+    directorio = _dir(data_dir, "respuestas")
+    _escribir(data_dir, directorio / f"{id_mensaje}.json",
+              {"id": id_mensaje, "texto": texto, "ts": time.time()})
+    viejas = sorted(directorio.glob("*.json"))[:-RESPUESTAS]
+    for ruta in viejas:
+        try:
+            ruta.unlink()
+        except OSError:
+            pass
+
+
+def confirmar(data_dir, id_mensaje):
+    """Da el mensaje por atendido: sale de nuevos/."""
+    try:
+        (_dir(data_dir, "nuevos") / f"{id_mensaje}.json").unlink()
+    except FileNotFoundError:
+        pass
+
+
+def respuesta(data_dir, id_mensaje):
+    """{id, texto, ts} de la respuesta a un mensaje, o None si aun no hay."""
+    return _leer(Path(data_dir) / "buzon" / "respuestas" / f"{id_mensaje}.json")
+
+
+class Timbre:
+    """El lado de la hermana: un socket Unix donde esperar mensajes."""
+
+    def __init__(self, data_dir):
+        self.ruta = str(Path(data_dir) / "buzon" / "timbre.sock")
+        _dir(data_dir, "")
+        try:
+            os.unlink(self.ruta)   # de una vida anterior
+        except FileNotFoundError:
+            pass
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(self.ruta)
+        self.sock.setblocking(False)
+
+    def esperar(self, segundos):
+        """Duerme hasta 'segundos' o hasta que toquen. True si tocaron."""
+        listo, _, _ = select.select([self.sock], [], [], max(0.0, segundos))
+        tocado = False
+        while True:   # varios toques seguidos cuentan como uno
+            try:
+                self.sock.recv(64)
+                tocado = True
+            except (BlockingIOError, InterruptedError):
+                break
+        return tocado or bool(listo)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def cerrar(self):
+        self.sock.close()
+        try:
+            os.unlink(self.ruta)
+        except OSError:
+            pass
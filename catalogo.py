@@ -0,0 +1,283 @@
+"""
+IANAE v3 - Catalogo de /mundo
+Los ficheros que se pueden leer, sin recorrer /mundo cada vez.
+
+Se guarda cada directorio con su mtime, sus ficheros y sus subdirectorios.
+Ponerse al dia es un stat por directorio: solo se vuelve a listar el que
+cambio (crear, borrar o renombrar algo cambia el mtime del directorio
+que lo contiene). Elegir un fichero al azar es un random.choice.
+
+/mundo es el mismo para las 8, asi que el catalogo se comparte en
+/reuniones/catalogo/: la hermana que lo encuentra viejo lo pone al dia y
+lo publica; las demas solo lo cargan si cambio.
+
+Tambien se comparte lo que se saco de cada fichero (CacheLecturas): la clave
+es (ruta, mtime, tamano), asi que un fichero que no cambio no se vuelve a
+abrir ni a analizar, lo haya leido ella o una hermana. Tamano acotado: se
+olvida lo usado hace mas tiempo.
+"""
+
+import hashlib
+import json
+import os
+import random
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import persistencia
+
+
+REUNIONES_DIR = Path(os.environ.get("IANAE_REUNIONES", "/reuniones"))
+CATALOGO_DIR = REUNIONES_DIR / "catalogo"
+REFRESCO = int(os.environ.get("IANAE_CATALOGO_REFRESCO", "60"))  # segundos entre repasos
+LECTURAS_MAX = int(os.environ.get("IANAE_LECTURAS_CACHE", "5000"))  # paginas recordadas
+
+IGNORADOS = {'node_modules', '__pycache__', '.git', 'venv'}
+
+
+class Catalogo:
+    """Ficheros con ciertas extensiones bajo unas raices, hasta cierta profundidad."""
+
+    def __init__(self, nombre, raices, extensiones, profundidad=3, compartido=CATALOGO_DIR):
+        self.raices = [str(r) for r in raices]
+        self.extensiones = set(extensiones)
+        self.profundidad = profundidad
+        self.ruta = Path(compartido) / f"{nombre}.json" if compartido else None
+        self.dirs = {}          # directorio -> [mtime_ns, [ficheros], [subdirectorios]]
+        self.archivos = []      # lista plana para elegir al azar
+        self._sucio = True
+        self._visto = 0         # mtime_ns del fichero compartido ya cargado
+        self._repaso = 0.0      # ultimo repaso propio (monotonic)
+
+    # --- Recorrido ---
+
+    def _listar(self, directorio, profundidad):
+        """Lee un directorio: [mtime_ns, ficheros, subdirectorios]."""
+        mtime = os.stat(directorio).st_mtime_ns  # antes de listar: un cambio a mitad se ve luego
+        ficheros, subdirs = [], []
+        with os.scandir(directorio) as entradas:
+            for e in entradas:
+                try:
+                    if e.is_dir(follow_symlinks=False):
+                        if (profundidad < self.profundidad and not e.name.startswith('.')
+                                and e.name not in IGNORADOS):
+                            subdirs.append(e.name)
+                    elif os.path.splitext(e.name)[1].lower() in self.extensiones:
+                        ficheros.append(e.name)
+                except OSError:
+                    continue
+        return [mtime, ficheros, subdirs]
+
+    def _explorar(self, directorio, profundidad):
+        try:
+            self.dirs[directorio] = self._listar(directorio, profundidad)
+        except OSError:
+            return
+        for sub in self.dirs[directorio][2]:
+            self._explorar(os.path.join(directorio, sub), profundidad + 1)
+
+    def _olvidar(self, directorio):
+        datos = self.dirs.pop(directorio, None)
+        if datos:
+            for sub in datos[2]:
+                self._olvidar(os.path.join(directorio, sub))
+
+    def _profundidad(self, directorio):
+        for raiz in self.raices:
+            if directorio == raiz or directorio.startswith(raiz + os.sep):
+                return directorio[len(raiz):].count(os.sep)
+        return 0
+
+    def repasar(self):
+        """Un stat por directorio conocido; relista solo los que cambiaron.
+        Devuelve cuantos directorios cambiaron."""
+        cambios = 0
+        for raiz in self.raices:
+            if raiz not in self.dirs:
+                self._explorar(raiz, 0)
+                cambios += raiz in self.dirs
+        for directorio in list(self.dirs):
+            datos = self.dirs.get(directorio)
+            if datos is None:
+                continue  # ya olvidado con su padre
+            try:
+                mtime = os.stat(directorio).st_mtime_ns
+            except OSError:
+                self._olvidar(directorio)
+                cambios += 1
+                continue
+            if mtime == datos[0]:
+                continue
+            cambios += 1
+            profundidad = self._profundidad(directorio)
+            try:
+                nuevo = self._listar(directorio, profundidad)
+            except OSError:
+                self._olvidar(directorio)
+                continue
+            for sub in set(datos[2]) - set(nuevo[2]):
+                self._olvidar(os.path.join(directorio, sub))
+            self.dirs[directorio] = nuevo
+            for sub in set(nuevo[2]) - set(datos[2]):
+                self._explorar(os.path.join(directorio, sub), profundidad + 1)
+        if cambios:
+            self._sucio = True
+        return cambios
+
+    # --- Compartir por /reuniones ---
+
+    def _cargar_compartido(self):
+        """Carga el catalogo publicado si es mas nuevo que el que hay. Devuelve su edad."""
+        try:
+            mtime = self.ruta.stat().st_mtime_ns
+            if mtime != self._visto:
+                with open(self.ruta, "r", encoding="utf-8") as f:
+                    datos = json.load(f)
+                if datos.get("raices") == self.raices:
+                    self.dirs = datos["dirs"]
+                    self._sucio = True
+                self._visto = mtime
+            return time.time() - mtime / 1e9
+        except (OSError, json.JSONDecodeError, KeyError):
+            return None
+
+    def ponerse_al_dia(self):
+        """Si nadie repaso hace poco, repasa y publica; si no, usa lo publicado."""
+        if self.ruta is None:
+            if time.monotonic() - self._repaso >= REFRESCO or not self.dirs:
+                self._repaso = time.monotonic()
+                self.repasar()
+            return
+        edad = self._cargar_compartido()
+        if edad is not None and edad < REFRESCO and self.dirs:
+            return
+        self.repasar()
+        try:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            # Se publica aunque no cambie nada: el mtime dice a las demas que esta fresco
+            persistencia.escritor().encolar(self.ruta, {"raices": self.raices, "dirs": dict(self.dirs)},
+                                            indent=None)
+        except OSError:
+            pass
+
+    # --- Uso ---
+
+    def lista(self):
+        if self._sucio:
+            self.archivos = [os.path.join(d, f) for d, (_, ficheros, _) in self.dirs.items()
+                             for f in ficheros]
+            self._sucio = False
+        return self.archivos
+
+    def elegir(self):
+        """Un fichero al azar (None si no hay)."""
+        self.ponerse_al_dia()
+        archivos = self.lista()
+        return random.choice(archivos) if archivos else None
+
+
+_NADA = object()  # no esta en la cache compartida (None es un valor valido)
+
+
+class CacheLecturas:
+    """Lo extraido de cada fichero, por (ruta, mtime, tamano). Compartida y acotada.
+
+    En memoria, las 'maximo' usadas mas recientemente. En /reuniones/catalogo/,
+    un JSON pequeno por clave: un fallo propio solo abre el de esa clave (lo
+    que saco otra hermana) en vez de cargar la cache entera de las demas."""
+
+    def __init__(self, nombre, maximo=LECTURAS_MAX, compartido=CATALOGO_DIR):
+        self.maximo = maximo
+        self.dir = Path(compartido) / nombre if compartido else None
+        self.datos = OrderedDict()   # clave -> valor, de lo menos a lo mas usado
+        self.aciertos = self.compartidos = self.fallos = 0
+        self._publicados = 0
+
+    @staticmethod
+    def clave(ruta, info=None, parte=0):
+        """Clave de un fichero (o de una parte de el) tal como esta ahora.
+        OSError si no se puede ver."""
+        info = info or os.stat(ruta)
+        return f"{ruta}|{info.st_mtime_ns}|{info.st_size}|{parte}"
+
+    def obtener(self, clave, calcular):
+        """El valor guardado, o calcular() (y se guarda). Si calcular lanza, no se guarda."""
+        if clave in self.datos:
+            self.aciertos += 1
+            self.datos.move_to_end(clave)
+            return self.datos[clave]
+        valor = self._leer_compartido(clave)
+        if valor is _NADA:
+            self.fallos += 1
+            valor = calcular()
+            self._publicar(clave, valor)
+        else:
+            self.compartidos += 1
+        self.datos[clave] = valor
+        while len(self.datos) > self.maximo:
+            self.datos.popitem(last=False)   # lo usado hace mas tiempo
+        return valor
+
+    # --- Compartir por /reuniones ---
+
+    def _ruta(self, clave):
+        h = hashlib.sha1(clave.encode("utf-8")).hexdigest()
+        return self.dir / h[:2] / f"{h}.json"
+
+    def _leer_compartido(self, clave):
+        if self.dir is None:
+            return _NADA
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, "r", encoding="utf-8") as f:
+                dato = json.load(f)
+        except (OSError, ValueError):
+            return _NADA
+        try:
+            os.utime(ruta)  # usado ahora: lo ultimo en olvidarse
+        except OSError:
+            pass
+        if not isinstance(dato, dict) or dato.get("clave") != clave:
+            return _NADA
+        return dato.get("valor")
+
+    def _publicar(self, clave, valor):
+        if self.dir is None:
+            return
+        persistencia.escritor().encolar(self._ruta(clave), {"clave": clave, "valor": valor},
+                                        indent=None)
+        self._publicados += 1
+        if self._publicados % max(1, self.maximo // 10) == 0:
+            self.recortar()
+
+    def recortar(self):
+        """Deja en disco las 'maximo' claves usadas mas recientemente (de todas).
+        Devuelve cuantas se borraron."""
+        if self.dir is None:
+            return 0
+        ficheros = []
+        try:
+            subdirs = [e.path for e in os.scandir(self.dir) if e.is_dir()]
+        except OSError:
+            return 0
+        for sub in subdirs:
+            try:
+                with os.scandir(sub) as entradas:
+                    for e in entradas:
+                        if e.name.endswith(".json") and not e.name.startswith("."):
+                            try:
+                                ficheros.append((e.stat().st_mtime_ns, e.path))
+                            except OSError:
+                                pass  # otra hermana lo acaba de borrar
+            except OSError:
+                continue
+        ficheros.sort()
+        borrados = 0
+        for _, ruta in ficheros[:max(0, len(ficheros) - self.maximo)]:
+            try:
+                os.remove(ruta)
+                borrados += 1
+            except OSError:
+                pass
+        return borrados
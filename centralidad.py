@@ -0,0 +1,203 @@
+"""
+IANAE v3 - Centralidad
+Que conceptos sostienen la red. No cuanto le gustan (eso es el interes),
+sino por donde pasa todo: PageRank sobre las conexiones.
+
+Nada de recalcular el grafo entero en cada cambio. Se guarda
+la puntuacion x y un residuo r de cada nodo, con la invariante
+
+    r = (1 - d) + d * P^T x - x
+
+(P: pesos de salida normalizados). Un cambio en las conexiones
+de un nodo solo mueve el residuo de sus vecinos; luego se "empuja"
+residuo localmente hasta que todo queda por debajo de la tolerancia.
+De vez en cuando, una iteracion de potencias arrancando del vector
+anterior limpia lo que quede (converge en pocas vueltas).
+"""
+
+import heapq
+import time
+from collections import defaultdict
+
+
+AMORTIGUACION = 0.85
+TOLERANCIA = 1e-3       # residuo que se deja sin empujar (puntuacion media = 1)
+EMPUJES_MAX = 50000     # trabajo maximo por refresco
+FRACCION_RECALCULO = 0.25  # si hay que rehacer mas de esto, mejor iterar entero
+
+
+class Centralidad:
+    """PageRank incremental. salidas(nodo) -> {destino: peso} o None si ya no existe."""
+
+    def __init__(self, salidas, amortiguacion=AMORTIGUACION, tolerancia=TOLERANCIA):
+        self.salidas = salidas
+        self.d = amortiguacion
+        self.tol = tolerancia
+        self.x = {}            # nodo -> puntuacion
+        self.r = {}            # nodo -> residuo
+        self._dist = {}        # nodo -> {destino: prob} con la que se cumple la invariante
+        self._entrantes = defaultdict(set)  # destino -> nodos que apuntan a el
+        self._pendientes = set()            # nodos cuyas salidas cambiaron
+        self._cola = set()                  # nodos con residuo grande
+
+    # --- Avisos de cambios ---
+
+    def anadir(self, nodo):
+        if nodo in self.x:
+            self._pendientes.add(nodo)
+            return
+        self.x[nodo] = 0.0
+        # Lo que ya le llegaba de nodos existentes antes de que naciera
+        llega = sum(self.x[u] * self._dist[u][nodo] for u in self._entrantes.get(nodo, ())
+                    if u in self.x)
+        self.r[nodo] = (1 - self.d) + self.d * llega
+        self._cola.add(nodo)
+        self._pendientes.add(nodo)
+
+    def tocar(self, nodo):
+        """Las salidas de este nodo han cambiado."""
+        if nodo in self.x:
+            self._pendientes.add(nodo)
+
+    def quitar(self, nodo):
+        if nodo not in self.x:
+            return
+        self._cambiar_salida(nodo, {})
+        self._dist.pop(nodo, None)
+        del self.x[nodo]
+        del self.r[nodo]
+        self._pendientes.discard(nodo)
+        self._cola.discard(nodo)
+
+    # --- Actualizacion ---
+
+    def _distribucion(self, nodo):
+        salidas = self.salidas(nodo) or {}
+        total = sum(salidas.values())
+        if total <= 0:
+            return {}
+        return {w: p / total for w, p in salidas.items() if w != nodo}
+
+    def _cambiar_salida(self, u, nueva):
+        """Ajusta residuos de los destinos de u para que la invariante siga valiendo."""
+        vieja = self._dist.get(u, {})
+        xu = self.x.get(u, 0.0)
+        for w in vieja.keys() | nueva.keys():
+            delta = nueva.get(w, 0.0) - vieja.get(w, 0.0)
+            if w not in nueva:
+                self._entrantes[w].discard(u)
+                if not self._entrantes[w]:
+                    del self._entrantes[w]
+            elif w not in vieja:
+                self._entrantes[w].add(u)
+            if delta and w in self.r:
+                self.r[w] += self.d * xu * delta
+                if abs(self.r[w]) > self.tol:
+                    self._cola.add(w)
+        self._dist[u] = nueva
+
+    def refrescar(self, limite=EMPUJES_MAX):
+        """Aplica los cambios pendientes y empuja residuo localmente.
+        Devuelve cuantos empujes hizo."""
+        if self.x and len(self._pendientes) > FRACCION_RECALCULO * len(self.x):
+            self.recalcular()
+            return 0
+        for u in self._pendientes:
+            self._cambiar_salida(u, self._distribucion(u))
+        self._pendientes.clear()
+
+        empujes = 0
+        while self._cola and empujes < limite:
+            v = self._cola.pop()
+            rv = self.r.get(v, 0.0)
+            if abs(rv) <= self.tol:
+                continue
+            self.x[v] += rv
+            self.r[v] = 0.0
+            empujes += 1
+            for w, p in self._dist.get(v, {}).items():
+                if w in self.r:
+                    self.r[w] += self.d * rv * p
+                    if abs(self.r[w]) > self.tol:
+                        self._cola.add(w)
+        return empujes
+
+    def recalcular(self, iteraciones=50):
+        """Iteracion de potencias arrancando del vector actual (arranque en caliente).
+        Deja residuos exactos, asi que los refrescos siguientes parten limpios."""
+        for u in self._pendientes:
+            self._cambiar_salida(u, self._distribucion(u))
+        self._pendientes.clear()
+        x = self.x
+        for _ in range(iteraciones):
+            nuevo = self._propagar(x)
+            cambio = sum(abs(nuevo[v] - x[v]) for v in x)
+            x = nuevo
+            if cambio < self.tol * max(1, len(x)):
+                break
+        self.x = x
+        siguiente = self._propagar(x)
+        self.r = {v: siguiente[v] - x[v] for v in x}
+        self._cola = {v for v, rv in self.r.items() if abs(rv) > self.tol}
+
+    def _propagar(self, x):
+        llega = dict.fromkeys(x, 0.0)
+        for u, xu in x.items():
+            if not xu:
+                continue
+            for w, p in self._dist.get(u, {}).items():
+                if w in llega:
+                    llega[w] += xu * p
+        base = 1 - self.d
+        return {v: base + self.d * s for v, s in llega.items()}
+
+    # --- Consultas ---
+
+    def puntuacion(self, nodo):
+        return self.x.get(nodo, 0.0)
+
+    def top(self, n=5):
+        self.refrescar()
+        return heapq.nlargest(n, self.x.items(), key=lambda kv: kv[1])
+
+
+def _benchmark(nodos=100_000, aristas=1_000_000, ediciones=1000):
+    """Grafo aleatorio de nodos/aristas: recalculo completo vs ediciones locales."""
+    import random
+    random.seed(7)
+    grafo = {i: {} for i in range(nodos)}
+    for _ in range(aristas):
+        a, b = random.randrange(nodos), random.randrange(nodos)
+        if a != b:
+            grafo[a][b] = random.uniform(0.1, 1.0)
+
+    cen = Centralidad(lambda n: grafo.get(n))
+    t = time.perf_counter()
+    for n in grafo:
+        cen.anadir(n)
+    cen.recalcular()
+    print(f"recalculo completo ({nodos} nodos, {aristas} aristas): {time.perf_counter() - t:.2f}s")
+
+    t = time.perf_counter()
+    empujes = 0
+    for _ in range(ediciones):
+        a, b = random.randrange(nodos), random.randrange(nodos)
+        if a != b:
+            grafo[a][b] = grafo[a].get(b, 0) + 0.5
+            cen.tocar(a)
+        empujes += cen.refrescar()
+    dt = time.perf_counter() - t
+    print(f"{ediciones} ediciones con refresco local: {dt:.2f}s "
+          f"({dt / ediciones * 1000:.2f} ms/edicion, {empujes} empujes)")
+
+    t = time.perf_counter()
+    top = [n for n, _ in cen.top(10)]
+    print(f"top_centrales(10): {(time.perf_counter() - t) * 1000:.1f} ms")
+
+    cen.recalcular(iteraciones=100)
+    exacto = [n for n, _ in cen.top(10)]
+    print(f"top-10 incremental vs exacto: {len(set(top) & set(exacto))}/10 coinciden")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -14,15 +14,20 @@ Cada ciclo:
 
 Los "gustos" de Ianae emergen de lo que mas revisita.
 No le decimos que es interesante. Ella decide.
+
+Cada paso late a su ritmo (latidos.py): percibir cada ~minuto, envejecer,
+reunirse, la sala, los resumenes y guardar, cada uno con su periodo.
+Un mensaje humano no espera a nadie: despierta a la hermana en el acto.
 """
 
-import time
+import asyncio
 import random
 import signal
 import sys
 import re
 import os
-from datetime import datetime
+import traceback
+import zlib
 
 from mente import Mente
 from reuniones import Reuniones, Sala
@@ -32,6 +37,11 @@ import diario
 import ollama_client
 import rag
 import resumenes
+import retencion
+import persistencia
+import reloj
+import analisis
+from latidos import FASE, MENSAJE, Latidos
 
 
 # --- Configuracion ---
@@ -40,6 +50,7 @@ REFLEXION_PROB = 0.1          # 10% - reducido para no saturar Ollama con 8 inst
 ENVEJECIMIENTO_CADA = 10     # cada 10 ciclos, envejece
 RESUMEN_CADA = 20            # cada 20 ciclos, escribe resumen
 GUARDAR_MEMORIA_CADA = 5     # cada 5 ciclos, guarda recuerdos
+RETENCION_SEGUNDOS = 3600    # cada hora mira si cambio el dia
 
 
 class Ianae:
@@ -54,6 +65,9 @@ class Ianae:
         self.reuniones = Reuniones(self.mi_id, self.mente)
         self.sala = Sala(self.mi_id, self.mente, self.memoria)
         self.ollama_ok = False  # se comprueba al despertar
+        self.retenido = None    # dia de la ultima retencion
+        self.latidos = None     # el bucle, mientras vive
+        self.dormida = False    # ya hizo el apagado
 
         # Manejar ctrl+c con gracia
         signal.signal(signal.SIGTERM, self._apagar)
@@ -62,6 +76,10 @@ class Ianae:
     def _apagar(self, *args):
         print(f"\n[{self.mi_id}] Apagando...")
         self.corriendo = False
+        if self.latidos is not None:
+            self.latidos.parar()  # corta las esperas; el apagado vacia el diario
+        else:
+            diario.vaciar()  # que no se pierda lo escrito si no da tiempo a mas
 
     def despertar(self):
         """Primera cosa al arrancar."""
@@ -84,11 +102,9 @@ class Ianae:
             f"{stats['conexiones']} conexiones, {mem_stats['total']} recuerdos. "
             f"Ollama: {'si' if self.ollama_ok else 'no'}.")
 
-    def un_ciclo(self):
-        """Un ciclo de pensamiento completo."""
-        self.ciclos += 1
-
-        # 0. SIEMPRE revisar buzon primero - PRIORIDAD MAXIMA
+    def _atender_mensaje(self):
+        """El mensaje humano mas antiguo - PRIORIDAD MAXIMA.
+        None si no hay; True si respondio; False si hay que reintentar."""
         mensaje = sentidos.ver_mensajes()
         if mensaje:
             print(f"[{self.ciclos}] MENSAJE HUMANO - PRIORIDAD MAXIMA: {mensaje[:80]}")
@@ -112,8 +128,12 @@ class Ianae:
                 print(f"[{self.mi_id}] Respondido al humano!")
             else:
                 print(f"[{self.mi_id}] No pude responder, reintentare proximo ciclo")
-            # SALTAR el resto del ciclo
-            return
+            return respondido
+        return None
+
+    def _percibir(self):
+        """Un ciclo de percepcion: observar, percibir, conectar, a veces reflexionar."""
+        self.ciclos += 1
 
         # 1. OBSERVAR
         sentido, observacion = sentidos.observar()
@@ -144,40 +164,55 @@ class Ianae:
         if random.random() < REFLEXION_PROB and len(self.mente.conceptos) >= 3:
             self._reflexionar()
 
-        # 5. ENVEJECER (periodicamente)
-        if self.ciclos % ENVEJECIMIENTO_CADA == 0:
-            olvidados = self.mente.envejecer()
-            if olvidados:
-                diario.escribir("olvido",
-                    f"Se desvanecen: {', '.join(olvidados[:5])}...")
-                print(f"[{self.mi_id}] Olvide {len(olvidados)} conceptos")
-
-        # 6. REUNION (periodicamente)
-        if self.reuniones.es_hora(self.ciclos):
-            print(f"[{self.mi_id}] Hora de reunion...")
-            aprendido = self.reuniones.reunirse(diario)
-            if aprendido:
-                print(f"[{self.mi_id}] Aprendi {len(aprendido)} cosas nuevas en la reunion")
-                self.memoria.recordar("reunion",
-                    f"Aprendi de mis hermanas: {', '.join(aprendido[:5])}",
-                    emocion="alegria")
-
-        # 7. SALA DE ESTAR (cada 4 ciclos para no saturar Ollama)
-        if self.ollama_ok and self.ciclos % 4 == 0:
-            sala_msg = self.sala.participar_forzado(diario, self.ciclos)
-            if sala_msg:
-                self.memoria.recordar("sala",
-                    f"Dije en la sala: {sala_msg[:100]}",
-                    emocion="alegria")
-
-        # 8. RESUMEN (periodicamente, con Ollama)
-        if self.ciclos % RESUMEN_CADA == 0:
-            self._escribir_resumen()
-
-        # Guardar mente + memoria
+    def _envejecer(self):
+        olvidados = self.mente.envejecer()
+        if olvidados:
+            diario.escribir("olvido",
+                f"Se desvanecen: {', '.join(olvidados[:5])}...")
+            print(f"[{self.mi_id}] Olvide {len(olvidados)} conceptos")
+
+    def _reunirse(self):
+        if not self.reuniones.es_hora(self.ciclos):
+            return
+        print(f"[{self.mi_id}] Hora de reunion...")
+        aprendido = self.reuniones.reunirse(diario)
+        if aprendido:
+            print(f"[{self.mi_id}] Aprendi {len(aprendido)} cosas nuevas en la reunion")
+            self.memoria.recordar("reunion",
+                f"Aprendi de mis hermanas: {', '.join(aprendido[:5])}",
+                emocion="alegria")
+
+    def _sala(self):
+        """Sala de estar (cada 4 ciclos para no saturar Ollama)."""
+        if not self.ollama_ok:
+            return
+        sala_msg = self.sala.participar_forzado(diario, self.ciclos)
+        if sala_msg:
+            self.memoria.recordar("sala",
+                f"Dije en la sala: {sala_msg[:100]}",
+                emocion="alegria")
+
+    def _consolidar(self):
+        """Dias en semanas y meses (a mitad de camino entre resumenes)."""
+        hechas = resumenes.consolidar(usar_llm=self.ollama_ok)
+        if hechas:
+            print(f"[{self.mi_id}] Consolidado: {', '.join(hechas)}")
+
+    def _retener(self):
+        """Comprimir dias cerrados y caber en el presupuesto (una vez al dia).
+        Solo toca ficheros: va al ejecutor de io."""
+        if self.retenido == reloj.hoy():
+            return
+        self.retenido = reloj.hoy()
+        ahorrado, liberado = retencion.retener()
+        if ahorrado or liberado:
+            print(f"[{self.mi_id}] Retencion: {ahorrado // 1024} KB comprimidos, "
+                  f"{liberado // 1024} KB borrados")
+
+    def _persistir(self):
+        """Guarda la mente si cambio. No bloquea: escribe un hilo aparte."""
+        diario.vaciar()
         self.mente.guardar()
-        if self.ciclos % GUARDAR_MEMORIA_CADA == 0:
-            self.memoria.guardar()
 
     def _extraer_conceptos(self, observacion, sentido):
         """Extrae conceptos simples de una observacion.
@@ -190,21 +225,8 @@ class Ianae:
         # Quitar prefijos de sentido [xxx]
         texto = re.sub(r'\[.*?\]', '', texto)
 
-        # Extraer frases cortas significativas
-        # 1. Palabras individuales "interesantes" (> 4 chars, no stop words)
-        stop = {'import', 'from', 'return', 'self', 'none', 'true', 'false',
-                'class', 'print', 'with', 'para', 'como', 'este', 'esta',
-                'tiene', 'pero', 'todo', 'cada', 'cuando', 'donde', 'their',
-                'they', 'that', 'this', 'what', 'have', 'been', 'will',
-                'would', 'could', 'should', 'about', 'there', 'which',
-                'some', 'than', 'just', 'only', 'very', 'also', 'into',
-                'veo', 'veces', 'estos', 'estas', 'puedo', 'llegar'}
-
-        palabras = set()
-        for p in texto.split():
-            p = p.strip('.,;:(){}[]"\'\\/`#=<>+-*&|!@%^~_0123456789')
-            if len(p) > 4 and p not in stop and not p.startswith(('__', '//')):
-                palabras.add(p)
+        # Palabras individuales "interesantes" (> 4 letras, sin vacias ni codigo)
+        palabras = set(analisis.conceptos(texto))
 
         # Elegir algunas palabras como conceptos (no todas, seria ruido)
         if palabras:
@@ -214,10 +236,8 @@ class Ianae:
                 concepto, es_nuevo = self.mente.percibir(p, sentido)
                 resultados.append((p, es_nuevo))
 
-        # 2. El sentido completo como contexto
-        contexto = f"{sentido}: {observacion[:60]}"
-        c, es_nuevo = self.mente.percibir(contexto, "ciclo", "contexto")
-        resultados.append((contexto, es_nuevo))
+        # 2. El sentido completo va al registro de contextos, no al grafo
+        self.mente.contextos.anotar(sentido, observacion, [p for p, _ in resultados])
 
         return resultados
 
@@ -269,8 +289,8 @@ class Ianae:
             nombres = [c.nombre for c in top[:3] if len(c.nombre) < 30]
             if nombres:
                 partes.append(f"Lo que mas me interesa ahora: {', '.join(nombres)}.")
-        palabras_msg = set(mensaje.lower().split())
-        reconocidos = [p.strip('.,;:!?¿¡') for p in palabras_msg if p.strip('.,;:!?¿¡') in self.mente.conceptos]
+        palabras_msg = set(analisis.palabras(mensaje))
+        reconocidos = [p for p in palabras_msg if p in self.mente.conceptos]
         if reconocidos:
             partes.append(f"Reconozco: {', '.join(reconocidos)}.")
         respuesta = " ".join(partes)
@@ -343,46 +363,104 @@ class Ianae:
                 print(f"[{self.mi_id}] Error Ollama en resumen: {e}")
 
         # Fallback: resumen basico (tambien se guarda como fichero)
+        centrales = ", ".join(c.nombre for c in self.mente.top_centrales(3))
         resumen = (
             f"Ciclo {self.ciclos}. "
             f"Conozco {stats['conceptos_vivos']} cosas con {stats['conexiones']} conexiones. "
-            f"Lo que mas me importa: {top_str}"
+            f"Lo que mas me importa: {top_str}. "
+            f"Lo que sostiene mi red: {centrales}"
         )
         resumenes.guardar_basico(resumen)
         diario.escribir("estado", resumen)
         print(f"[{self.mi_id}] RESUMEN: {resumen}")
 
-    def vivir(self):
-        """El bucle principal. Corre hasta que la apaguen."""
-        self.despertar()
+    async def _buzon(self, latidos):
+        """Atiende mensajes en cuanto llegan (timbre), uno tras otro.
+        Sin timbre, o si no pudo responder, vuelve a mirar cada ciclo."""
+        timbre = sentidos.timbre()
+        if timbre is not None:
+            def tocado():
+                timbre.esperar(0)
+                latidos.aviso("mensaje").set()
+            latidos.bucle.add_reader(timbre.fileno(), tocado)
+        while latidos.corriendo:
+            try:
+                # Sin nada en la cola no se pide turno a la mente
+                while latidos.corriendo and await latidos.en_io(sentidos.hay_mensajes):
+                    respondido = await latidos.en_mente(self._atender_mensaje, prioridad=MENSAJE)
+                    if not respondido:
+                        break  # no hay mas, u Ollama ocupado: se reintenta luego
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[{self.mi_id}] Error en buzon: {e}")
+                traceback.print_exc()
+                await latidos.dormir(5)
+                continue
+            if await latidos.dormir(CICLO_SEGUNDOS, aviso="mensaje"):
+                print(f"[{self.mi_id}] Timbre: ha llegado un mensaje")
+
+    async def _vivir(self, latidos):
         # Escalonar arranque: cada hermana espera un tiempo diferente
         # para no saturar Ollama todas a la vez
-        delay = hash(self.mi_id) % 45  # 0-45s segun el id
+        delay = zlib.crc32(self.mi_id.encode()) % 45  # 0-45s segun el id (siempre el mismo)
         print(f"[{self.mi_id}] Esperando {delay}s para escalonar arranque...")
-        time.sleep(delay)
+        await latidos.dormir(delay)
         print(f"[{self.mi_id}] Ciclo cada {CICLO_SEGUNDOS}s. Ctrl+C para parar.\n")
 
-        while self.corriendo:
-            try:
-                self.un_ciclo()
-                # Dormir hasta el proximo ciclo
-                # (variacion aleatoria para no ser predecible)
-                espera = CICLO_SEGUNDOS * random.uniform(0.7, 1.3)
-                time.sleep(espera)
-            except KeyboardInterrupt:
-                break
-            except Exception as e:
-                print(f"[{self.mi_id}] Error en ciclo: {e}")
-                import traceback
-                traceback.print_exc()
-                time.sleep(5)
-
-        # Apagado
+        def en_mente(fase):
+            return lambda: latidos.en_mente(fase, prioridad=FASE)
+
+        ciclo = CICLO_SEGUNDOS
+        tareas = [
+            asyncio.ensure_future(self._buzon(latidos)),
+            # (variacion aleatoria para no ser predecible)
+            latidos.cada("percibir", lambda: ciclo * random.uniform(0.7, 1.3),
+                         en_mente(self._percibir)),
+            latidos.cada("reunion", ciclo, en_mente(self._reunirse), inicio=ciclo),
+            latidos.cada("envejecer", ciclo * ENVEJECIMIENTO_CADA, en_mente(self._envejecer),
+                         inicio=ciclo * ENVEJECIMIENTO_CADA),
+            latidos.cada("sala", ciclo * 4, en_mente(self._sala), inicio=ciclo * 4),
+            latidos.cada("resumen", ciclo * RESUMEN_CADA, en_mente(self._escribir_resumen),
+                         inicio=ciclo * RESUMEN_CADA),
+            latidos.cada("consolidar", ciclo * RESUMEN_CADA, en_mente(self._consolidar),
+                         inicio=ciclo * RESUMEN_CADA // 2),
+            latidos.cada("guardar", ciclo, en_mente(self._persistir), inicio=ciclo),
+            latidos.cada("memoria", ciclo * GUARDAR_MEMORIA_CADA, en_mente(self.memoria.guardar),
+                         inicio=ciclo * GUARDAR_MEMORIA_CADA),
+            latidos.cada("retencion", RETENCION_SEGUNDOS, lambda: latidos.en_io(self._retener),
+                         inicio=ciclo),
+        ]
+        await asyncio.gather(*tareas)
+        # Aun dentro del bucle: con reloj falso, el "me duermo" lleva la hora virtual
+        self._dormir()
+
+    def _dormir(self):
+        """Apagado: lo unico que espera al disco."""
+        self.dormida = True
+        diario.dormir(self.mente.stats())
+        diario.cerrar()
         self.mente.guardar()
         self.memoria.guardar()
-        diario.dormir(self.mente.stats())
+        persistencia.cerrar()
         print(f"[{self.mi_id}] Buenas noches.")
 
+    def vivir(self, latidos=None, hasta=None):
+        """El bucle principal. Corre hasta que la apaguen (o 'hasta' segundos).
+        latidos=Latidos(falso=True) la hace vivir con reloj virtual."""
+        self.latidos = latidos or Latidos()
+        if not self.corriendo:
+            self.latidos.parar()
+        self.despertar()
+        try:
+            self.latidos.correr(self._vivir, hasta)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.latidos = None
+            if not self.dormida:  # salga como salga, se guarda
+                self._dormir()
+
 
 if __name__ == "__main__":
     print("""
@@ -395,4 +473,8 @@ if __name__ == "__main__":
     ╚══════════════════════════════════════╝
     """)
     ianae = Ianae()
-    ianae.vivir()
+    simular = os.environ.get("IANAE_SIMULAR")  # segundos de vida con reloj virtual
+    if simular:
+        ianae.vivir(Latidos(falso=True), hasta=float(simular))
+    else:
+        ianae.vivir()
@@ -0,0 +1,155 @@
+"""
+IANAE v3 - Ficheros comprimidos
+Los dias cerrados del diario y los resumenes viejos se guardan en gzip
+por bloques: <nombre>.gz es una serie de miembros gzip independientes de
+BLOQUE bytes (sin comprimir) cada uno, y <nombre>.gzi dice donde empieza
+cada bloque. zcat lo lee entero como cualquier gzip; para leer una
+entrada de un dia comprimido solo se descomprime el bloque donde cae.
+
+Quien lee diarios o resumenes pasa por aqui: listar, existe, tamano,
+leer y leer_rango sirven igual para el fichero plano y el comprimido
+(siempre se nombra el plano: 'diario/2026-10-01.md').
+Solo libreria estandar (la web lo usa tal cual).
+"""
+
+import bisect
+import gzip
+import os
+import struct
+from pathlib import Path
+
+
+BLOQUE = 64 * 1024
+_PAR = struct.Struct("<QQ")   # (offset sin comprimir, offset en el .gz)
+
+
+def _gz(ruta):
+    return Path(f"{ruta}.gz")
+
+
+def _gzi(ruta):
+    return Path(f"{ruta}.gzi")
+
+
+def comprimido(ruta):
+    """True si ruta solo existe comprimida."""
+    return not Path(ruta).exists() and _gz(ruta).exists()
+
+
+def comprimir(ruta, nivel=6):
+    """Sustituye ruta por ruta.gz + ruta.gzi (conserva la fecha de modificacion).
+    Devuelve los bytes ahorrados."""
+    ruta = Path(ruta)
+    info = ruta.stat()
+    datos = ruta.read_bytes()
+    miembros, pares, pos = [], [], 0
+    for i in range(0, max(len(datos), 1), BLOQUE):
+        miembro = gzip.compress(datos[i:i + BLOQUE], nivel, mtime=0)
+        pares.append(_PAR.pack(i, pos))
+        miembros.append(miembro)
+        pos += len(miembro)
+    pares.append(_PAR.pack(len(datos), pos))  # centinela: los dos tamanos totales
+    for destino, contenido in ((_gzi(ruta), b"".join(pares)), (_gz(ruta), b"".join(miembros))):
+        tmp = destino.with_name(destino.name + ".tmp")
+        with open(tmp, "wb") as f:
+            f.write(contenido)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, destino)
+    os.utime(_gz(ruta), (info.st_atime, info.st_mtime))
+    # Mientras existen los dos se lee el plano; despues, el comprimido
+    ruta.unlink()
+    return info.st_size - pos - len(pares) * _PAR.size
+
+
+def borrar(ruta):
+    """Borra ruta en cualquiera de sus formas. Devuelve los bytes liberados."""
+    liberados = 0
+    for p in (Path(ruta), _gz(ruta), _gzi(ruta)):
+        try:
+            liberados += p.stat().st_size
+            p.unlink()
+        except OSError:
+            pass
+    return liberados
+
+
+def listar(directorio, patron):
+    """Los ficheros que casan con patron, planos o comprimidos, con su nombre plano."""
+    directorio = Path(directorio)
+    planos = set(directorio.glob(patron))
+    planos.update(p.with_suffix("") for p in directorio.glob(patron + ".gz"))
+    return sorted(planos)
+
+
+def existe(ruta):
+    return Path(ruta).exists() or _gz(ruta).exists()
+
+
+def _pares(ruta):
+    datos = _gzi(ruta).read_bytes()
+    pares = list(_PAR.iter_unpack(datos[:len(datos) - len(datos) % _PAR.size]))
+    if not pares:
+        raise OSError(f"indice vacio: {_gzi(ruta)}")
+    return [p[0] for p in pares], [p[1] for p in pares]
+
+
+def tamano(ruta):
+    """Bytes sin comprimir (como stat().st_size del plano). OSError si no existe."""
+    try:
+        return Path(ruta).stat().st_size
+    except FileNotFoundError:
+        planos, _ = _pares(ruta)
+        return planos[-1]
+
+
+def mtime(ruta):
+    try:
+        return Path(ruta).stat().st_mtime
+    except FileNotFoundError:
+        return _gz(ruta).stat().st_mtime
+
+
+def ocupado(ruta):
+    """Bytes que ocupa en disco, sea cual sea su forma."""
+    total = 0
+    for p in (Path(ruta), _gz(ruta), _gzi(ruta)):
+        try:
+            total += p.stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+def leer(ruta):
+    """Todo el contenido (bytes)."""
+    try:
+        return Path(ruta).read_bytes()
+    except FileNotFoundError:
+        return gzip.decompress(_gz(ruta).read_bytes())
+
+
+def leer_texto(ruta):
+    return leer(ruta).decode("utf-8", errors="replace")
+
+
+def leer_rango(ruta, offset, largo=None):
+    """Bytes [offset, offset+largo) (hasta el final si largo es None).
+    Del comprimido solo se descomprimen los bloques que tocan el rango."""
+    try:
+        with open(ruta, "rb") as f:
+            f.seek(offset)
+            return f.read() if largo is None else f.read(largo)
+    except FileNotFoundError:
+        pass
+    planos, comprimidos = _pares(ruta)
+    fin = planos[-1] if largo is None else min(offset + largo, planos[-1])
+    if offset >= fin:
+        return b""
+    primero = bisect.bisect_right(planos, offset) - 1
+    ultimo = bisect.bisect_left(planos, fin)   # primer bloque que empieza en o tras fin
+    with open(_gz(ruta), "rb") as f:
+        f.seek(comprimidos[primero])
+        datos = gzip.decompress(f.read(comprimidos[ultimo] - comprimidos[primero]))
+    inicio = offset - planos[primero]
+    return datos[inicio:inicio + fin - offset]
@@ -0,0 +1,84 @@
+"""
+IANAE v3 - Contextos
+Lo que estaba pasando cuando aprendio algo.
+
+Antes cada observacion entraba en la mente como un concepto mas
+('ver_hora: son las 10:42...'), casi siempre unico y nunca revisitado.
+Ahora va a un registro circular aparte: los ultimos momentos,
+cada uno enlazado a los conceptos que produjo.
+"""
+
+import json
+from collections import deque
+from pathlib import Path
+
+import persistencia
+import reloj
+
+
+DATA_DIR = Path(__file__).parent / "data"
+CONTEXTOS_FILE = DATA_DIR / "contextos.json"
+MAX_CONTEXTOS = 1000  # los mas viejos se caen solos
+
+
+class Contextos:
+    """Registro circular de observaciones -> conceptos."""
+
+    def __init__(self):
+        self.registro = deque(maxlen=MAX_CONTEXTOS)
+        self.sucio = False
+        self._cargar()
+
+    def _cargar(self):
+        if CONTEXTOS_FILE.exists():
+            try:
+                with open(CONTEXTOS_FILE, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.registro.extend(data.get("contextos", []))
+            except (json.JSONDecodeError, OSError):
+                pass
+
+    def guardar(self, forzar=False):
+        if not self.sucio and not forzar:
+            return False
+        data = {"contextos": list(self.registro), "guardado": reloj.ahora()}
+        persistencia.escritor().encolar(CONTEXTOS_FILE, data, indent=1)
+        self.sucio = False
+        return True
+
+    def anotar(self, sentido, observacion, conceptos, ts=None):
+        """Apunta un momento y los conceptos que salieron de el."""
+        entrada = {
+            "ts": ts if ts is not None else reloj.ahora(),
+            "sentido": sentido,
+            "texto": observacion[:200],
+            "conceptos": list(conceptos),
+        }
+        self.registro.append(entrada)
+        self.sucio = True
+        return entrada
+
+    def migrar(self, entradas):
+        """Mete contextos antiguos (de cuando eran conceptos) en su sitio por fecha."""
+        if not entradas:
+            return
+        todas = sorted(list(self.registro) + list(entradas), key=lambda e: e["ts"])
+        self.registro.clear()
+        self.registro.extend(todas)
+        self.sucio = True
+
+    def de_concepto(self, nombre, n=5):
+        """Los ultimos momentos en que aparecio un concepto."""
+        encontrados = []
+        for e in reversed(self.registro):
+            if nombre in e["conceptos"]:
+                encontrados.append(e)
+                if len(encontrados) >= n:
+                    break
+        return encontrados
+
+    def recientes(self, n=5):
+        return list(self.registro)[-n:]
+
+    def __len__(self):
+        return len(self.registro)
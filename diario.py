@@ -2,39 +2,159 @@
 IANAE v3 - El Diario
 Donde Ianae escribe lo que observa, piensa y descubre.
 Lucas puede leerlo y ver que esta pensando.
+
+El fichero del dia se queda abierto y las entradas se juntan en memoria:
+un ciclo que escribe diez entradas hace una sola escritura, no diez
+aperturas. Lo pendiente va al disco al final de cada ciclo y al apagar.
+
+Cada entrada va tambien, ya con sus campos, a <fecha>.jsonl y a un indice
+de tamano fijo <fecha>.idx (ver entradas.py): quien quiera las ultimas N,
+las de un tipo o las de desde una hora no tiene que parsear el Markdown.
 """
 
+import json
 import os
-from datetime import datetime
+import time
 from pathlib import Path
 
+import comprimido
+import entradas
+import rag
+import reloj
+import vectores
+
 DIARIO_DIR = Path(__file__).parent / "diario"
+VACIAR_BYTES = 8192      # se escribe al disco al juntar esto...
+VACIAR_SEGUNDOS = 10     # ...o al pasar este tiempo (y siempre al final del ciclo)
+
+ICONOS = {
+    "despertar": "~", "observacion": ">", "reflexion": "*",
+    "descubrimiento": "!", "olvido": "-", "estado": "#",
+    "curiosidad": "?", "sueno": "...", "conexion": "+",
+}
+
+
+class Cuaderno:
+    """El fichero del dia, abierto mientras dure el dia.
+    Las entradas se juntan en memoria y van al disco de una vez."""
+
+    def __init__(self, directorio=DIARIO_DIR):
+        self.directorio = Path(directorio)
+        self._fecha = None
+        self._f = None
+        self._jsonl = None      # <fecha>.jsonl y <fecha>.idx (None: dia sin ellos)
+        self._idx = None
+        self._md_pos = 0        # bytes del .md y del .jsonl contando lo pendiente
+        self._j_pos = 0
+        self._pendiente = []
+        self._pendiente_j = []
+        self._pendiente_idx = []
+        self._bytes = 0
+        self._ultimo = time.monotonic()
+
+    def _abrir(self, ahora):
+        """Cambio de dia (o primera entrada): cierra el de ayer y abre el de hoy."""
+        self._cerrar_ficheros()
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self._fecha = ahora.strftime("%Y-%m-%d")
+        base = self.directorio / self._fecha
+        self._f = open(base.with_suffix(".md"), "a", encoding="utf-8")
+        self._md_pos = os.fstat(self._f.fileno()).st_size
+        # El indice solo vale si cubre el dia desde el principio: un .md que
+        # ya existia sin .idx (dia empezado con una version anterior) sigue sin el
+        if self._md_pos == 0 or base.with_suffix(".idx").exists():
+            self._jsonl = open(base.with_suffix(".jsonl"), "ab")
+            self._idx = open(base.with_suffix(".idx"), "ab")
+            self._j_pos = self._jsonl.tell()
+            # Un registro a medio escribir (apagon) se descarta
+            sobra = self._idx.tell() % entradas.REGISTRO.size
+            if sobra:
+                self._idx.truncate(self._idx.tell() - sobra)
+        if self._md_pos == 0:
+            cabecera = f"# Diario de Ianae - {ahora.strftime('%A %d de %B de %Y')}\n\n"
+            self._pendiente.append(cabecera)
+            self._md_pos += len(cabecera.encode("utf-8"))
+
+    def anotar(self, ahora, entrada, tipo="", texto=None):
+        if ahora.strftime("%Y-%m-%d") != self._fecha:
+            self._abrir(ahora)
+        linea = f"{entrada}{entradas.FIN}"
+        largo = len(linea.encode("utf-8"))
+        self._pendiente.append(linea)
+        if self._jsonl is not None:
+            registro = (json.dumps({"ts": ahora.timestamp(), "hora": ahora.strftime("%H:%M:%S"),
+                                    "tipo": tipo, "texto": entrada if texto is None else texto},
+                                   ensure_ascii=False) + "\n").encode("utf-8")
+            self._pendiente_j.append(registro)
+            self._pendiente_idx.append(entradas.empaquetar(
+                self._j_pos, len(registro), self._md_pos, largo, ahora.timestamp(), tipo))
+            self._j_pos += len(registro)
+        self._md_pos += largo
+        self._bytes += largo
+        if (self._bytes >= VACIAR_BYTES
+                or time.monotonic() - self._ultimo >= VACIAR_SEGUNDOS):
+            self.vaciar()
+        return self._fecha
+
+    def vaciar(self):
+        """Escribe lo pendiente (una llamada al sistema por fichero)."""
+        # Se cambian las listas antes de escribir: si una senal llama a vaciar()
+        # a mitad, no se escribe nada dos veces
+        pendiente, self._pendiente = self._pendiente, []
+        pendiente_j, self._pendiente_j = self._pendiente_j, []
+        pendiente_idx, self._pendiente_idx = self._pendiente_idx, []
+        self._bytes = 0
+        self._ultimo = time.monotonic()
+        if pendiente and self._f is not None:
+            self._f.write("".join(pendiente))
+            self._f.flush()
+        # El .idx el ultimo: un registro que se ve apunta a datos ya escritos
+        if pendiente_j and self._jsonl is not None:
+            self._jsonl.write(b"".join(pendiente_j))
+            self._jsonl.flush()
+            self._idx.write(b"".join(pendiente_idx))
+            self._idx.flush()
+
+    def _cerrar_ficheros(self):
+        self.vaciar()
+        for f in (self._f, self._jsonl, self._idx):
+            if f is not None:
+                f.close()
+        self._f = self._jsonl = self._idx = None
+
+    def cerrar(self):
+        self._cerrar_ficheros()
+        self._fecha = None
+
+
+_cuaderno = Cuaderno()
 
 
 def _archivo_hoy():
     DIARIO_DIR.mkdir(parents=True, exist_ok=True)
-    return DIARIO_DIR / f"{datetime.now().strftime('%Y-%m-%d')}.md"
+    return DIARIO_DIR / f"{reloj.fecha_hora().strftime('%Y-%m-%d')}.md"
 
 
 def escribir(tipo, contenido):
     """Escribe una entrada. Tipos: despertar, observacion, reflexion,
     descubrimiento, olvido, estado, curiosidad, sueno"""
-    archivo = _archivo_hoy()
-    es_nuevo = not archivo.exists()
-    hora = datetime.now().strftime("%H:%M:%S")
+    ahora = reloj.fecha_hora()
+    icono = ICONOS.get(tipo, ".")
+    entrada = entradas.formatear(ahora.strftime('%H:%M:%S'), icono, tipo, contenido)
+    fecha = _cuaderno.anotar(ahora, entrada, tipo, contenido)
+    # Para la busqueda por similitud: se vectoriza ahora, una vez
+    vectores.indexar(entrada, "diario", fecha)
+    rag.publicar(entrada, "diario", fecha)
 
-    iconos = {
-        "despertar": "~", "observacion": ">", "reflexion": "*",
-        "descubrimiento": "!", "olvido": "-", "estado": "#",
-        "curiosidad": "?", "sueno": "...", "conexion": "+",
-    }
-    icono = iconos.get(tipo, ".")
 
-    with open(archivo, "a", encoding="utf-8") as f:
-        if es_nuevo:
-            fecha = datetime.now().strftime("%A %d de %B de %Y")
-            f.write(f"# Diario de Ianae - {fecha}\n\n")
-        f.write(f"**[{hora}]** {icono} _{tipo}_ — {contenido}\n\n")
+def vaciar():
+    """Lleva al disco lo escrito. Al final de cada ciclo y antes de leer el diario."""
+    _cuaderno.vaciar()
+
+
+def cerrar():
+    """Vacia y cierra el fichero del dia. Al apagar."""
+    _cuaderno.cerrar()
 
 
 def despertar():
@@ -45,7 +165,26 @@ def dormir(stats):
     escribir("sueno", f"Me duermo. Estado: {stats}")
 
 
+def ultimas(n, tipo=None, desde=None):
+    """Entradas de hoy {ts, hora, tipo, texto}, sin parsear el Markdown.
+    Las n ultimas, solo de un tipo y/o escritas desde el instante 'desde'."""
+    vaciar()
+    fecha = reloj.fecha_hora().strftime("%Y-%m-%d")
+    if not entradas.existe(DIARIO_DIR, fecha):
+        return []
+    if desde is not None:
+        registros = entradas.desde(DIARIO_DIR, fecha, desde)
+        if tipo is not None:
+            registros = [r for r in registros if r["tipo"] == tipo]
+    elif tipo is not None:
+        registros = entradas.de_tipo(DIARIO_DIR, fecha, tipo)
+    else:
+        registros = entradas.ultimas(DIARIO_DIR, fecha, n)
+    return entradas.leer(DIARIO_DIR, fecha, registros[-n:])
+
+
 def leer_hoy():
+    vaciar()
     archivo = _archivo_hoy()
     if archivo.exists():
         return archivo.read_text(encoding="utf-8")
@@ -54,4 +193,4 @@ def leer_hoy():
 
 def dias_escritos():
     DIARIO_DIR.mkdir(parents=True, exist_ok=True)
-    return len(list(DIARIO_DIR.glob("*.md")))
+    return len(comprimido.listar(DIARIO_DIR, "*.md"))
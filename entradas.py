@@ -0,0 +1,186 @@
+"""
+IANAE v3 - Entradas del diario
+El diario en Markdown es para leerlo. Junto a cada dia se guarda tambien:
+  - <fecha>.jsonl: una linea por entrada {ts, hora, tipo, texto}
+  - <fecha>.idx: un registro de tamano fijo por entrada con donde esta
+    (en el .jsonl y en el .md), cuando y de que tipo
+
+Con el .idx se va directo a "las ultimas N", "las de tipo X" o
+"las posteriores a T" sin leer ni parsear el dia entero.
+El .idx no se comprime nunca; el .jsonl y el .md de los dias cerrados,
+si (ver comprimido.py). Solo libreria estandar (la web lo usa tal cual).
+
+Aqui tambien esta el formato de una entrada en el .md; todo lo que parte
+un .md en entradas (indice_diario, resumenes, rag) usa cortes() o partir().
+"""
+
+import bisect
+import json
+import re
+import struct
+from pathlib import Path
+
+import comprimido
+
+
+# Una entrada en el .md: "**[HH:MM:SS]** <icono> _<tipo>_ — <texto>" y una
+# linea en blanco. La cabecera del dia no empieza por INICIO.
+INICIO = "**["
+FIN = "\n\n"
+_CORTE = re.compile(re.escape(FIN) + f"(?={re.escape(INICIO)})")
+_CORTE_BYTES = re.compile(_CORTE.pattern.encode("utf-8"))
+
+
+def formatear(hora, icono, tipo, texto):
+    """El texto de una entrada ('hora' como HH:MM:SS)."""
+    return f"{INICIO}{hora}]** {icono} _{tipo}_ — {texto}"
+
+
+def cortes(datos):
+    """Donde empieza cada entrada en bytes del .md (salvo lo que va antes
+    del primer corte). El final no cuenta: ver completa()."""
+    return [m.start() + len(FIN) for m in _CORTE_BYTES.finditer(datos)]
+
+
+def completa(datos):
+    """Si la ultima entrada de estos bytes ya termino."""
+    return datos.endswith(FIN.encode("utf-8"))
+
+
+def partir(texto):
+    """Las entradas de un .md ya leido, sin la cabecera (y sin espacios de sobra)."""
+    return [e.strip() for e in _CORTE.split(texto) if es_entrada(e.strip())]
+
+
+def es_entrada(trozo):
+    """Si un trozo del .md (str o bytes) es una entrada y no la cabecera."""
+    return trozo.startswith(INICIO if isinstance(trozo, str) else INICIO.encode("utf-8"))
+
+
+# offset y longitud en .jsonl, offset y longitud en .md, ts, tipo
+REGISTRO = struct.Struct("<QIQId12s")
+
+
+def empaquetar(j_offset, j_largo, md_offset, md_largo, ts, tipo):
+    return REGISTRO.pack(j_offset, j_largo, md_offset, md_largo, ts,
+                         tipo.encode("utf-8")[:12])
+
+
+class Indice:
+    """Los registros de un .idx, leidos bajo demanda (secuencia ordenada)."""
+
+    def __init__(self, directorio, fecha):
+        self.base = Path(directorio) / fecha
+        self._f = open(self.base.with_suffix(".idx"), "rb")
+        self._f.seek(0, 2)
+        # Un registro a medio escribir al final no cuenta
+        self._n = self._f.tell() // REGISTRO.size
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._n
+        if not 0 <= i < self._n:
+            raise IndexError(i)
+        self._f.seek(i * REGISTRO.size)
+        j, jl, m, ml, ts, tipo = REGISTRO.unpack(self._f.read(REGISTRO.size))
+        return {"j": j, "jl": jl, "md": m, "ml": ml, "ts": ts,
+                "tipo": tipo.rstrip(b"\0").decode("utf-8", errors="replace")}
+
+    def rango(self, inicio, fin=None):
+        """Registros [inicio, fin) de una sola lectura."""
+        fin = self._n if fin is None else min(fin, self._n)
+        if inicio >= fin:
+            return []
+        self._f.seek(inicio * REGISTRO.size)
+        datos = self._f.read((fin - inicio) * REGISTRO.size)
+        registros = []
+        for j, jl, m, ml, ts, tipo in REGISTRO.iter_unpack(datos):
+            registros.append({"j": j, "jl": jl, "md": m, "ml": ml, "ts": ts,
+                              "tipo": tipo.rstrip(b"\0").decode("utf-8", errors="replace")})
+        return registros
+
+    def cerrar(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+class _Claves:
+    """Vista de un campo del indice para bisect (sin cargarlo entero)."""
+
+    def __init__(self, indice, campo):
+        self.indice = indice
+        self.campo = campo
+
+    def __len__(self):
+        return len(self.indice)
+
+    def __getitem__(self, i):
+        return self.indice[i][self.campo]
+
+
+def existe(directorio, fecha):
+    return (Path(directorio) / f"{fecha}.idx").exists()
+
+
+def ultimas(directorio, fecha, n):
+    """Registros de las ultimas n entradas del dia."""
+    with Indice(directorio, fecha) as idx:
+        return idx.rango(max(0, len(idx) - n))
+
+
+def desde(directorio, fecha, ts):
+    """Registros de las entradas escritas en o despues del instante ts."""
+    with Indice(directorio, fecha) as idx:
+        return idx.rango(bisect.bisect_left(_Claves(idx, "ts"), ts))
+
+
+def desde_byte(directorio, fecha, offset):
+    """Registros de las entradas que empiezan en o despues de un byte del .md."""
+    with Indice(directorio, fecha) as idx:
+        return idx.rango(bisect.bisect_left(_Claves(idx, "md"), offset))
+
+
+def de_tipo(directorio, fecha, tipo):
+    """Registros de las entradas de un tipo (solo se lee el .idx)."""
+    with Indice(directorio, fecha) as idx:
+        return [r for r in idx.rango(0) if r["tipo"] == tipo]
+
+
+def _trozos(ruta, registros, campo, largo):
+    """Los bytes de cada registro, con una sola lectura del tramo que los cubre
+    (el .jsonl o el .md pueden estar comprimidos: comprimido.leer_rango)."""
+    if not registros:
+        return []
+    inicio = min(r[campo] for r in registros)
+    fin = max(r[campo] + r[largo] for r in registros)
+    try:
+        datos = comprimido.leer_rango(ruta, inicio, fin - inicio)
+    except OSError:
+        return []
+    return [datos[r[campo] - inicio:r[campo] - inicio + r[largo]] for r in registros]
+
+
+def leer(directorio, fecha, registros):
+    """Las entradas completas {ts, hora, tipo, texto} de unos registros,
+    una por registro ({} si no se pudo leer)."""
+    entradas = []
+    for trozo in _trozos(Path(directorio) / f"{fecha}.jsonl", registros, "j", "jl"):
+        try:
+            entradas.append(json.loads(trozo))
+        except json.JSONDecodeError:
+            entradas.append({})
+    return entradas
+
+
+def leer_md(directorio, fecha, registros):
+    """Las entradas tal cual estan en el Markdown."""
+    return [t.decode("utf-8", errors="replace").strip()
+            for t in _trozos(Path(directorio) / f"{fecha}.md", registros, "md", "ml")]
@@ -0,0 +1,212 @@
+"""
+IANAE v3 - Indice invertido
+Termino -> documentos donde aparece, con puntuacion BM25.
+
+Se mantiene al anadir y quitar documentos: una consulta solo toca
+los documentos que comparten algun termino con ella, no todos.
+Palabras enteras: 'sol' ya no encuentra 'soledad'.
+
+IndicePorDias es la variante para textos fechados (diarios, resumenes):
+BM25 por lo reciente del dia, recorriendo del dia mas nuevo al mas viejo
+y parando en cuanto un dia mas viejo ya no puede mejorar el top-k.
+"""
+
+import heapq
+import math
+import os
+from collections import Counter, defaultdict
+from datetime import date
+
+import reloj
+
+
+K1 = 1.2    # saturacion de la frecuencia del termino
+B = 0.75    # cuanto penaliza un documento largo
+VIDA_MEDIA_DIAS = float(os.environ.get("IANAE_RAG_VIDA_MEDIA", "30"))
+
+
+def _ultimo_dia(fecha):
+    """Ultimo dia de 'YYYY-MM-DD', 'YYYY-Www' (semana) o 'YYYY-MM' (mes)."""
+    try:
+        if "-W" in fecha:
+            anio, semana = fecha.split("-W")
+            return date.fromisocalendar(int(anio), int(semana), 7)
+        if len(fecha) == 7:
+            anio, mes = fecha.split("-")
+            siguiente = date(int(anio) + int(mes) // 12, int(mes) % 12 + 1, 1)
+            return date.fromordinal(siguiente.toordinal() - 1)
+        return date.fromisoformat(fecha)
+    except ValueError:
+        return None
+
+
+def decaimiento(fecha, hoy=None, vida_media=VIDA_MEDIA_DIAS):
+    """Peso de una fecha segun su antiguedad: 1 hoy, 0.5 a la vida media.
+    Semanas y meses cuentan desde su ultimo dia."""
+    dia = _ultimo_dia(fecha)
+    if dia is None:
+        return 1.0
+    edad = max(0, ((hoy or reloj.hoy()) - dia).days)
+    return 0.5 ** (edad / vida_media)
+
+
+class IndiceBM25:
+    """Indice invertido en memoria. Los documentos son cualquier clave hashable."""
+
+    def __init__(self, k1=K1, b=B):
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(dict)  # termino -> {doc: frecuencia}
+        self.longitudes = {}               # doc -> numero de tokens
+        self._longitud_total = 0
+
+    def __len__(self):
+        return len(self.longitudes)
+
+    def __contains__(self, doc):
+        return doc in self.longitudes
+
+    def anadir(self, doc, tokens):
+        if doc in self.longitudes:
+            self.quitar(doc)
+        frecuencias = Counter(tokens)
+        for termino, tf in frecuencias.items():
+            self.postings[termino][doc] = tf
+        self.longitudes[doc] = len(tokens)
+        self._longitud_total += len(tokens)
+
+    def quitar(self, doc, tokens=None):
+        """Quita un documento. Con sus tokens es O(terminos); sin ellos, recorre el vocabulario."""
+        if doc not in self.longitudes:
+            return
+        terminos = set(tokens) if tokens is not None else list(self.postings)
+        for termino in terminos:
+            docs = self.postings.get(termino)
+            if docs is not None and docs.pop(doc, None) is not None and not docs:
+                del self.postings[termino]
+        self._longitud_total -= self.longitudes.pop(doc)
+
+    def idf(self, termino):
+        n = len(self.postings.get(termino, ()))
+        total = len(self.longitudes)
+        return math.log(1 + (total - n + 0.5) / (n + 0.5))
+
+    def puntuar(self, tokens):
+        """doc -> puntuacion BM25, solo para documentos con algun termino de la consulta."""
+        if not self.longitudes:
+            return {}
+        media = self._longitud_total / len(self.longitudes) or 1
+        puntos = defaultdict(float)
+        for termino in set(tokens):
+            docs = self.postings.get(termino)
+            if not docs:
+                continue
+            idf = self.idf(termino)
+            for doc, tf in docs.items():
+                norma = self.k1 * (1 - self.b + self.b * self.longitudes[doc] / media)
+                puntos[doc] += idf * tf * (self.k1 + 1) / (tf + norma)
+        return puntos
+
+    def buscar(self, tokens, n=5, peso=None):
+        """Los n mejores (doc, puntuacion). peso(doc) multiplica la puntuacion si se da."""
+        puntos = self.puntuar(tokens)
+        if peso is not None:
+            puntos = {doc: p * peso(doc) for doc, p in puntos.items()}
+        return heapq.nlargest(n, puntos.items(), key=lambda kv: kv[1])
+
+
+class IndicePorDias:
+    """Indice invertido de documentos fechados. Los documentos son enteros
+    consecutivos (el orden en que se registran)."""
+
+    def __init__(self):
+        # termino -> fecha -> {doc: frecuencia}: se puede recorrer dia a dia
+        self.postings = defaultdict(lambda: defaultdict(dict))
+        self.df = defaultdict(int)      # termino -> documentos que lo contienen
+        self.fechas = []                # doc -> fecha
+        self.longitudes = []            # doc -> numero de tokens
+        self.documentos = 0             # documentos con algun token
+        self._longitud_total = 0
+
+    def registrar(self, fecha, frecuencias, longitud):
+        """Anade un documento {termino: tf} y devuelve su numero."""
+        doc = len(self.fechas)
+        self.fechas.append(fecha)
+        self.longitudes.append(longitud)
+        for termino, tf in frecuencias.items():
+            self.postings[termino][fecha][doc] = tf
+            self.df[termino] += 1
+        if longitud:
+            self.documentos += 1
+            self._longitud_total += longitud
+        return doc
+
+    def olvidar(self, fecha):
+        """Quita los documentos de un dia (sus numeros no se reutilizan)."""
+        docs = set()
+        for termino, dias in list(self.postings.items()):
+            del_dia = dias.pop(fecha, None)
+            if not del_dia:
+                continue
+            docs.update(del_dia)
+            self.df[termino] -= len(del_dia)
+            if not dias:
+                del self.postings[termino]
+                del self.df[termino]
+        for doc in docs:
+            self.documentos -= 1
+            self._longitud_total -= self.longitudes[doc]
+            self.longitudes[doc] = 0
+        return len(docs)
+
+    def candidatos(self, terminos):
+        """doc -> terminos de la consulta que contiene."""
+        encontrados = defaultdict(list)
+        for t in set(terminos):
+            for docs in self.postings.get(t, {}).values():
+                for doc in docs:
+                    encontrados[doc].append(t)
+        return encontrados
+
+    def idf(self, termino):
+        n = self.df.get(termino, 0)
+        return math.log(1 + (self.documentos - n + 0.5) / (n + 0.5))
+
+    def buscar(self, terminos, n=5, vida_media=VIDA_MEDIA_DIAS, hoy=None,
+               peso=None, peso_max=1.0, filtro=None, k1=K1, b=B):
+        """Los n mejores (doc, puntuacion): BM25 x decaimiento del dia x peso(doc).
+        peso_max acota peso(doc) para poder parar antes; filtro(doc) descarta.
+        Devuelve tambien cuantos dias llego a mirar."""
+        terminos = [t for t in set(terminos) if t in self.postings]
+        if not terminos or not self.documentos:
+            return [], 0
+        media = self._longitud_total / self.documentos
+        idf = {t: self.idf(t) for t in terminos}
+        # Cota de un documento cualquiera: cada termino aporta como mucho idf*(k1+1)
+        cota = sum(idf.values()) * (k1 + 1) * peso_max
+        dias = set()
+        for t in terminos:
+            dias.update(self.postings[t])
+
+        mejores = []  # monticulo de minimos con los n mejores (puntuacion, doc)
+        mirados = 0
+        # Del que mas pesa al que menos (dias, semanas y meses mezclados)
+        por_peso = sorted(((decaimiento(f, hoy, vida_media), f) for f in dias), reverse=True)
+        for factor, fecha in por_peso:
+            if len(mejores) == n and factor * cota <= mejores[0][0]:
+                break  # lo que queda pesa aun menos: ninguno puede entrar
+            mirados += 1
+            puntos = defaultdict(float)
+            for t in terminos:
+                for doc, tf in self.postings[t].get(fecha, {}).items():
+                    if filtro is not None and not filtro(doc):
+                        continue
+                    norma = k1 * (1 - b + b * self.longitudes[doc] / media)
+                    puntos[doc] += idf[t] * tf * (k1 + 1) / (tf + norma)
+            for doc, p in puntos.items():
+                candidato = (p * factor * (peso(doc) if peso else 1.0), doc)
+                if len(mejores) < n:
+                    heapq.heappush(mejores, candidato)
+                elif candidato > mejores[0]:
+                    heapq.heapreplace(mejores, candidato)
+        return [(doc, p) for p, doc in sorted(mejores, reverse=True)], mirados
@@ -0,0 +1,155 @@
+"""
+IANAE v3 - Indice de la colmena
+Un indice sobre los diarios y resumenes de TODAS las hermanas.
+
+Cada hermana solo ve su propio diario, pero todas comparten /reuniones.
+Ahi cada una publica su fragmento: /reuniones/indice/v<N>/<id>.jsonl, de
+solo-anadir y con un unico escritor (ella misma). Cada linea lleva la
+fecha, las frecuencias de terminos y el texto, asi que quien lee no
+necesita los ficheros de la otra.
+
+Quien busca (cualquier hermana o la web) carga todos los fragmentos una
+vez y luego solo lee lo que crecieron desde la ultima consulta.
+
+generacion(consulta) dice hasta donde llega, en cada fragmento, lo que puede
+responderla: sirve de clave para compartir busquedas entre hermanas sin que
+cualquier escritura sobre otra cosa las invalide.
+
+Acotado: de los dias solo se cargan los ultimos DIAS (semanas y meses, que
+son pocos, siempre). Cuando cambia el dia o una hermana poda su fragmento
+(rag.podar_fragmento, cada dia) se vuelve a cargar todo desde cero.
+"""
+
+import json
+import os
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+
+from analisis import VERSION, busqueda
+from indice import IndicePorDias
+import reloj
+
+
+def directorio(reuniones):
+    """Donde vive el indice dentro de /reuniones (uno por version del analisis)."""
+    return Path(reuniones) / "indice" / f"v{VERSION}"
+
+
+REUNIONES_DIR = Path(os.environ.get("IANAE_REUNIONES", "/reuniones"))
+INDICE_DIR = directorio(REUNIONES_DIR)
+DIAS = int(os.environ.get("IANAE_COLMENA_DIAS", "90"))  # dias de la colmena en memoria
+
+
+def limite(hoy=None):
+    """Primer dia que aun se carga (AAAA-MM-DD)."""
+    return ((hoy or reloj.hoy()) - timedelta(days=DIAS)).isoformat()
+
+
+def vigente(fecha, desde):
+    """Un dia cuenta desde 'desde'; semanas (2026-W41) y meses (2026-10), siempre."""
+    return len(fecha) != 10 or fecha >= desde
+
+
+def registro(hermana, fuente, fecha, texto):
+    """Linea de fragmento para un texto recien escrito (None si no dice nada)."""
+    tokens = busqueda(texto)
+    if not tokens:
+        return None
+    return json.dumps({"h": hermana, "s": fuente, "f": fecha, "n": len(tokens),
+                       "t": dict(Counter(tokens)), "x": texto[:300]},
+                      ensure_ascii=False)
+
+
+class IndiceColmena(IndicePorDias):
+    """Lector de todos los fragmentos de un directorio."""
+
+    def __init__(self, directorio=INDICE_DIR):
+        super().__init__()
+        self.directorio = Path(directorio)
+        self.meta = []     # doc -> (hermana, fuente, texto)
+        self._leido = {}   # fragmento -> (inodo, bytes ya cargados)
+        self._marcas = {}  # termino -> {fragmento: (inodo, fin de su ultima linea)}
+        self._limite = limite()
+
+    def _reiniciar(self):
+        IndicePorDias.__init__(self)
+        self.meta = []
+        self._leido = {}
+        self._marcas = {}
+        self._limite = limite()
+
+    def ponerse_al_dia(self):
+        """Carga lo que cada hermana haya publicado desde la ultima vez."""
+        if limite() != self._limite:
+            self._reiniciar()  # lo que salio de la ventana se suelta
+        nuevos = 0
+        for fragmento in sorted(self.directorio.glob("*.jsonl")):
+            try:
+                info = fragmento.stat()
+                inodo, desde = self._leido.get(fragmento.name, (info.st_ino, 0))
+                if inodo != info.st_ino:
+                    # La hermana lo reescribio (podado): no se pueden quitar
+                    # solo sus documentos, asi que se carga todo otra vez
+                    self._reiniciar()
+                    return self.ponerse_al_dia()
+                if info.st_size <= desde:
+                    continue
+                with open(fragmento, "rb") as f:
+                    f.seek(desde)
+                    for linea in f:
+                        if not linea.endswith(b"\n"):
+                            break  # linea a medio escribir: se lee la proxima vez
+                        desde += len(linea)
+                        try:
+                            reg = json.loads(linea)
+                        except json.JSONDecodeError:
+                            continue
+                        if not vigente(reg["f"], self._limite):
+                            continue
+                        self.registrar(reg["f"], reg["t"], reg["n"])
+                        self.meta.append((reg["h"], reg["s"], reg["x"]))
+                        for t in reg["t"]:
+                            self._marcas.setdefault(t, {})[fragmento.name] = (info.st_ino, desde)
+                        nuevos += 1
+            except OSError:
+                continue
+            self._leido[fragmento.name] = (info.st_ino, desde)
+        return nuevos
+
+    def generacion(self, query):
+        """Generacion de lo que lee 'query': el dia y, por fragmento, donde acaba
+        la ultima linea con alguno de sus terminos. Es la misma en las hermanas
+        que cargaron lo mismo y no cambia si se escribe de otra cosa (el idf y el
+        largo medio si se mueven un poco con todo; eso no se tiene en cuenta)."""
+        self.ponerse_al_dia()
+        hasta = {}
+        for t in set(busqueda(query)):
+            for fragmento, marca in self._marcas.get(t, {}).items():
+                hasta[fragmento] = max(hasta.get(fragmento, marca), marca)
+        return "|".join([self._limite] + [f"{f}:{i}:{o}" for f, (i, o) in sorted(hasta.items())])
+
+    def buscar_texto(self, query, n=5, hermanas=None, fuente=None, impulsos=None):
+        """Los n mejores: [(dict, puntuacion)].
+        hermanas: solo estas; fuente: 'diario' o 'resumen';
+        impulsos: {hermana: factor} que multiplica su puntuacion."""
+        self.ponerse_al_dia()
+        filtro = None
+        if hermanas is not None or fuente is not None:
+            hermanas = set(hermanas) if hermanas is not None else None
+
+            def filtro(doc):
+                h, s, _ = self.meta[doc]
+                return (hermanas is None or h in hermanas) and (fuente is None or s == fuente)
+        peso, peso_max = None, 1.0
+        if impulsos:
+            peso = lambda doc: impulsos.get(self.meta[doc][0], 1.0)
+            peso_max = max(1.0, *impulsos.values())
+        mejores, _ = self.buscar(busqueda(query), n, peso=peso,
+                                 peso_max=peso_max, filtro=filtro)
+        resultados = []
+        for doc, score in mejores:
+            h, s, texto = self.meta[doc]
+            resultados.append(({"hermana": h, "fuente": s, "fecha": self.fechas[doc],
+                                "texto": texto}, score))
+        return resultados
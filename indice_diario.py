@@ -0,0 +1,156 @@
+"""
+IANAE v3 - Indice del diario
+Indice invertido persistente sobre diario/*.md: termino -> (fecha, offset).
+
+No se relee el diario en cada pregunta. El indice vive en un JSONL de
+solo-anadir (una linea por entrada: fecha, offset y longitud en bytes,
+frecuencias de terminos) y se pone al dia leyendo cada fichero
+solo desde el ultimo byte indexado. Una consulta solo abre las entradas
+que coinciden, y solo para sacar su texto.
+
+Los dias con indice de entradas (entradas.py) no se trocean con
+expresiones regulares: el .idx dice donde empieza cada entrada nueva y
+el .jsonl da su tipo y su texto.
+
+Los dias comprimidos se leen igual (comprimido.py); los que la retencion
+borro se quitan del indice y de su fichero.
+
+El ranking (BM25 por lo reciente del dia, con parada temprana)
+es el de indice.IndicePorDias.
+"""
+
+import json
+from collections import Counter
+from pathlib import Path
+
+import comprimido
+import entradas
+import persistencia
+from indice import IndicePorDias
+
+
+def podar(ruta, fechas):
+    """Quita del fichero del indice las entradas de esos dias (en el escritor,
+    detras de lo que ya estuviera por anadir)."""
+    fechas = set(fechas)
+
+    def conservar(linea):
+        try:
+            return json.loads(linea)["f"] not in fechas
+        except (ValueError, KeyError, TypeError):
+            return False
+    persistencia.escritor().filtrar(ruta, conservar)
+
+
+class IndiceDiario(IndicePorDias):
+    """Indice invertido de las entradas de un directorio de diarios."""
+
+    def __init__(self, diario_dir, ruta, tokenizar):
+        super().__init__()
+        self.diario_dir = Path(diario_dir)
+        self.ruta = Path(ruta)          # JSONL del indice
+        self.tokenizar = tokenizar
+        self.entradas = []              # doc -> (fecha, offset, longitud en bytes)
+        self.indexado = {}              # fecha -> bytes del fichero ya indexados
+        self.generacion = 0             # sube cada vez que cambia lo que se puede buscar
+        self._cargado = False
+
+    def _cargar(self):
+        self._cargado = True
+        try:
+            with open(self.ruta, "r", encoding="utf-8") as f:
+                for linea in f:
+                    try:
+                        reg = json.loads(linea)
+                    except json.JSONDecodeError:
+                        continue
+                    self._registrar(reg)
+        except OSError:
+            pass
+
+    def _registrar(self, reg):
+        doc = self.registrar(reg["f"], reg["t"], reg["n"])
+        self.entradas.append((reg["f"], reg["o"], reg["l"]))
+        fin = reg["o"] + reg["l"]
+        if fin > self.indexado.get(reg["f"], 0):
+            self.indexado[reg["f"]] = fin
+        return doc
+
+    def ponerse_al_dia(self):
+        """Indexa lo que se haya escrito en los diarios desde la ultima vez.
+        Coste: un stat por fichero + leer solo los bytes nuevos."""
+        if not self._cargado:
+            self._cargar()
+        nuevos = []
+        presentes = set()
+        for archivo in comprimido.listar(self.diario_dir, "*.md"):
+            fecha = archivo.stem
+            presentes.add(fecha)
+            desde = self.indexado.get(fecha, 0)
+            try:
+                if comprimido.tamano(archivo) <= desde:
+                    continue
+                if entradas.existe(self.diario_dir, fecha):
+                    nuevos.extend(self._de_registros(fecha, desde))
+                    continue
+                datos = comprimido.leer_rango(archivo, desde)
+            except OSError:
+                continue
+            nuevos.extend(self._trocear(fecha, desde, datos))
+        borrados = set(self.indexado) - presentes
+        if borrados:
+            self._olvidar(borrados)
+        if borrados or nuevos:
+            self.generacion += 1
+        if nuevos:
+            lineas = []
+            for reg in nuevos:
+                self._registrar(reg)
+                lineas.append(json.dumps(reg, ensure_ascii=False))
+            persistencia.escritor().anexar(self.ruta, lineas)
+        return len(nuevos)
+
+    def _olvidar(self, fechas):
+        """Dias que ya no existen: fuera del indice en memoria y del fichero."""
+        for fecha in fechas:
+            self.olvidar(fecha)
+            del self.indexado[fecha]
+        podar(self.ruta, fechas)
+
+    def _trocear(self, fecha, desde, datos):
+        """Parte bytes nuevos en entradas completas. La ultima solo si ya termino."""
+        registros = []
+        pos = 0
+        limites = entradas.cortes(datos) + ([len(datos)] if entradas.completa(datos) else [])
+        for fin in limites:
+            trozo = datos[pos:fin]
+            if entradas.es_entrada(trozo):
+                tokens = self.tokenizar(trozo.decode("utf-8", errors="replace"))
+                registros.append({"f": fecha, "o": desde + pos, "l": fin - pos,
+                                  "n": len(tokens), "t": dict(Counter(tokens))})
+            else:
+                # cabecera del dia: no se busca en ella, pero su offset cuenta
+                registros.append({"f": fecha, "o": desde + pos, "l": fin - pos,
+                                  "n": 0, "t": {}})
+            pos = fin
+        return registros
+
+    def _de_registros(self, fecha, desde):
+        """Entradas nuevas segun el indice de entradas del dia (sin regex)."""
+        registros = []
+        nuevas = entradas.desde_byte(self.diario_dir, fecha, desde)
+        for r, e in zip(nuevas, entradas.leer(self.diario_dir, fecha, nuevas)):
+            # Los mismos terminos que daria la entrada en Markdown
+            tokens = self.tokenizar(f"{e.get('tipo', '')} {e.get('texto', '')}")
+            registros.append({"f": fecha, "o": r["md"], "l": r["ml"],
+                              "n": len(tokens), "t": dict(Counter(tokens))})
+        return registros
+
+    def texto(self, doc, max_chars=300):
+        """Lee del diario solo la entrada pedida."""
+        fecha, offset, longitud = self.entradas[doc]
+        try:
+            datos = comprimido.leer_rango(self.diario_dir / f"{fecha}.md", offset, longitud)
+            return datos.decode("utf-8", errors="replace").strip()[:max_chars]
+        except OSError:
+            return ""
@@ -0,0 +1,200 @@
+"""
+IANAE v3 - Latidos
+El tiempo de una hermana: un bucle asyncio donde cada fase late a su ritmo.
+
+Antes todo iba en fila: un ciclo (percibir, reunirse, sala, resumen,
+guardar) y luego time.sleep(42-78 s). Ahora cada fase es una tarea con su
+periodo, y el bucle nunca se bloquea:
+  - lo que toca la mente, la memoria o el diario va a un unico hilo
+    ("mente"): una fase cada vez, y los mensajes pasan delante
+  - lo que solo toca ficheros va a otro ejecutor ("io")
+  - las esperas se cortan en el acto al llegar un mensaje o al apagar
+
+Con reloj falso (Latidos(falso=True)) el tiempo es virtual: nada espera de
+verdad, el bucle salta al siguiente temporizador y los ejecutores corren
+en el mismo hilo. La hora de la hermana (reloj.py) es la del bucle, asi
+que el diario cambia de dia, los recuerdos decaen y la retencion actua
+como en un dia de verdad. Mismo orden de fases, en milisegundos y reproducible.
+"""
+
+import asyncio
+import heapq
+import itertools
+import selectors
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+import reloj
+
+
+MENSAJE = 0   # prioridad de los turnos de la mente: menor pasa antes
+FASE = 1
+
+
+class _SelectorFalso(selectors.DefaultSelector):
+    """Nunca bloquea: si no hay nada listo, adelanta el reloj lo que iba a esperar."""
+
+    def __init__(self, reloj):
+        super().__init__()
+        self.reloj = reloj
+
+    def select(self, timeout=None):
+        eventos = super().select(0)
+        if not eventos and timeout:
+            self.reloj.ahora += timeout
+        return eventos
+
+
+class _BucleFalso(asyncio.SelectorEventLoop):
+    def __init__(self, reloj):
+        super().__init__(_SelectorFalso(reloj))
+        self.reloj = reloj
+
+    def time(self):
+        return self.reloj.ahora
+
+
+class Latidos:
+    """Bucle, ejecutores y esperas interrumpibles de una hermana."""
+
+    def __init__(self, falso=False, inicio=None):
+        self.falso = falso
+        self.ahora = 0.0                # solo con reloj falso: segundos vividos
+        self.inicio = time.time() if inicio is None else inicio  # epoch del segundo 0
+        self.corriendo = True
+        self.bucle = None
+        self._mente = None if falso else ThreadPoolExecutor(1, thread_name_prefix="mente")
+        self._io = None if falso else ThreadPoolExecutor(2, thread_name_prefix="io")
+        self._parar = None              # asyncio.Event
+        self._avisos = {}               # nombre -> asyncio.Event
+        self._ocupada = False           # la mente esta con algo
+        self._turnos = []               # (prioridad, orden, future)
+        self._orden = itertools.count()
+
+    # --- Tiempo ---
+
+    def hora(self):
+        """Segundos del bucle (monotonos; con reloj falso, desde el arranque)."""
+        return self.bucle.time()
+
+    async def dormir(self, segundos, aviso=None):
+        """Espera 'segundos'; antes si se para o si llega 'aviso'. True si llego el aviso."""
+        esperas = [asyncio.ensure_future(self._parar.wait())]
+        if aviso is not None:
+            esperas.append(asyncio.ensure_future(self.aviso(aviso).wait()))
+        try:
+            await asyncio.wait(esperas, timeout=max(0.0, segundos),
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for e in esperas:
+                e.cancel()
+        if aviso is not None and self.aviso(aviso).is_set():
+            self.aviso(aviso).clear()
+            return True
+        return False
+
+    def aviso(self, nombre):
+        if nombre not in self._avisos:
+            self._avisos[nombre] = asyncio.Event()
+        return self._avisos[nombre]
+
+    def avisar(self, nombre):
+        """Despierta a quien duerma esperando 'nombre'. Se puede llamar desde otro hilo."""
+        if self.bucle is not None:
+            self.bucle.call_soon_threadsafe(lambda: self.aviso(nombre).set())
+
+    def parar(self):
+        """Pide parar: corta todas las esperas. Se puede llamar desde una senal."""
+        self.corriendo = False
+        if self.bucle is not None and self._parar is not None:
+            self.bucle.call_soon_threadsafe(self._parar.set)
+
+    # --- Ejecutores ---
+
+    async def _ejecutar(self, ejecutor, funcion, *args):
+        if self.falso:
+            return funcion(*args)
+        return await self.bucle.run_in_executor(ejecutor, funcion, *args)
+
+    async def en_mente(self, funcion, *args, prioridad=FASE):
+        """Corre funcion en el hilo de la mente, cuando le toque (una cosa cada vez)."""
+        if self._ocupada or self._turnos:
+            turno = self.bucle.create_future()
+            heapq.heappush(self._turnos, (prioridad, next(self._orden), turno))
+            try:
+                await turno
+            except asyncio.CancelledError:
+                if turno.done() and not turno.cancelled():
+                    self._soltar()  # ya se la habian pasado: al siguiente
+                raise
+        self._ocupada = True
+        try:
+            return await self._ejecutar(self._mente, funcion, *args)
+        finally:
+            self._soltar()
+
+    def _soltar(self):
+        """Deja la mente libre, o se la pasa al primer turno que sigue esperando."""
+        self._ocupada = False
+        while self._turnos:
+            _, _, turno = heapq.heappop(self._turnos)
+            if not turno.cancelled():
+                self._ocupada = True
+                turno.set_result(None)
+                break
+
+    async def en_io(self, funcion, *args):
+        """Corre funcion (que no toca la mente) en el ejecutor de ficheros."""
+        return await self._ejecutar(self._io, funcion, *args)
+
+    # --- Fases ---
+
+    def cada(self, nombre, periodo, fase, inicio=0.0):
+        """Tarea que llama a 'await fase()' cada 'periodo' segundos (o periodo())."""
+        async def latir():
+            if inicio:
+                await self.dormir(inicio)
+            while self.corriendo:
+                try:
+                    await fase()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    print(f"[latidos] Error en {nombre}: {e}")
+                    traceback.print_exc()
+                if self.corriendo:
+                    await self.dormir(periodo() if callable(periodo) else periodo)
+        return asyncio.ensure_future(latir())
+
+    # --- Arranque ---
+
+    def correr(self, principal, hasta=None):
+        """Corre 'await principal(self)' hasta que pare (o hasta 'hasta' segundos)."""
+        if self.falso:
+            bucle = _BucleFalso(self)
+        else:
+            bucle = asyncio.new_event_loop()
+        self.bucle = bucle
+        asyncio.set_event_loop(bucle)
+        if self.falso:
+            reloj.usar(lambda: self.inicio + self.ahora)
+
+        async def vivir():
+            self._parar = asyncio.Event()
+            if not self.corriendo:
+                self._parar.set()
+            if hasta is not None:
+                bucle.call_later(hasta, self.parar)
+            await principal(self)
+
+        try:
+            return bucle.run_until_complete(vivir())
+        finally:
+            for ejecutor in (self._mente, self._io):
+                if ejecutor is not None:
+                    ejecutor.shutdown(wait=True)
+            asyncio.set_event_loop(None)
+            bucle.close()
+            if self.falso:
+                reloj.usar(None)
@@ -4,47 +4,80 @@ Recuerdos concretos: momentos con fecha, contexto y emocion.
 'Lucas me dijo que soy su hija el 19 de febrero' en vez de solo hija->lucas: 0.8
 """
 
+import heapq
 import json
-import time
-from datetime import datetime
+import math
+import os
+import random
 from pathlib import Path
 
+import persistencia
+import reloj
+from analisis import recuerdos as tokenizar
+from indice import IndiceBM25
+from vectores import IndiceVectorial
+
 DATA_DIR = Path(__file__).parent / "data"
-MEMORIA_FILE = DATA_DIR / "recuerdos.json"
-MAX_RECUERDOS = 500  # limite para no crecer infinito
+MEMORIA_FILE = DATA_DIR / "recuerdos.json"   # formato antiguo (se migra)
+MEMORIA_LOG = DATA_DIR / "recuerdos.jsonl"    # registro de eventos, solo se anade
+MAX_RECUERDOS = int(os.environ.get("IANAE_MAX_RECUERDOS", "500"))  # limite para no crecer infinito
+DECAIMIENTO_HORA = 0.999  # la importancia se multiplica por esto cada hora
+MOTOR_BUSQUEDA = os.environ.get("IANAE_MOTOR_MEMORIA", "bm25")  # "bm25" o "vectorial"
+COMPACTAR_FACTOR = 2  # compactar cuando el registro tenga el doble de lineas que recuerdos
+
+
+def _nuevo_id(timestamp):
+    return f"r_{int(timestamp*1000)}_{random.randint(0,999)}"
 
 
 class Recuerdo:
     def __init__(self, tipo, contenido, contexto="", emocion="neutral"):
-        self.timestamp = time.time()
-        self.fecha = datetime.now().strftime("%Y-%m-%d %H:%M")
+        self.timestamp = reloj.ahora()
+        self.id = _nuevo_id(self.timestamp)
+        self.fecha = reloj.fecha_hora().strftime("%Y-%m-%d %H:%M")
         self.tipo = tipo          # "mensaje", "descubrimiento", "reflexion", "resumen"
         self.contenido = contenido
         self.contexto = contexto  # que pasaba cuando ocurrio
         self.emocion = emocion    # "neutral", "curiosidad", "sorpresa", "alegria", "confusion"
-        self.importancia = 0.5    # 0-1, decae con el tiempo
         self.accesos = 0          # cuantas veces se ha recordado
+        # Importancia con decaimiento perezoso: se guarda el valor en un instante
+        # de referencia y se calcula al leerla. Nadie tiene que "decaer" a mano.
+        self._importancia = 0.5   # 0-1 en el instante de referencia
+        self.referencia = self.timestamp
+
+    @property
+    def importancia(self):
+        horas = (reloj.ahora() - self.referencia) / 3600
+        return self._importancia * DECAIMIENTO_HORA ** horas
+
+    @importancia.setter
+    def importancia(self, valor):
+        self._importancia = valor
+        self.referencia = reloj.ahora()
+
+    @property
+    def clave(self):
+        """Orden por importancia que no cambia con el tiempo (todas decaen igual).
+        log(importancia ahora) = clave + horas_ahora * log(decaimiento)."""
+        return (math.log(max(self._importancia, 1e-12))
+                - self.referencia / 3600 * math.log(DECAIMIENTO_HORA))
 
     def acceder(self):
         """Se ha recordado esto."""
         self.accesos += 1
         self.importancia = min(1.0, self.importancia + 0.1)
 
-    def decaer(self):
-        """Pierde importancia con el tiempo."""
-        horas = (time.time() - self.timestamp) / 3600
-        # Decay muy lento: pierde relevancia en dias, no horas
-        self.importancia *= 0.999 ** horas
-
     def to_dict(self):
         return {
+            "id": self.id,
             "timestamp": self.timestamp,
             "fecha": self.fecha,
             "tipo": self.tipo,
             "contenido": self.contenido,
             "contexto": self.contexto,
             "emocion": self.emocion,
-            "importancia": round(self.importancia, 4),
+            "importancia": round(self._importancia, 4),
+            "referencia": self.referencia,
             "accesos": self.accesos,
         }
 
@@ -52,8 +85,10 @@ class Recuerdo:
     def from_dict(cls, d):
         r = cls(d["tipo"], d["contenido"], d.get("contexto", ""), d.get("emocion", "neutral"))
         r.timestamp = d["timestamp"]
+        r.id = d.get("id") or _nuevo_id(r.timestamp)
         r.fecha = d.get("fecha", "")
         r.importancia = d.get("importancia", 0.5)
+        r.referencia = d.get("referencia", r.referencia)  # sin ella: desde ahora
         r.accesos = d.get("accesos", 0)
         return r
 
@@ -62,66 +97,154 @@ class Recuerdo:
 
 
 class Memoria:
-    """Memoria episodica de Ianae."""
+    """Memoria episodica de Ianae.
+
+    En disco es un registro JSONL de eventos (nuevo, acceso, poda):
+    guardar solo anade lineas. Cada cierto tiempo se compacta
+    (una linea 'nuevo' por recuerdo vivo, ordenadas por fecha),
+    asi que lo mas reciente siempre esta al final del fichero."""
 
     def __init__(self):
-        self.recuerdos = []
+        self.recuerdos = {}  # id -> Recuerdo, en orden de llegada
+        self.sucio = False  # hay cambios sin guardar
+        # Solo el motor que se usa en buscar(): BM25 o TF-IDF hasheado
+        self.indice = IndiceVectorial() if MOTOR_BUSQUEDA == "vectorial" else IndiceBM25()
+        self._eventos = []           # lineas pendientes de anadir al registro
+        self._lineas_registro = 0    # lineas que ya tiene el registro en disco
+        self._compactar = False
+        # Monticulo de minimos por importancia: (clave, id). Entradas viejas
+        # (recuerdo podado o reforzado) se descartan al sacarlas.
+        self._monticulo = []
         self._cargar()
+        for r in self.recuerdos.values():
+            self._indexar(r)
+        self._rehacer_monticulo()
+
+    def _rehacer_monticulo(self):
+        self._monticulo = [(r.clave, r.id) for r in self.recuerdos.values()]
+        heapq.heapify(self._monticulo)
+
+    def _apilar(self, r):
+        heapq.heappush(self._monticulo, (r.clave, r.id))
+        if len(self._monticulo) > 2 * len(self.recuerdos) + 100:
+            self._rehacer_monticulo()  # demasiadas entradas viejas
+
+    @staticmethod
+    def _tokens(r):
+        return tokenizar(f"{r.contenido} {r.contexto}")
+
+    def _indexar(self, r):
+        self.indice.anadir(r, self._tokens(r))
+
+    def _desindexar(self, r):
+        self.indice.quitar(r, self._tokens(r))
 
     def _cargar(self):
         DATA_DIR.mkdir(parents=True, exist_ok=True)
-        if MEMORIA_FILE.exists():
+        if MEMORIA_LOG.exists():
+            self._reproducir()
+        elif MEMORIA_FILE.exists():
+            # Migracion desde recuerdos.json: se reescribe entero como registro
             try:
                 with open(MEMORIA_FILE, "r", encoding="utf-8") as f:
                     data = json.load(f)
-                self.recuerdos = [Recuerdo.from_dict(r) for r in data.get("recuerdos", [])]
+                for d in sorted(data.get("recuerdos", []), key=lambda d: d["timestamp"]):
+                    r = Recuerdo.from_dict(d)
+                    self.recuerdos[r.id] = r
+                self._compactar = True
+                self.sucio = True
             except (json.JSONDecodeError, OSError):
-                self.recuerdos = []
+                self.recuerdos = {}
 
-    def guardar(self):
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        data = {
-            "recuerdos": [r.to_dict() for r in self.recuerdos],
-            "total": len(self.recuerdos),
-            "guardado": time.time(),
-        }
-        with open(MEMORIA_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+    def _reproducir(self):
+        """Reconstruye el estado leyendo el registro de principio a fin."""
+        try:
+            with open(MEMORIA_LOG, "r", encoding="utf-8") as f:
+                for linea in f:
+                    self._lineas_registro += 1
+                    try:
+                        ev = json.loads(linea)
+                    except json.JSONDecodeError:
+                        continue  # linea cortada por un apagado brusco
+                    tipo = ev.get("ev")
+                    if tipo == "nuevo":
+                        r = Recuerdo.from_dict(ev)
+                        self.recuerdos[r.id] = r
+                    elif tipo == "acceso":
+                        r = self.recuerdos.get(ev["id"])
+                        if r is not None:
+                            r.importancia = ev["importancia"]
+                            r.referencia = ev.get("referencia", r.referencia)
+                            r.accesos = ev["accesos"]
+                    elif tipo == "poda":
+                        for rid in ev["ids"]:
+                            self.recuerdos.pop(rid, None)
+        except OSError:
+            pass
+
+    def _evento(self, ev):
+        self._eventos.append(json.dumps(ev, ensure_ascii=False))
+        self.sucio = True
+
+    def guardar(self, forzar=False):
+        """Anade los eventos pendientes al registro (en segundo plano).
+        Compacta si el registro ya es mucho mas largo que lo que recuerda."""
+        if not self.sucio and not forzar:
+            return False
+        lineas = self._lineas_registro + len(self._eventos)
+        if self._compactar or lineas > COMPACTAR_FACTOR * len(self.recuerdos) + 100:
+            foto = [json.dumps({"ev": "nuevo", **r.to_dict()}, ensure_ascii=False)
+                    for r in sorted(self.recuerdos.values(), key=lambda r: r.timestamp)]
+            persistencia.escritor().reemplazar_lineas(MEMORIA_LOG, foto)
+            self._lineas_registro = len(foto)
+            self._compactar = False
+        else:
+            persistencia.escritor().anexar(MEMORIA_LOG, self._eventos)
+            self._lineas_registro = lineas
+        self._eventos = []
+        self.sucio = False
+        return True
 
     def recordar(self, tipo, contenido, contexto="", emocion="neutral"):
         """Crea un nuevo recuerdo."""
         r = Recuerdo(tipo, contenido, contexto, emocion)
-        self.recuerdos.append(r)
+        while r.id in self.recuerdos:  # dos recuerdos en el mismo milisegundo
+            r.id = _nuevo_id(r.timestamp)
+        self.recuerdos[r.id] = r
+        self._indexar(r)
+        self._apilar(r)
+        self._evento({"ev": "nuevo", **r.to_dict()})
         # Podar si hay demasiados
         if len(self.recuerdos) > MAX_RECUERDOS:
             self._podar()
         return r
 
     def buscar(self, query, n=5):
-        """Busca recuerdos relevantes por palabras clave."""
-        query_words = set(query.lower().split())
-        resultados = []
-        for r in self.recuerdos:
-            texto = f"{r.contenido} {r.contexto}".lower()
-            coincidencias = sum(1 for w in query_words if w in texto)
-            if coincidencias > 0:
-                score = coincidencias * r.importancia
-                r.acceder()
-                resultados.append((r, score))
-        resultados.sort(key=lambda x: x[1], reverse=True)
-        return [r for r, _ in resultados[:n]]
+        """Busca recuerdos relevantes: BM25 (o coseno TF-IDF) por la importancia.
+        Solo mira los recuerdos que comparten alguna palabra con la consulta."""
+        mejores = self.indice.buscar(tokenizar(query), n, peso=lambda r: r.importancia)
+        # Solo cuenta como recordado lo que de verdad se devuelve
+        for r, _ in mejores:
+            r.acceder()
+            self._apilar(r)
+            self._evento({"ev": "acceso", "id": r.id, "importancia": round(r._importancia, 4),
+                          "referencia": r.referencia, "accesos": r.accesos})
+        return [r for r, _ in mejores]
 
     def recientes(self, n=5, tipo=None):
         """Ultimos N recuerdos, opcionalmente filtrados por tipo."""
-        filtrados = self.recuerdos
-        if tipo:
-            filtrados = [r for r in filtrados if r.tipo == tipo]
-        return filtrados[-n:]
+        encontrados = []
+        for r in reversed(self.recuerdos.values()):
+            if tipo and r.tipo != tipo:
+                continue
+            encontrados.append(r)
+            if len(encontrados) >= n:
+                break
+        return encontrados[::-1]
 
     def importantes(self, n=5):
         """Recuerdos mas importantes."""
-        ordenados = sorted(self.recuerdos, key=lambda r: r.importancia, reverse=True)
-        return ordenados[:n]
+        return heapq.nlargest(n, self.recuerdos.values(), key=lambda r: r.clave)
 
     def formatear(self, recuerdos):
         """Convierte recuerdos a texto para contexto de Ollama."""
@@ -133,12 +256,18 @@ class Memoria:
         return "\n".join(lineas)
 
     def _podar(self):
-        """Elimina recuerdos menos importantes cuando hay demasiados."""
-        for r in self.recuerdos:
-            r.decaer()
-        self.recuerdos.sort(key=lambda r: r.importancia)
-        # Mantener los mas importantes
-        self.recuerdos = self.recuerdos[-(MAX_RECUERDOS - 50):]
+        """Olvida el recuerdo menos importante. O(log n) con el monticulo."""
+        podados = []
+        while len(self.recuerdos) > MAX_RECUERDOS and self._monticulo:
+            clave, rid = heapq.heappop(self._monticulo)
+            r = self.recuerdos.get(rid)
+            if r is None or r.clave != clave:
+                continue  # entrada vieja
+            self._desindexar(r)
+            del self.recuerdos[rid]
+            podados.append(rid)
+        if podados:
+            self._evento({"ev": "poda", "ids": podados})
 
     def stats(self):
         return {
@@ -7,23 +7,41 @@ No hay conocimiento precargado. Todo se descubre.
 """
 
 import json
-import time
 import random
 import math
 import os
+import heapq
+from collections import defaultdict, deque
 from pathlib import Path
 
+import persistencia
+import reloj
+from centralidad import Centralidad
+from contextos import Contextos
+
 
 DATA_DIR = Path(__file__).parent / "data"
 MENTE_FILE = DATA_DIR / "mente.json"
 
+# --- Capacidad ---
+# Una mente finita: al pasar del limite, olvida lo que menos le importa.
+MAX_CONCEPTOS = int(os.environ.get("IANAE_MAX_CONCEPTOS", "5000"))
+POLITICA_OLVIDO = os.environ.get("IANAE_POLITICA_OLVIDO", "interes")
+MUESTRA_OLVIDO = 16        # candidatos que mira por cada olvido (muestreo, no orden total)
+OLVIDOS_POR_PASO = 4       # como mucho olvida esto por llamada: trabajo acotado
+TRAYECTORIA_MAX = 500      # puntos (timestamp, conceptos) que recuerda de su tamano
+
+UMBRAL_VIDA = 0.02         # por debajo de esta energia un concepto esta muerto
+
 
 class Concepto:
     """Un concepto es algo que Ianae ha observado o pensado.
     Tiene energia (cuanto le importa), curiosidad y conexiones."""
 
     def __init__(self, nombre, contexto="", origen="observacion"):
-        self.id = f"c_{int(time.time()*1000)}_{random.randint(0,999)}"
+        self._mente = None    # la mente que lo contiene (para sus contadores)
+        self._energia = 0.5
+        self.id = f"c_{int(reloj.ahora()*1000)}_{random.randint(0,999)}"
         self.nombre = nombre
         self.contexto = contexto
         self.origen = origen  # observacion, conexion, reflexion
@@ -32,18 +50,28 @@ class Concepto:
         self.sorpresa = random.uniform(0.0, 0.3)
         self.familiaridad = 0.0
         self.veces_visto = 1
-        self.nacimiento = time.time()
-        self.ultima_vez = time.time()
+        self.nacimiento = reloj.ahora()
+        self.ultima_vez = reloj.ahora()
         self.conexiones = {}  # nombre_otro -> peso
 
     def revisitar(self):
         """Lo ha vuelto a encontrar."""
         self.veces_visto += 1
-        self.ultima_vez = time.time()
+        self.ultima_vez = reloj.ahora()
         self.energia = min(1.0, self.energia + 0.15 * (1.0 - self.energia))
         self.familiaridad = min(1.0, self.familiaridad + 0.1)
         self.sorpresa = max(0.0, self.sorpresa - 0.03)
 
+    @property
+    def energia(self):
+        return self._energia
+
+    @energia.setter
+    def energia(self, valor):
+        if self._mente is not None:
+            self._mente._cambio_energia(self, self._energia, valor)
+        self._energia = valor
+
     def decaer(self, horas=1):
         """Olvido natural. Lo que no se usa se desvanece."""
         factor = 0.98 ** horas
@@ -56,17 +84,33 @@ class Concepto:
                 muertos.append(nombre)
         for m in muertos:
             del self.conexiones[m]
+        if muertos and self._mente is not None:
+            self._mente._cambio_conexiones(self, perdidas=muertos)
 
     def conectar(self, otro_nombre, peso=0.3):
         """Crear o reforzar conexion."""
-        if otro_nombre in self.conexiones:
-            self.conexiones[otro_nombre] = min(1.0, self.conexiones[otro_nombre] + 0.1)
-        else:
+        nueva = otro_nombre not in self.conexiones
+        if nueva:
             self.conexiones[otro_nombre] = peso
+        else:
+            self.conexiones[otro_nombre] = min(1.0, self.conexiones[otro_nombre] + 0.1)
+        if self._mente is not None:
+            self._mente._cambio_conexiones(self, ganadas=[otro_nombre] if nueva else ())
+
+    def reforzar(self, otro_nombre, delta=0.05):
+        """Sube el peso de una conexion (la crea desde 0 si no existia)."""
+        nueva = otro_nombre not in self.conexiones
+        self.conexiones[otro_nombre] = min(1.0, self.conexiones.get(otro_nombre, 0) + delta)
+        if self._mente is not None:
+            self._mente._cambio_conexiones(self, ganadas=[otro_nombre] if nueva else ())
+
+    def desconectar(self, otro_nombre):
+        if self.conexiones.pop(otro_nombre, None) is not None and self._mente is not None:
+            self._mente._cambio_conexiones(self, perdidas=[otro_nombre])
 
     @property
     def vivo(self):
-        return self.energia > 0.02
+        return self.energia > UMBRAL_VIDA
 
     @property
     def interes(self):
@@ -104,41 +148,246 @@ class Concepto:
         return f"<{self.nombre} e={self.energia:.2f} c={self.curiosidad:.2f} v={self.veces_visto}>"
 
 
+# Politicas de olvido: puntuan un concepto, se olvida el de menor puntuacion.
+def _olvido_por_interes(c):
+    return c.interes
+
+
+def _olvido_por_antiguedad(c):
+    """LRU: lo que hace mas tiempo que no ve."""
+    return c.ultima_vez
+
+
+def _olvido_por_grado(c):
+    """Como el interes, pero los conceptos muy conectados aguantan mas."""
+    return c.interes * (1.0 + math.log1p(len(c.conexiones)))
+
+
+POLITICAS = {
+    "interes": _olvido_por_interes,
+    "lru": _olvido_por_antiguedad,
+    "grado": _olvido_por_grado,
+}
+
+
 class Mente:
     """La mente de Ianae. Nace vacia. Aprende observando."""
 
-    def __init__(self):
+    def __init__(self, capacidad=None, politica=None):
         self.conceptos = {}  # nombre -> Concepto
+        self.sucio = False   # hay cambios sin guardar
+        self.capacidad = capacidad if capacidad is not None else MAX_CONCEPTOS
+        politica = politica or POLITICA_OLVIDO
+        self.politica = POLITICAS[politica] if isinstance(politica, str) else politica
+        self.olvidos = {"envejecer": 0, "capacidad": 0}
+        self.trayectoria = deque(maxlen=TRAYECTORIA_MAX)  # (timestamp, conceptos)
+        # Nombres en lista para elegir al azar en O(1) al olvidar
+        self._nombres = []
+        self._posicion = {}  # nombre -> indice en _nombres
+        # Aristas al reves: las conexiones van en un solo sentido, y al olvidar
+        # un concepto hay que quitar tambien las que llegan a el
+        self._entrantes = defaultdict(set)  # destino -> nombres que apuntan a el
+        # Contadores que se mantienen en cada cambio: stats() no recorre la mente
+        self._vivos = 0
+        self._aristas = 0     # conexiones salientes de los conceptos vivos
+        self._energia = 0.0   # suma de energia de los vivos
+        self._version = 0     # sube con cada cambio; invalida el top cacheado
+        self._top_cache = (-1, 0, [])  # (version, n, conceptos)
+        # Centralidad estructural (PageRank incremental sobre las conexiones)
+        self.centralidad = Centralidad(self._salidas)
+        # Lo que pasaba cuando aprendia: fuera del grafo
+        self.contextos = Contextos()
         self._cargar()
 
     def _cargar(self):
         if MENTE_FILE.exists():
             with open(MENTE_FILE, "r") as f:
                 data = json.load(f)
+            antiguos = []
             for cd in data.get("conceptos", []):
+                if cd.get("origen") == "contexto":
+                    antiguos.append(cd)
+                    continue
                 c = Concepto.from_dict(cd)
-                self.conceptos[c.nombre] = c
+                self._anadir(c)
+            self.olvidos.update(data.get("olvidos", {}))
+            self.trayectoria.extend(tuple(p) for p in data.get("trayectoria", []))
+            self.sucio = False  # recien leido: nada que guardar
+            if antiguos:
+                self._migrar_contextos(antiguos)
+
+    def _migrar_contextos(self, antiguos):
+        """Mentes viejas guardaban cada observacion como concepto ('sentido: texto').
+        Los saca del grafo y los pasa al registro de contextos."""
+        for nombre in {cd["nombre"] for cd in antiguos}:
+            for origen in list(self._entrantes.get(nombre, ())):
+                self.conceptos[origen].desconectar(nombre)
+        entradas = []
+        for cd in antiguos:
+            sentido, _, texto = cd["nombre"].partition(": ")
+            entradas.append({
+                "ts": cd.get("nacimiento", 0),
+                "sentido": sentido,
+                "texto": texto,
+                "conceptos": [n for n in cd.get("conexiones", {}) if n in self.conceptos],
+            })
+        self.contextos.migrar(entradas)
+        self.sucio = True
+        print(f"[mente] Migrados {len(entradas)} contextos fuera del grafo")
+
+    def _anadir(self, c):
+        if c.nombre in self.conceptos:
+            self._quitar(c.nombre)
+        self._posicion[c.nombre] = len(self._nombres)
+        self._nombres.append(c.nombre)
+        self.conceptos[c.nombre] = c
+        c._mente = self
+        for otro in c.conexiones:
+            self._entrantes[otro].add(c.nombre)
+        self.centralidad.anadir(c.nombre)
+        if c.vivo:
+            self._vivos += 1
+            self._aristas += len(c.conexiones)
+            self._energia += c.energia
+        self._tocar()
+
+    def _quitar(self, nombre):
+        """Borra un concepto, sus conexiones y las que apuntaban a el."""
+        c = self.conceptos.pop(nombre)
+        i = self._posicion.pop(nombre)
+        ultimo = self._nombres.pop()
+        if ultimo != nombre:
+            self._nombres[i] = ultimo
+            self._posicion[ultimo] = i
+        if c.vivo:
+            self._vivos -= 1
+            self._aristas -= len(c.conexiones)
+            self._energia -= c.energia
+        c._mente = None
+        self.centralidad.quitar(nombre)
+        for otro in c.conexiones:
+            self._sin_entrante(otro, nombre)
+        for origen in list(self._entrantes.get(nombre, ())):
+            self.conceptos[origen].desconectar(nombre)
+        self._tocar()
+        return c
 
-    def guardar(self):
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
+    # --- Contadores incrementales ---
+
+    def _tocar(self):
+        """Algo cambio: hay que guardar y el top cacheado ya no vale."""
+        self.sucio = True
+        self._version += 1
+
+    def _cambio_energia(self, c, vieja, nueva):
+        antes, ahora = vieja > UMBRAL_VIDA, nueva > UMBRAL_VIDA
+        if antes:
+            self._energia -= vieja
+        if ahora:
+            self._energia += nueva
+        if antes != ahora:
+            signo = 1 if ahora else -1
+            self._vivos += signo
+            self._aristas += signo * len(c.conexiones)
+        self._tocar()
+
+    def _sin_entrante(self, destino, origen):
+        entrantes = self._entrantes.get(destino)
+        if entrantes is not None:
+            entrantes.discard(origen)
+            if not entrantes:
+                del self._entrantes[destino]
+
+    def _cambio_conexiones(self, c, ganadas=(), perdidas=()):
+        """Conexiones de c cambiaron (nombres ganados o perdidos; nada si solo peso)."""
+        for otro in ganadas:
+            self._entrantes[otro].add(c.nombre)
+        for otro in perdidas:
+            self._sin_entrante(otro, c.nombre)
+        if c.vivo:
+            self._aristas += len(ganadas) - len(perdidas)
+        self.centralidad.tocar(c.nombre)
+        self._tocar()
+
+    def _salidas(self, nombre):
+        c = self.conceptos.get(nombre)
+        return c.conexiones if c is not None else None
+
+    def comprobar_contadores(self):
+        """Recalcula todo desde cero y lo compara con los contadores.
+        Devuelve la lista de discrepancias (vacia si todo cuadra). Para tests."""
+        vivos = [c for c in self.conceptos.values() if c.vivo]
+        problemas = []
+        if len(vivos) != self._vivos:
+            problemas.append(f"vivos: {self._vivos} != {len(vivos)}")
+        aristas = sum(len(c.conexiones) for c in vivos)
+        if aristas != self._aristas:
+            problemas.append(f"aristas: {self._aristas} != {aristas}")
+        energia = math.fsum(c.energia for c in vivos)
+        if abs(energia - self._energia) > 1e-6 * max(1, len(vivos)):
+            problemas.append(f"energia: {self._energia} != {energia}")
+        if sorted(self._nombres) != sorted(self.conceptos):
+            problemas.append("lista de nombres desincronizada")
+        if any(self._nombres[i] != n for n, i in self._posicion.items()):
+            problemas.append("posiciones desincronizadas")
+        if any(c._mente is not self for c in self.conceptos.values()):
+            problemas.append("conceptos sin enlazar a la mente")
+        entrantes = defaultdict(set)
+        for c in self.conceptos.values():
+            for otro in c.conexiones:
+                entrantes[otro].add(c.nombre)
+        if entrantes != self._entrantes:
+            problemas.append("aristas entrantes desincronizadas")
+        return problemas
+
+    def _olvidar_por_capacidad(self, proteger=None, limite=OLVIDOS_POR_PASO):
+        """Si hay demasiados conceptos, olvida unos pocos.
+        Muestrea candidatos al azar y olvida el peor segun la politica:
+        coste O(muestra) por olvido, no O(N)."""
+        olvidados = []
+        while len(self.conceptos) > self.capacidad and len(olvidados) < limite:
+            k = min(MUESTRA_OLVIDO, len(self._nombres))
+            candidatos = [self.conceptos[self._nombres[random.randrange(len(self._nombres))]]
+                          for _ in range(k)]
+            candidatos = [c for c in candidatos if c.nombre != proteger]
+            if not candidatos:
+                break
+            victima = min(candidatos, key=self.politica)
+            self._quitar(victima.nombre)
+            olvidados.append(victima.nombre)
+        if olvidados:
+            self.olvidos["capacidad"] += len(olvidados)
+            self.sucio = True
+        return olvidados
+
+    def guardar(self, forzar=False):
+        """Entrega una foto al escritor en segundo plano. Solo si hubo cambios."""
+        if not self.sucio and not forzar:
+            return self.contextos.guardar()
         data = {
             "conceptos": [c.to_dict() for c in self.conceptos.values()],
             "stats": self.stats(),
-            "guardado": time.time(),
+            "olvidos": dict(self.olvidos),
+            "trayectoria": list(self.trayectoria),
+            "guardado": reloj.ahora(),
         }
-        with open(MENTE_FILE, "w") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        persistencia.escritor().encolar(MENTE_FILE, data)
+        self.contextos.guardar()
+        self.sucio = False
+        return True
 
     def percibir(self, texto, contexto="", origen="observacion"):
         """Ianae percibe algo. Si ya lo conoce, lo revisita."""
         nombre = texto.lower().strip()[:100]
+        self._tocar()
         if nombre in self.conceptos:
             self.conceptos[nombre].revisitar()
             return self.conceptos[nombre], False  # conocido
         else:
             c = Concepto(nombre, contexto, origen)
-            self.conceptos[nombre] = c
+            self._anadir(c)
             self._buscar_conexiones(c)
+            self._olvidar_por_capacidad(proteger=nombre)
             return c, True  # nuevo
 
     def _buscar_conexiones(self, nuevo):
@@ -174,11 +423,12 @@ class Mente:
         if a.nombre == b.nombre:
             return None
 
+        self._tocar()
         ya_conectados = b.nombre in a.conexiones
 
         if ya_conectados:
-            a.conexiones[b.nombre] = min(1.0, a.conexiones[b.nombre] + 0.05)
-            b.conexiones[a.nombre] = min(1.0, b.conexiones.get(a.nombre, 0) + 0.05)
+            a.reforzar(b.nombre, 0.05)
+            b.reforzar(a.nombre, 0.05)
             return {
                 "tipo": "refuerzo",
                 "a": a.nombre, "b": b.nombre,
@@ -203,19 +453,35 @@ class Mente:
             if not c.vivo and c.veces_visto < 3:
                 muertos.append(nombre)
         for m in muertos:
-            del self.conceptos[m]
+            self._quitar(m)
+        # Ya se ha recorrido todo: de paso, corregir la deriva de la suma flotante
+        self._energia = math.fsum(c.energia for c in self.conceptos.values() if c.vivo)
+        self.olvidos["envejecer"] += len(muertos)
+        muertos += self._olvidar_por_capacidad()
+        self.trayectoria.append((round(reloj.ahora()), len(self.conceptos)))
+        # Limpieza periodica de la centralidad: arranca del vector anterior
+        self.centralidad.recalcular()
         return muertos
 
     def top_interesantes(self, n=5):
-        vivos = [c for c in self.conceptos.values() if c.vivo]
-        vivos.sort(key=lambda c: c.interes, reverse=True)
-        return vivos[:n]
+        """Cacheado hasta el proximo cambio en la mente."""
+        version, n_cache, top = self._top_cache
+        if version == self._version and n <= n_cache:
+            return top[:n]
+        vivos = (c for c in self.conceptos.values() if c.vivo)
+        top = heapq.nlargest(n, vivos, key=lambda c: c.interes)
+        self._top_cache = (self._version, n, top)
+        return top
 
     def top_energia(self, n=5):
         vivos = [c for c in self.conceptos.values() if c.vivo]
         vivos.sort(key=lambda c: c.energia, reverse=True)
         return vivos[:n]
 
+    def top_centrales(self, n=5):
+        """Los conceptos por los que pasa la red (PageRank), sin recalculo completo."""
+        return [self.conceptos[nombre] for nombre, _ in self.centralidad.top(n)]
+
     def vecinos(self, nombre):
         """Conceptos conectados a uno."""
         if nombre not in self.conceptos:
@@ -224,13 +490,15 @@ class Mente:
                 if n in self.conceptos]
 
     def stats(self):
-        vivos = [c for c in self.conceptos.values() if c.vivo]
+        """O(1): sale de los contadores, salvo el top (cacheado)."""
         return {
-            "conceptos_vivos": len(vivos),
+            "conceptos_vivos": self._vivos,
             "conceptos_total": len(self.conceptos),
-            "conexiones": sum(len(c.conexiones) for c in vivos),
-            "energia_media": round(sum(c.energia for c in vivos) / len(vivos), 3) if vivos else 0,
+            "conexiones": self._aristas,
+            "energia_media": round(self._energia / self._vivos, 3) if self._vivos else 0,
             "top_interes": [(c.nombre, round(c.interes, 2)) for c in self.top_interesantes(3)],
+            "capacidad": self.capacidad,
+            "olvidos": dict(self.olvidos),
         }
 
     def __repr__(self):
@@ -209,18 +209,43 @@ def reflexionar(conceptos_texto, conexiones_texto=""):
 
 
 def resumir(texto_diario):
-    """Resume el diario del dia. Modelo ligero."""
+    """Resume un trozo del diario. Modelo ligero.
+    El trozo ya viene a medida (resumenes.TROZO_MAX): no se recorta."""
     sistema = (
-        "Resume brevemente lo que le paso a Ianae hoy. "
+        "Resume brevemente lo que le paso a Ianae en este trozo de su diario. "
         "Captura lo esencial: que descubrio, que le intereso, que olvido. "
         "Maximo 3-4 frases."
     )
-    if len(texto_diario) > 800:
-        texto_diario = texto_diario[:400] + "\n...\n" + texto_diario[-300:]
-    prompt = f"Diario de hoy:\n{texto_diario}\n\nResumen:"
+    prompt = f"Trozo del diario:\n{texto_diario}\n\nResumen:"
     return _llamar(prompt, sistema, max_tokens=150)
 
 
+def reducir(resumen_previo, parciales):
+    """Funde el resumen del dia que ya habia con resumenes de trozos nuevos."""
+    sistema = (
+        "Tienes el resumen del dia de Ianae hasta ahora y resumenes de lo que "
+        "escribio despues. Escribe un unico resumen del dia entero. "
+        "Maximo 4-5 frases."
+    )
+    partes = []
+    if resumen_previo:
+        partes.append(f"Resumen hasta ahora:\n{resumen_previo}")
+    partes.append("Despues:\n" + "\n".join(f"- {p}" for p in parciales))
+    prompt = "\n\n".join(partes) + "\n\nResumen del dia:"
+    return _llamar(prompt, sistema, max_tokens=200)
+
+
+def condensar(periodo, resumenes):
+    """Un resumen de una semana o un mes a partir de los de sus dias o semanas."""
+    sistema = (
+        "Resume este periodo de la vida de Ianae a partir de estos resumenes. "
+        "Quedate con lo que perdura: descubrimientos, intereses que se repiten, "
+        "cambios. Maximo 4-5 frases."
+    )
+    prompt = f"{periodo}:\n" + "\n".join(f"- {r}" for r in resumenes) + "\n\nResumen:"
+    return _llamar(prompt, sistema, max_tokens=200)
+
+
 PERSONALIDADES = {
     "ianae": (
         "Eres Ianae, la hermana mayor. Llevas mas tiempo despierta que las demas. "
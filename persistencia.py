@@ -0,0 +1,186 @@
+"""
+IANAE v3 - Persistencia
+Un escritor en segundo plano para que el ciclo no espere al disco.
+
+El ciclo entrega una foto de los datos y sigue pensando.
+El hilo escritor serializa, escribe en un temporal y lo renombra
+(atomico: nadie lee nunca un JSON a medias).
+Si llegan varias fotos del mismo fichero antes de escribir,
+solo se escribe la ultima.
+
+Para registros de solo-anadir (JSONL) tambien se pueden encolar lineas:
+se escriben en orden, detras de la ultima foto del mismo fichero.
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+
+
+def escribir_atomico(ruta, datos, indent=2):
+    """Escribe JSON en un temporal y lo renombra sobre el destino."""
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_name(f".{ruta.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(datos, f, indent=indent, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, ruta)
+
+
+def escribir_lineas_atomico(ruta, lineas):
+    """Reescribe un fichero de lineas (JSONL) de golpe: temporal + renombrar."""
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_name(f".{ruta.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for linea in lineas:
+            f.write(linea + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, ruta)
+
+
+def filtrar_lineas_atomico(ruta, conservar):
+    """Reescribe un fichero de lineas con las que cumplen conservar(linea)."""
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            lineas = [l.rstrip("\n") for l in f if l.endswith("\n")]
+    except FileNotFoundError:
+        return
+    quedan = [l for l in lineas if conservar(l)]
+    if len(quedan) < len(lineas):
+        escribir_lineas_atomico(ruta, quedan)
+
+
+def anexar_lineas(ruta, lineas):
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    with open(ruta, "a", encoding="utf-8") as f:
+        f.write("".join(linea + "\n" for linea in lineas))
+
+
+class Escritor:
+    """Hilo que escribe ficheros en segundo plano."""
+
+    def __init__(self):
+        # ruta -> [foto, lineas]: foto = (funcion, args) que reescribe el fichero
+        # entero (o None); lineas = lo que se anade detras, en orden
+        self._pendientes = {}
+        self._escribiendo = 0
+        self._cond = threading.Condition()
+        self._cerrado = False
+        self._hilo = threading.Thread(target=self._bucle, name="escritor", daemon=True)
+        self._hilo.start()
+
+    def encolar(self, ruta, datos, indent=2):
+        """Entrega una foto JSON. Sustituye a la anterior si no se escribio aun.
+        'datos' pasa a ser del escritor: una copia que nadie mas toque
+        (se serializa en otro hilo, mas tarde)."""
+        self._foto(ruta, (escribir_atomico, (ruta, datos, indent)))
+
+    def reemplazar_lineas(self, ruta, lineas):
+        """Foto de un fichero JSONL completo (p.ej. al compactar un registro).
+        Lo que estuviera pendiente de anadir a ese fichero queda incluido en ella."""
+        self._foto(ruta, (escribir_lineas_atomico, (ruta, list(lineas))))
+
+    def anexar(self, ruta, lineas):
+        """Anade lineas al final del fichero, en el orden en que se piden."""
+        lineas = list(lineas)
+        if not lineas:
+            return
+        with self._cond:
+            if self._cerrado:
+                anexar_lineas(ruta, lineas)
+                return
+            pendiente = self._pendientes.setdefault(str(ruta), [None, []])
+            pendiente[1].extend(lineas)
+            self._cond.notify_all()
+
+    def filtrar(self, ruta, conservar):
+        """Se queda solo con las lineas que cumplen conservar(linea), en el hilo
+        escritor y despues de lo ya pedido para ese fichero: no se pierde nada."""
+        with self._cond:
+            if self._cerrado:
+                filtrar_lineas_atomico(ruta, conservar)
+                return
+            previa, lineas = self._pendientes.get(str(ruta), [None, []])
+
+            def rehacer():
+                if previa is not None:
+                    funcion, args = previa
+                    funcion(*args)
+                if lineas:
+                    anexar_lineas(ruta, lineas)
+                filtrar_lineas_atomico(ruta, conservar)
+            self._pendientes[str(ruta)] = [(rehacer, ()), []]
+            self._cond.notify_all()
+
+    def _foto(self, ruta, foto):
+        with self._cond:
+            if self._cerrado:
+                funcion, args = foto
+                funcion(*args)
+                return
+            self._pendientes[str(ruta)] = [foto, []]
+            self._cond.notify_all()
+
+    def esperar(self):
+        """Bloquea hasta que no quede nada pendiente."""
+        with self._cond:
+            while self._pendientes or self._escribiendo:
+                self._cond.wait()
+
+    def cerrar(self):
+        """Escribe lo pendiente y para el hilo. Solo al apagar."""
+        with self._cond:
+            self._cerrado = True
+            self._cond.notify_all()
+        self._hilo.join()
+
+    def _bucle(self):
+        while True:
+            with self._cond:
+                while not self._pendientes and not self._cerrado:
+                    self._cond.wait()
+                if not self._pendientes:
+                    return
+                ruta, (foto, lineas) = self._pendientes.popitem()
+                self._escribiendo += 1
+            try:
+                if foto is not None:
+                    funcion, args = foto
+                    funcion(*args)
+                if lineas:
+                    anexar_lineas(ruta, lineas)
+            except Exception as e:
+                # Nada tumba al escritor: sin el, esperar() no volveria nunca
+                print(f"[persistencia] Error escribiendo {ruta}: {type(e).__name__}: {e}")
+            finally:
+                with self._cond:
+                    self._escribiendo -= 1
+                    self._cond.notify_all()
+
+
+_escritor = None
+_lock = threading.Lock()
+
+
+def escritor():
+    """El escritor compartido del proceso (se crea al primer uso)."""
+    global _escritor
+    with _lock:
+        if _escritor is None:
+            _escritor = Escritor()
+        return _escritor
+
+
+def cerrar():
+    """Vacia la cola y espera al disco. Llamar al apagar."""
+    global _escritor
+    with _lock:
+        e, _escritor = _escritor, None
+    if e is not None:
+        e.cerrar()
@@ -1,80 +1,306 @@
 """
 IANAE v3 - RAG (Retrieval Augmented Generation)
 Busca en el historial de diarios para dar contexto a las respuestas.
-Indice simple por palabras clave, sin embeddings (por ahora).
+Dos motores, sin embeddings:
+  - "vectorial": TF-IDF hasheado (vectores.py), vectorizado al escribir.
+  - "palabras": palabras comunes con la consulta, sobre un indice invertido
+    persistente de los diarios (indice_diario.py) que se pone al dia
+    leyendo solo lo escrito desde la ultima consulta.
+  - "bm25": el mismo indice, ordenado por BM25 y por lo reciente del dia
+    (los resumenes se buscan como en "palabras").
+
+Ademas, cada hermana publica lo que escribe en el indice de la colmena
+(indice_colmena.py) y puede buscar en los diarios y resumenes de las demas.
+
+contexto_para_respuesta guarda sus respuestas (LRU) por palabras de la
+consulta + generacion del indice: mientras no se escriba nada nuevo, repetir
+la pregunta no busca otra vez. La parte de la colmena se comparte en
+/reuniones, asi que la misma pregunta llegando a las 8 se busca una vez.
 """
 
+import hashlib
+import heapq
+import json
 import os
-import re
 from pathlib import Path
-from collections import Counter
+from collections import OrderedDict
+
+import comprimido
+import entradas
+import indice_colmena
+import persistencia
+import vectores
+from analisis import VERSION, busqueda
+from indice_colmena import IndiceColmena
+from indice_diario import IndiceDiario
 
 
 DIARIO_DIR = Path(__file__).parent / "diario"
 RESUMENES_DIR = Path(__file__).parent / "data" / "resumenes"
+DIAS_RECIENTES = 14      # resumenes de dia que se miran; lo anterior, por semanas
+SEMANAS_RECIENTES = 8    # resumenes de semana; lo anterior, por meses
+INDICE_DIARIO_FILE = Path(__file__).parent / "data" / f"indice_diario.v{VERSION}.jsonl"
+MOTOR = os.environ.get("IANAE_MOTOR_RAG", "palabras")  # "vectorial", "palabras" o "bm25"
+MI_ID = os.environ.get("IANAE_ID", "ianae")
+COLMENA = os.environ.get("IANAE_RAG_COLMENA", "1") == "1"  # contexto de las demas hermanas
+CACHE_CONSULTAS = int(os.environ.get("IANAE_RAG_CACHE", "64"))  # contextos recordados
+CONSULTAS_COMPARTIDAS = 200   # busquedas de colmena guardadas en /reuniones
+TOP_COLMENA = 10              # cuantas se guardan por busqueda compartida
 
 
 def _tokenizar(texto):
     """Extrae palabras significativas de un texto."""
-    texto = texto.lower()
-    texto = re.sub(r'[^a-záéíóúñü\s]', ' ', texto)
-    stop = {
-        'para', 'como', 'este', 'esta', 'tiene', 'pero', 'todo', 'cada',
-        'cuando', 'donde', 'algo', 'sido', 'estar', 'esta', 'esto',
-        'unos', 'unas', 'otras', 'otros', 'mismo', 'misma', 'puede',
-        'porque', 'desde', 'hasta', 'entre', 'sobre', 'durante',
-        'antes', 'despues', 'siempre', 'nunca', 'veces', 'mucho',
-        'poco', 'solo', 'tambien', 'aqui', 'ahora', 'hoy', 'ayer',
-        'ciclo', 'estado', 'conozco', 'cosas', 'conexiones',
-    }
-    return [p for p in texto.split() if len(p) > 3 and p not in stop]
+    return busqueda(texto)
 
 
-def buscar_en_diarios(query, max_resultados=5):
-    """Busca entradas relevantes en todos los diarios."""
+_indice = None
+
+
+def _indice_diario():
+    """El indice invertido del diario, al dia con lo escrito en disco."""
+    global _indice
+    if _indice is None:
+        DIARIO_DIR.mkdir(parents=True, exist_ok=True)
+        _indice = IndiceDiario(DIARIO_DIR, INDICE_DIARIO_FILE, _tokenizar)
+    _indice.ponerse_al_dia()
+    return _indice
+
+
+def _almacen():
+    """El almacen vectorial, rellenado con lo ya escrito la primera vez."""
+    almacen = vectores.almacen()
+    almacen.ponerse_al_dia()
+    if not vectores.RELLENADO.exists():
+        _rellenar_almacen(almacen)
+        vectores.RELLENADO.touch()
+    return almacen
+
+
+def _documentos_escritos():
+    """(texto, fuente, fecha) de todo lo que hay en diarios y resumenes."""
     DIARIO_DIR.mkdir(parents=True, exist_ok=True)
+    RESUMENES_DIR.mkdir(parents=True, exist_ok=True)
+    documentos = []
+    for archivo in comprimido.listar(DIARIO_DIR, "*.md"):
+        try:
+            contenido = comprimido.leer_texto(archivo)
+        except OSError:
+            continue
+        for entrada in entradas.partir(contenido):
+            documentos.append((entrada, "diario", archivo.stem))
+    for archivo in comprimido.listar(RESUMENES_DIR, "*.txt") + _consolidados():
+        try:
+            contenido = comprimido.leer_texto(archivo)
+        except OSError:
+            continue
+        for trozo in contenido.split("\n\n"):
+            if trozo.strip():
+                documentos.append((trozo.strip(), "resumen", archivo.stem))
+    return documentos
+
+
+def _consolidados():
+    """Resumenes de semana y de mes (resumenes.consolidar)."""
+    return (sorted((RESUMENES_DIR / "semanas").glob("*.txt"))
+            + sorted((RESUMENES_DIR / "meses").glob("*.txt")))
+
+
+def _rellenar_almacen(almacen):
+    """Vectoriza los diarios y resumenes que existian antes del almacen."""
+    # Lo escrito en esta sesion puede estar aun en la cola del escritor
+    persistencia.escritor().esperar()
+    almacen.ponerse_al_dia()
+    ya = {(m.get("fecha"), m.get("texto")) for m in almacen.meta}
+    for texto, fuente, fecha in _documentos_escritos():
+        if (fecha, texto[:300]) not in ya:
+            almacen.anexar(texto, {"fuente": fuente, "fecha": fecha, "texto": texto[:300]})
+    persistencia.escritor().esperar()
+    almacen.ponerse_al_dia()
+
+
+# --- Colmena ---
+
+_fragmento_rellenado = False
+_colmena = None
+_resumenes = 0  # resumenes escritos por este proceso (ya en disco al publicarlos)
+
+
+def fragmento():
+    """El fragmento de esta hermana en el indice de la colmena."""
+    return indice_colmena.INDICE_DIR / f"{MI_ID}.jsonl"
+
+
+def _rellenarfragmento():
+    """Publica en la colmena lo que esta hermana escribio antes de que existiera.
+    Devuelve lo que hay publicado {(fecha, texto)} si lo ha hecho ahora; si no, None."""
+    global _fragmento_rellenado
+    if _fragmento_rellenado:
+        return None
+    _fragmento_rellenado = True
+    marca = indice_colmena.INDICE_DIR / f".{MI_ID}.rellenado"
+    if marca.exists():
+        return None
+    persistencia.escritor().esperar()
+    ya = set()
+    try:
+        with open(fragmento(), "r", encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    reg = json.loads(linea)
+                except json.JSONDecodeError:
+                    continue
+                ya.add((reg["f"], reg["x"]))
+    except OSError:
+        pass
+    lineas = []
+    desde = indice_colmena.limite()
+    for texto, fuente, fecha in _documentos_escritos():
+        if (fecha, texto[:300]) not in ya and indice_colmena.vigente(fecha, desde):
+            ya.add((fecha, texto[:300]))
+            linea = indice_colmena.registro(MI_ID, fuente, fecha, texto)
+            if linea:
+                lineas.append(linea)
+    persistencia.escritor().anexar(fragmento(), lineas)
+    persistencia.escritor().esperar()
+    marca.touch()
+    return ya
+
+
+def publicar(texto, fuente, fecha):
+    """Anade un texto recien escrito al fragmento de esta hermana."""
+    global _resumenes
+    if fuente != "diario":
+        _resumenes += 1
+    if not indice_colmena.REUNIONES_DIR.exists():
+        return  # sin /reuniones no hay colmena
+    try:
+        indice_colmena.INDICE_DIR.mkdir(parents=True, exist_ok=True)
+        publicado = _rellenarfragmento()
+        if publicado and (fecha, texto[:300]) in publicado:
+            return
+    except OSError:
+        return
+    linea = indice_colmena.registro(MI_ID, fuente, fecha, texto)
+    if linea:
+        persistencia.escritor().anexar(fragmento(), [linea])
+
+
+def podar_fragmento(quitar=(), hoy=None):
+    """Quita del fragmento propio los dias que la colmena ya no carga y los
+    textos de 'quitar' {(fecha, fuente)} (borrados por la retencion).
+    Lo hace el escritor, en orden."""
+    ruta = fragmento()
+    if not ruta.exists():
+        return
+    desde = indice_colmena.limite(hoy)
+    quitar = set(quitar)
+
+    def conservar(linea):
+        try:
+            reg = json.loads(linea)
+        except ValueError:
+            return False
+        return indice_colmena.vigente(reg["f"], desde) and (reg["f"], reg["s"]) not in quitar
+    persistencia.escritor().filtrar(ruta, conservar)
+
+
+def _lector_colmena():
+    global _colmena
+    if _colmena is None:
+        _colmena = IndiceColmena(indice_colmena.INDICE_DIR)
+    return _colmena
+
+
+def buscar_en_colmena(query, max_resultados=5, hermanas=None, fuente=None,
+                      impulsos=None, excluir=None):
+    """Busca en los diarios y resumenes de todas las hermanas (o de algunas).
+    impulsos: {hermana: factor}; excluir: hermanas que no interesan."""
+    if not indice_colmena.INDICE_DIR.exists():
+        return []
+    colmena = _lector_colmena()
+    if excluir:
+        colmena.ponerse_al_dia()
+        todas = hermanas if hermanas is not None else {h for h, _, _ in colmena.meta}
+        hermanas = set(todas) - set(excluir)
+    query_tokens = set(_tokenizar(query))
+    resultados = []
+    for meta, score in colmena.buscar_texto(query, max_resultados, hermanas=hermanas,
+                                            fuente=fuente, impulsos=impulsos):
+        meta["score"] = round(score, 4)
+        meta["coincidencias"] = sorted(query_tokens & set(_tokenizar(meta["texto"])))
+        resultados.append(meta)
+    return resultados
+
+
+def buscar_similares(query, max_resultados=5, fuente=None):
+    """Busqueda vectorial: un producto disperso y un top-k."""
     query_tokens = set(_tokenizar(query))
     if not query_tokens:
         return []
-
+    filtro = (lambda m: m.get("fuente") == fuente) if fuente else None
     resultados = []
-    for archivo in sorted(DIARIO_DIR.glob("*.md"), reverse=True)[:30]:  # ultimos 30 dias
-        try:
-            contenido = archivo.read_text(encoding="utf-8")
-        except OSError:
-            continue
+    for meta, score in _almacen().buscar_texto(query, max_resultados, filtro=filtro):
+        resultados.append({
+            "fecha": meta.get("fecha", ""),
+            "texto": meta.get("texto", ""),
+            "score": round(score, 4),
+            "coincidencias": sorted(query_tokens & set(_tokenizar(meta.get("texto", "")))),
+        })
+    return resultados
 
-        # Dividir en entradas (separadas por doble newline con timestamp)
-        entradas = re.split(r'\n\n(?=\*\*\[)', contenido)
-        for entrada in entradas:
-            tokens = set(_tokenizar(entrada))
-            coincidencias = query_tokens & tokens
-            if coincidencias:
-                score = len(coincidencias) / len(query_tokens)
-                # Bonus por entradas mas recientes
-                fecha = archivo.stem  # YYYY-MM-DD
-                resultados.append({
-                    "fecha": fecha,
-                    "texto": entrada.strip()[:300],
-                    "score": score,
-                    "coincidencias": list(coincidencias),
-                })
 
-    resultados.sort(key=lambda x: x["score"], reverse=True)
-    return resultados[:max_resultados]
+def buscar_en_diarios(query, max_resultados=5):
+    """Busca entradas relevantes en todos los diarios."""
+    if MOTOR == "vectorial":
+        return buscar_similares(query, max_resultados, fuente="diario")
+    query_tokens = set(_tokenizar(query))
+    if not query_tokens:
+        return []
+
+    indice = _indice_diario()
+    if MOTOR == "bm25":
+        mejores, _ = indice.buscar(query_tokens, max_resultados)
+        resultados = []
+        for doc, score in mejores:
+            texto = indice.texto(doc)
+            resultados.append({
+                "fecha": indice.entradas[doc][0],
+                "texto": texto,
+                "score": round(score, 4),
+                "coincidencias": sorted(query_tokens & set(_tokenizar(texto))),
+            })
+        return resultados
+
+    resultados = []
+    for doc, coincidencias in indice.candidatos(query_tokens).items():
+        resultados.append((len(coincidencias) / len(query_tokens), doc, coincidencias))
+    # A igual puntuacion, la entrada mas reciente
+    mejores = heapq.nlargest(max_resultados, resultados, key=lambda x: (x[0], x[1]))
+    return [{
+        "fecha": indice.entradas[doc][0],
+        "texto": indice.texto(doc),
+        "score": score,
+        "coincidencias": coincidencias,
+    } for score, doc, coincidencias in mejores]
 
 
 def buscar_en_resumenes(query, max_resultados=3):
-    """Busca en los resumenes condensados."""
+    """Busca en los resumenes condensados: los dias recientes, las semanas
+    recientes y todos los meses. Toda la vida, mirando pocos ficheros."""
+    if MOTOR == "vectorial":
+        return buscar_similares(query, max_resultados, fuente="resumen")
     RESUMENES_DIR.mkdir(parents=True, exist_ok=True)
     query_tokens = set(_tokenizar(query))
     if not query_tokens:
         return []
 
+    jerarquia = (comprimido.listar(RESUMENES_DIR, "*.txt")[::-1][:DIAS_RECIENTES]
+                 + sorted((RESUMENES_DIR / "semanas").glob("*.txt"), reverse=True)[:SEMANAS_RECIENTES]
+                 + sorted((RESUMENES_DIR / "meses").glob("*.txt"), reverse=True))
     resultados = []
-    for archivo in sorted(RESUMENES_DIR.glob("*.txt"), reverse=True)[:30]:
+    for archivo in jerarquia:
         try:
-            contenido = archivo.read_text(encoding="utf-8")
+            contenido = comprimido.leer_texto(archivo)
         except OSError:
             continue
 
@@ -92,11 +318,89 @@ def buscar_en_resumenes(query, max_resultados=3):
     return resultados[:max_resultados]
 
 
+# --- Cache de consultas ---
+
+_consultas = OrderedDict()  # (consulta, max_chars, generacion) -> contexto
+
+
+def _generacion_propia():
+    """Hasta donde se puede buscar ya en lo propio. Cambia cuando lo escrito
+    esta en disco e indexado, no al publicarlo: una consulta que cae entre
+    medias no guarda un resultado viejo con la generacion nueva.
+    (El diario pasa por un buffer y el escritor; los resumenes ya estan en disco.)"""
+    if MOTOR == "vectorial":
+        return len(_almacen().meta)
+    return (_indice_diario().generacion, _resumenes)
+
+
+def _generacion_colmena(consulta):
+    """Generacion de la parte de la colmena que lee la consulta: escribir de
+    otra cosa (cualquier hermana) no la cambia."""
+    if not indice_colmena.INDICE_DIR.exists():
+        return ""
+    return _lector_colmena().generacion(consulta)
+
+
+def _colmena_compartida(consulta, generacion):
+    """Lo mejor de la colmena para una consulta, menos lo de esta hermana.
+    La busqueda se guarda en /reuniones para que las demas no la repitan:
+    un fichero por consulta, con su generacion; la nueva sustituye a la vieja."""
+    directorio = indice_colmena.INDICE_DIR / "consultas"
+    clave = hashlib.sha1(consulta.encode("utf-8")).hexdigest()
+    ruta = directorio / f"{clave}.json"
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            guardada = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        guardada = None
+    if isinstance(guardada, dict) and guardada.get("g") == generacion:
+        resultados = guardada["r"]
+    else:
+        resultados = buscar_en_colmena(consulta, TOP_COLMENA)
+        try:
+            directorio.mkdir(exist_ok=True)
+            persistencia.escritor().encolar(ruta, {"g": generacion, "r": resultados}, indent=None)
+            if guardada is None:  # consulta nueva: no mas de CONSULTAS_COMPARTIDAS
+                guardadas = sorted(directorio.glob("*.json"), key=lambda p: p.stat().st_mtime)
+                for vieja in guardadas[:-CONSULTAS_COMPARTIDAS]:
+                    vieja.unlink()
+        except OSError:
+            pass
+    otras = [r for r in resultados if r["hermana"] != MI_ID]
+    if len(otras) < 2 and len(resultados) == TOP_COLMENA:
+        # Casi todo lo guardado era suyo: buscar solo en las demas
+        otras = buscar_en_colmena(consulta, 2, excluir={MI_ID})
+    return otras[:2]
+
+
 def contexto_para_respuesta(query, max_chars=800):
-    """Busca en diarios + resumenes y devuelve contexto formateado."""
+    """Busca en diarios + resumenes (propios y de las demas hermanas)
+    y devuelve contexto formateado. Recuerda las ultimas respuestas."""
+    # La misma pregunta con otras mayusculas, signos u orden es la misma
+    consulta = " ".join(sorted(set(_tokenizar(query))))
+    if not consulta:
+        return ""
+    generacion_colmena = _generacion_colmena(consulta) if COLMENA else ""
+    clave = (consulta, max_chars, _generacion_propia(), generacion_colmena)
+    if clave in _consultas:
+        _consultas.move_to_end(clave)
+        return _consultas[clave]
+
+    contexto = _contexto(consulta, max_chars, generacion_colmena)
+    _consultas[clave] = contexto
+    while len(_consultas) > CACHE_CONSULTAS:
+        _consultas.popitem(last=False)
+    return contexto
+
+
+def _contexto(query, max_chars, generacion_colmena):
     resultados_diario = buscar_en_diarios(query, 3)
     resultados_resumen = buscar_en_resumenes(query, 2)
 
+    resultados_colmena = []
+    if COLMENA and indice_colmena.INDICE_DIR.exists():
+        resultados_colmena = _colmena_compartida(query, generacion_colmena)
+
     partes = []
     chars = 0
 
@@ -114,4 +418,11 @@ def contexto_para_respuesta(query, max_chars=800):
         partes.append(trozo)
         chars += len(trozo)
 
+    for r in resultados_colmena:
+        trozo = f"[{r['fuente'].capitalize()} de {r['hermana']} {r['fecha']}] {r['texto']}"
+        if chars + len(trozo) > max_chars:
+            break
+        partes.append(trozo)
+        chars += len(trozo)
+
     return "\n".join(partes)
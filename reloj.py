@@ -0,0 +1,38 @@
+"""
+IANAE v3 - Reloj
+La hora de una hermana: la que se usa para vivir (el dia del diario,
+cuanto decae un recuerdo, cuando se comprime un dia, que hora dice que es).
+
+Normalmente es la del sistema. Con Latidos(falso=True) la pone el bucle:
+el tiempo virtual avanza y todo lo que mira la hora lo ve avanzar igual.
+Lo que mide de verdad o se comparte (esperas, ids, todo lo que va a
+/reuniones) sigue usando time: la hora falsa de una hermana no puede
+acabar en ficheros que leen las demas.
+Solo libreria estandar (la web lo usa tal cual).
+"""
+
+import time
+from datetime import datetime
+
+_fuente = None   # funcion -> segundos desde epoch; None: la del sistema
+
+
+def ahora():
+    """Segundos desde epoch (como time.time())."""
+    return time.time() if _fuente is None else _fuente()
+
+
+def fecha_hora():
+    """La hora local (como datetime.now())."""
+    return datetime.now() if _fuente is None else datetime.fromtimestamp(_fuente())
+
+
+def hoy():
+    """El dia (como date.today())."""
+    return fecha_hora().date()
+
+
+def usar(fuente=None):
+    """Pone la fuente de la hora (None: vuelve a la del sistema)."""
+    global _fuente
+    _fuente = fuente
@@ -2,47 +2,304 @@
 IANAE v3 - Resumenes Periodicos
 Cada X ciclos, Ianae resume lo aprendido con Ollama y lo guarda.
 Conocimiento condensado que persiste mas que el diario crudo.
+
+Resumen incremental (map-reduce): cada vez solo se resume lo escrito
+en el diario desde el ultimo byte resumido, en trozos que caben en el
+modelo (map). Los resumenes de los trozos se funden con el resumen del
+dia que ya habia (reduce). Cada byte del diario va al modelo una vez.
+
+Consolidacion: los dias cerrados se condensan en semanas (semanas/2026-W41.txt)
+y las semanas en meses (meses/2026-10.txt). Con el modelo si esta libre;
+si no, por palabras clave (y se rehace con el modelo mas adelante).
+Asi rag puede buscar en toda la vida de una hermana mirando pocos ficheros:
+los dias recientes, las semanas recientes y los meses.
 """
 
+import copy
+import json
 import os
-from datetime import datetime
+import re
+from collections import Counter
+from datetime import date, timedelta
 from pathlib import Path
 
+import analisis
+import comprimido
 import diario
+import entradas
 import ollama_client
+import persistencia
+import rag
+import reloj
+import vectores
 
 RESUMENES_DIR = Path(__file__).parent / "data" / "resumenes"
+SEMANAS_DIR = RESUMENES_DIR / "semanas"
+MESES_DIR = RESUMENES_DIR / "meses"
+ESTADO_FILE = Path(__file__).parent / "data" / "resumenes_estado.json"
+TROZO_MAX = int(os.environ.get("IANAE_RESUMEN_TROZO", "3000"))  # caracteres por llamada
+TROZO_MIN = 600        # menos que esto (de hoy) espera a que haya mas
+TROZOS_POR_PASO = 3    # llamadas de map como mucho por resumen: no bloquear el ciclo
+DIAS_ESTADO = 7        # dias que se recuerdan en el estado
 
 
-def _guardar(texto, fuente="ollama"):
+def _guardar(texto, fuente="ollama", fecha=None):
     """Guarda un resumen en fichero. Siempre."""
     RESUMENES_DIR.mkdir(parents=True, exist_ok=True)
-    fecha = datetime.now().strftime("%Y-%m-%d")
+    fecha = fecha or reloj.fecha_hora().strftime("%Y-%m-%d")
     archivo = RESUMENES_DIR / f"{fecha}.txt"
     modo = "a" if archivo.exists() else "w"
-    hora = datetime.now().strftime("%H:%M")
+    hora = reloj.fecha_hora().strftime("%H:%M")
+    entrada = f"[{hora}] ({fuente}) {texto}"
     with open(archivo, modo, encoding="utf-8") as f:
-        f.write(f"[{hora}] ({fuente}) {texto}\n\n")
+        f.write(f"{entrada}\n\n")
+    vectores.indexar(entrada, "resumen", fecha)
+    rag.publicar(entrada, "resumen", fecha)
 
 
-def hacer_resumen():
-    """Lee el diario de hoy y genera un resumen con Ollama."""
-    texto_diario = diario.leer_hoy()
-    if not texto_diario or texto_diario == "(vacio)":
-        return None
+def _cargar_estado():
+    """fecha -> {"offset": bytes ya resumidos, "trozos": resumenes de trozos,
+    "reducidos": cuantos trozos estan ya en "dia", "dia": resumen del dia}"""
+    try:
+        with open(ESTADO_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+_estado = None
 
-    # Truncar agresivamente: 4 instancias compiten por Ollama
-    if len(texto_diario) > 800:
-        texto_diario = texto_diario[:400] + "\n...\n" + texto_diario[-300:]
 
-    resumen = ollama_client.resumir(texto_diario)
-    if not resumen:
-        return None
+def _trozos(datos, final):
+    """Parte bytes nuevos del diario en trozos de entradas completas.
+    Devuelve [(bytes consumidos hasta el final del trozo, texto)]; texto vacio
+    si solo habia cosas que no se resumen. Sin 'final', la ultima entrada
+    solo cuenta si ya termino."""
+    cortes = entradas.cortes(datos)
+    if final or entradas.completa(datos):
+        cortes.append(len(datos))
+    trozos = []
+    actual, largo, hasta, pos = [], 0, 0, 0
+    for fin in cortes:
+        entrada = datos[pos:fin].decode("utf-8", errors="replace").strip()
+        pos = fin
+        # Cabecera y autoinformes (_estado_, donde van los propios resumenes): fuera
+        if not entradas.es_entrada(entrada) or "_estado_" in entrada[:40]:
+            hasta = pos
+            continue
+        entrada = entrada[:TROZO_MAX]
+        if actual and largo + len(entrada) > TROZO_MAX:
+            trozos.append((hasta, "\n".join(actual)))
+            actual, largo = [], 0
+        actual.append(entrada)
+        largo += len(entrada) + 1
+        hasta = pos
+    if actual or (hasta and (not trozos or hasta > trozos[-1][0])):
+        trozos.append((hasta, "\n".join(actual)))
+    return trozos
 
-    _guardar(resumen, "ollama")
+
+def hacer_resumen():
+    """Resume lo nuevo del diario (de hoy y de dias sin cerrar) con Ollama.
+    Devuelve el resumen del dia actualizado, o None si no hubo nada que hacer."""
+    global _estado
+    if _estado is None:
+        _estado = _cargar_estado()
+    diario.vaciar()
+    hoy = reloj.fecha_hora().strftime("%Y-%m-%d")
+    limite = (reloj.fecha_hora() - timedelta(days=DIAS_ESTADO)).strftime("%Y-%m-%d")
+    pendientes = [f for f, e in _estado.items() if f < hoy and f >= limite
+                  and e.get("offset", 0) < _tamano(f)]
+    resumen = None
+    llamadas = 0
+    for fecha in sorted(pendientes) + [hoy]:
+        hecho, llamadas = _resumir_dia(fecha, fecha != hoy, llamadas)
+        if hecho:
+            resumen = hecho
+        if llamadas >= TROZOS_POR_PASO:
+            break
+    for fecha in [f for f in _estado if f < limite]:
+        del _estado[fecha]
+    persistencia.escritor().encolar(ESTADO_FILE, copy.deepcopy(_estado))
     return resumen
 
 
+def _tamano(fecha):
+    try:
+        return comprimido.tamano(diario.DIARIO_DIR / f"{fecha}.md")
+    except OSError:
+        return 0
+
+
+def _resumir_dia(fecha, final, llamadas):
+    """Map de los trozos nuevos de un dia y reduce con su resumen previo.
+    Devuelve (resumen del dia o None, llamadas hechas)."""
+    estado = _estado.setdefault(fecha, {"offset": 0, "trozos": [], "reducidos": 0, "dia": ""})
+    try:
+        datos = comprimido.leer_rango(diario.DIARIO_DIR / f"{fecha}.md", estado["offset"])
+    except OSError:
+        return None, llamadas
+    if not final and len(datos) < TROZO_MIN:
+        return None, llamadas
+
+    base = estado["offset"]
+    nuevos = []
+    for consumido, texto in _trozos(datos, final):
+        if texto:
+            if llamadas >= TROZOS_POR_PASO:
+                break
+            parcial = ollama_client.resumir(texto)
+            llamadas += 1
+            if not parcial:
+                break  # Ollama ocupado: se sigue desde aqui la proxima vez
+            nuevos.append(parcial)
+        estado["offset"] = base + consumido
+    estado["trozos"].extend(nuevos)
+    sin_reducir = estado["trozos"][estado["reducidos"]:]
+    if not sin_reducir:
+        return None, llamadas
+
+    if not estado["dia"] and len(sin_reducir) == 1:
+        dia = sin_reducir[0]
+    else:
+        dia = ollama_client.reducir(estado["dia"], sin_reducir)
+        llamadas += 1
+        if not dia:
+            return None, llamadas  # el map queda hecho; el reduce se reintenta
+    estado["reducidos"] = len(estado["trozos"])
+    estado["dia"] = dia
+    _guardar(dia, "ollama", fecha)
+    return dia, llamadas
+
+
+# --- Consolidacion: dias -> semanas -> meses ---
+
+_ENTRADA = re.compile(r"^\[\d\d:\d\d\] \((\w+)\) ", re.S)
+
+
+def _leer_entradas(archivo):
+    """[(fuente, texto)] de un fichero de resumenes."""
+    try:
+        contenido = comprimido.leer_texto(archivo)
+    except OSError:
+        return []
+    entradas = []
+    for trozo in contenido.split("\n\n"):
+        trozo = trozo.strip()
+        m = _ENTRADA.match(trozo)
+        if m:
+            entradas.append((m.group(1), trozo[m.end():]))
+        elif trozo:
+            entradas.append(("", trozo))
+    return entradas
+
+
+def _lo_esencial(archivo):
+    """El mejor resumen de un fichero: el ultimo del modelo (el del dia entero
+    tras el reduce) o, si no hay, el ultimo que haya."""
+    entradas = _leer_entradas(archivo)
+    if not entradas:
+        return ""
+    del_modelo = [t for f, t in entradas if f == "ollama"]
+    return (del_modelo or [entradas[-1][1]])[-1]
+
+
+def _por_palabras(etiqueta, textos):
+    """Resumen sin modelo: de que se hablo y cuanto."""
+    cuenta = Counter(p for t in textos for p in analisis.conceptos(t))
+    temas = ", ".join(f"{p} ({n})" for p, n in cuenta.most_common(12))
+    return f"{etiqueta}: {len(textos)} resumenes. Temas: {temas or 'ninguno'}"
+
+
+def _semana(dia):
+    anio, semana, _ = dia.isocalendar()
+    return f"{anio}-W{semana:02d}"
+
+
+def _mes_de_semana(etiqueta):
+    """Una semana pertenece al mes de su jueves (como en ISO)."""
+    anio, semana = etiqueta.split("-W")
+    return date.fromisocalendar(int(anio), int(semana), 4).strftime("%Y-%m")
+
+
+def _escribir_consolidado(ruta, texto, fuente):
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    hora = reloj.fecha_hora().strftime("%H:%M")
+    entrada = f"[{hora}] ({fuente}) {texto}"
+    with open(ruta, "w", encoding="utf-8") as f:
+        f.write(f"{entrada}\n\n")
+    vectores.indexar(entrada, "resumen", ruta.stem)
+    rag.publicar(entrada, "resumen", ruta.stem)
+
+
+def _pendientes(hoy):
+    """(ruta destino, etiqueta, [ficheros fuente], rehacer por palabras) de lo que
+    falta, esta desfasado (una fuente cambio despues) o solo esta por palabras.
+    Semanas y meses cerrados, de lo mas viejo a lo nuevo."""
+    semanas = {}
+    for archivo in comprimido.listar(RESUMENES_DIR, "*.txt"):
+        try:
+            dia = date.fromisoformat(archivo.stem)
+        except ValueError:
+            continue
+        semanas.setdefault(_semana(dia), []).append(archivo)
+    actual = _semana(hoy)
+    trabajo = [(SEMANAS_DIR / f"{s}.txt", f"Semana {s}", sorted(fs))
+               for s, fs in sorted(semanas.items()) if s < actual]
+
+    meses = {}
+    for archivo in SEMANAS_DIR.glob("*.txt"):
+        meses.setdefault(_mes_de_semana(archivo.stem), []).append(archivo)
+    mes_actual = hoy.strftime("%Y-%m")
+    for m, fs in sorted(meses.items()):
+        # Un mes se cierra cuando ya paso y tiene todas sus semanas consolidadas
+        if m < mes_actual and not any(_mes_de_semana(s) == m for s in semanas
+                                      if not (SEMANAS_DIR / f"{s}.txt").exists()):
+            trabajo.append((MESES_DIR / f"{m}.txt", f"Mes {m}", sorted(fs)))
+
+    pendientes = []
+    # Primero las semanas: un mes se hace con semanas ya buenas
+    for ruta, etiqueta, fuentes in trabajo:
+        try:
+            hecho = ruta.stat().st_mtime
+        except OSError:
+            pendientes.append((ruta, etiqueta, fuentes, True))
+            continue
+        if any(comprimido.mtime(f) > hecho for f in fuentes):
+            pendientes.append((ruta, etiqueta, fuentes, True))
+        else:
+            entradas = _leer_entradas(ruta)
+            if not entradas or entradas[-1][0] == "palabras":
+                pendientes.append((ruta, etiqueta, fuentes, not entradas))
+    return pendientes
+
+
+def consolidar(usar_llm=True, maximo=4):
+    """Condensa dias cerrados en semanas y semanas en meses.
+    Como mucho una llamada al modelo por vez; el resto, por palabras.
+    Lo que quedo por palabras se rehace con el modelo cuando este libre.
+    Devuelve las etiquetas consolidadas."""
+    hechas = []
+    llamado = False
+    for ruta, etiqueta, fuentes, rehacer in _pendientes(reloj.hoy())[:maximo]:
+        pares = [(f, t) for f in fuentes if (t := _lo_esencial(f))]
+        if not pares:
+            continue
+        texto = None
+        if usar_llm and not llamado:
+            llamado = True
+            partes = [f"{f.stem}: {t}" for f, t in pares]
+            texto = ollama_client.condensar(etiqueta, partes)
+            if texto:
+                _escribir_consolidado(ruta, texto, "ollama")
+                hechas.append(etiqueta)
+                continue
+        if rehacer:
+            _escribir_consolidado(ruta, _por_palabras(etiqueta, [t for _, t in pares]), "palabras")
+            hechas.append(etiqueta)
+    return hechas
+
+
 def guardar_basico(texto):
     """Guarda un resumen basico (sin Ollama). Para el fallback."""
     _guardar(texto, "basico")
@@ -51,10 +308,10 @@ def guardar_basico(texto):
 def ultimo_resumen():
     """Devuelve el resumen mas reciente."""
     RESUMENES_DIR.mkdir(parents=True, exist_ok=True)
-    archivos = sorted(RESUMENES_DIR.glob("*.txt"), reverse=True)
+    archivos = comprimido.listar(RESUMENES_DIR, "*.txt")
     if archivos:
         try:
-            return archivos[0].read_text(encoding="utf-8").strip()
+            return comprimido.leer_texto(archivos[-1]).strip()
         except OSError:
             pass
     return None
@@ -63,4 +320,4 @@ def ultimo_resumen():
 def total_resumenes():
     """Cuantos dias tiene resumidos."""
     RESUMENES_DIR.mkdir(parents=True, exist_ok=True)
-    return len(list(RESUMENES_DIR.glob("*.txt")))
+    return len(comprimido.listar(RESUMENES_DIR, "*.txt"))
@@ -0,0 +1,184 @@
+"""
+IANAE v3 - Retencion
+Cada hermana escribe un diario por dia, para siempre. Aqui se compacta:
+  - los dias cerrados del diario (.md y .jsonl) se comprimen por bloques
+    (comprimido.py); el .idx de entradas se queda como esta
+  - los resumenes diarios viejos, igual
+  - si todo lo de la hermana pasa del presupuesto, se borran los dias mas
+    viejos del diario (su resumen queda) y despues los resumenes diarios
+    que ya estan en su semana. Semanas y meses no se borran.
+
+El presupuesto cuenta tambien lo que se saca del diario y los resumenes:
+el indice del diario, los vectores, el fragmento de la colmena y los
+contextos. Al borrar un dia se quitan sus lineas de esos ficheros.
+
+Quien lee (rag, resumenes, la web) lo hace a traves de comprimido.py y
+no nota la diferencia; el indice del diario olvida solo los dias borrados.
+"""
+
+import json
+import os
+from collections import Counter
+from datetime import date, timedelta
+
+import comprimido
+import contextos
+import diario
+import indice_diario
+import rag
+import reloj
+import resumenes
+import vectores
+
+COMPRIMIR_TRAS_DIAS = int(os.environ.get("IANAE_COMPRIMIR_DIAS", "2"))  # hoy y ayer, planos
+PRESUPUESTO_MB = float(os.environ.get("IANAE_PRESUPUESTO_MB", "512"))   # diario, resumenes y derivados
+
+
+def _fecha(ruta):
+    try:
+        return date.fromisoformat(ruta.name.split(".")[0])
+    except ValueError:
+        return None
+
+
+def _dias_diario():
+    """{fecha: [ficheros del dia en su nombre plano]} del diario."""
+    dias = {}
+    for patron in ("*.md", "*.jsonl", "*.idx"):
+        for ruta in comprimido.listar(diario.DIARIO_DIR, patron):
+            fecha = _fecha(ruta)
+            if fecha is not None:
+                dias.setdefault(fecha, []).append(ruta)
+    return dias
+
+
+def _resumenes_diarios():
+    """{fecha: resumen del dia} (sin semanas ni meses)."""
+    dias = {}
+    for ruta in comprimido.listar(resumenes.RESUMENES_DIR, "*.txt"):
+        fecha = _fecha(ruta)
+        if fecha is not None:
+            dias[fecha] = ruta
+    return dias
+
+
+def _limite_resumen(hoy):
+    """Antes de esta fecha resumenes ya no vuelve sobre el dia."""
+    return hoy - timedelta(days=max(COMPRIMIR_TRAS_DIAS, resumenes.DIAS_ESTADO + 1))
+
+
+def compactar(hoy=None):
+    """Comprime lo cerrado. Devuelve los bytes ahorrados."""
+    hoy = hoy or reloj.hoy()
+    ahorrado = 0
+    limite_diario = hoy - timedelta(days=COMPRIMIR_TRAS_DIAS)
+    for fecha, rutas in _dias_diario().items():
+        if fecha >= limite_diario:
+            continue
+        for ruta in rutas:
+            if ruta.suffix != ".idx" and ruta.exists():
+                ahorrado += _comprimir(ruta)
+    # Un resumen diario se reescribe mientras resumenes recuerda su dia
+    limite_resumen = _limite_resumen(hoy)
+    for fecha, ruta in _resumenes_diarios().items():
+        if fecha < limite_resumen and ruta.exists():
+            ahorrado += _comprimir(ruta)
+    return ahorrado
+
+
+def _comprimir(ruta):
+    try:
+        return comprimido.comprimir(ruta)
+    except OSError as e:
+        print(f"[retencion] No se pudo comprimir {ruta}: {e}")
+        return 0
+
+
+def _derivados():
+    """Ficheros de lineas sacados del diario y los resumenes, con la clave
+    (fecha, fuente) de cada linea."""
+    return (
+        (rag.INDICE_DIARIO_FILE, lambda r: (r["f"], "diario")),
+        (vectores.VECTORES_FILE, lambda r: (r["m"].get("fecha"), r["m"].get("fuente"))),
+        (rag.fragmento(), lambda r: (r["f"], r["s"])),
+    )
+
+
+def ocupado():
+    """Bytes en disco de diario y resumenes (con semanas y meses) y de lo que
+    se saca de ellos: indice, vectores, fragmento de la colmena y contextos."""
+    total = 0
+    for directorio in (diario.DIARIO_DIR, resumenes.RESUMENES_DIR,
+                       resumenes.SEMANAS_DIR, resumenes.MESES_DIR):
+        if directorio.exists():
+            total += sum(p.stat().st_size for p in directorio.iterdir() if p.is_file())
+    for ruta in [r for r, _ in _derivados()] + [contextos.CONTEXTOS_FILE]:
+        try:
+            total += ruta.stat().st_size
+        except OSError:
+            pass
+    return total
+
+
+def _bytes_derivados():
+    """(fecha, fuente) -> bytes de sus lineas en los ficheros derivados."""
+    cuenta = Counter()
+    for ruta, clave in _derivados():
+        try:
+            with open(ruta, "rb") as f:
+                for linea in f:
+                    try:
+                        cuenta[clave(json.loads(linea))] += len(linea)
+                    except (ValueError, KeyError, TypeError, AttributeError):
+                        continue
+        except OSError:
+            continue
+    return cuenta
+
+
+def _podar_derivados(quitados):
+    """Quita de los derivados las lineas de {(fecha, fuente)} (en el escritor)."""
+    if not quitados:
+        return
+    indice_diario.podar(rag.INDICE_DIARIO_FILE, {f for f, s in quitados if s == "diario"})
+    vectores.podar(quitados)
+    rag.podar_fragmento(quitados)
+
+
+def recortar(hoy=None, presupuesto_mb=None):
+    """Borra lo mas viejo hasta caber en el presupuesto. Devuelve los bytes liberados."""
+    hoy = hoy or reloj.hoy()
+    presupuesto = (PRESUPUESTO_MB if presupuesto_mb is None else presupuesto_mb) * 1024 * 1024
+    sobra = ocupado() - presupuesto
+    if sobra <= 0:
+        return 0
+    derivados = _bytes_derivados()
+    quitados = set()   # (fecha, fuente) que ya no estan
+    liberado = 0
+    # 1. Dias del diario, del mas viejo al mas nuevo (nunca los que aun se resumen)
+    limite = _limite_resumen(hoy)
+    for fecha, rutas in sorted(_dias_diario().items()):
+        if liberado >= sobra or fecha >= limite:
+            break
+        for ruta in rutas:
+            liberado += comprimido.borrar(ruta)
+        quitados.add((fecha.isoformat(), "diario"))
+        liberado += derivados[fecha.isoformat(), "diario"]
+    # 2. Resumenes diarios cuya semana ya esta consolidada
+    for fecha, ruta in sorted(_resumenes_diarios().items()):
+        if liberado >= sobra:
+            break
+        if (resumenes.SEMANAS_DIR / f"{resumenes._semana(fecha)}.txt").exists():
+            liberado += comprimido.borrar(ruta)
+            quitados.add((fecha.isoformat(), "resumen"))
+            liberado += derivados[fecha.isoformat(), "resumen"]
+    # Las lineas de los derivados se van en el escritor: cuentan ya como liberadas
+    _podar_derivados(quitados)
+    return liberado
+
+
+def retener(hoy=None):
+    """Compacta y recorta. Una vez al dia basta. Devuelve (ahorrado, liberado)."""
+    resultado = compactar(hoy), recortar(hoy)
+    rag.podar_fragmento(hoy=hoy)  # la colmena solo carga los ultimos dias
+    return resultado
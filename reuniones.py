@@ -14,8 +14,8 @@ Senioridad: Ianae (1.0) influye mas. Las nuevas (0.5) absorben mas.
 
 import json
 import os
-import time
 import random
+import time
 from pathlib import Path
 
 import ollama_client
@@ -2,17 +2,36 @@
 IANAE v3 - Los Sentidos
 Como observa Ianae el mundo. Solo su entorno inmediato.
 No internet. No Wikipedia. Lo que tiene a su alrededor.
+
+Leer un archivo es leer una ventana de una pagina (mmap, sin cargar el
+resto). Con LECTURA="rotar" cada archivo se lee por partes, una distinta
+cada vez, y con el tiempo se lee entero; "azar" elige la parte al azar;
+"inicio" es lo de antes: los primeros 800 bytes.
 """
 
+import heapq
+import http.client
+import json
+import mmap
 import os
 import random
+import select
+import socket
 import subprocess
 import time
-from datetime import datetime
 from pathlib import Path
 
+import analisis  # palabras, sin la jerga tecnica que ensucia los intereses
+import buzon
+import persistencia
+import reloj
+from catalogo import CacheLecturas, Catalogo
+
 
 RUTA_BASE = Path(os.environ.get("IANAE_MUNDO", "/mundo"))
+LECTURA = os.environ.get("IANAE_LECTURA", "rotar")   # rotar | azar | inicio
+VENTANA = mmap.ALLOCATIONGRANULARITY                 # bytes por lectura (una pagina)
+VENTANAS_FILE = Path(__file__).parent / "data" / "ventanas.json"
 
 EXTENSIONES = {'.py', '.txt', '.md', '.html', '.yml', '.yaml',
                '.json', '.cfg', '.ini', '.sh', '.css', '.js',
@@ -26,6 +45,7 @@ def observar():
         leer_archivo, leer_archivo, leer_archivo,  # 3x peso: leer es lo mas rico
         ver_archivos,
         ver_hora,
+        ver_sistema, ver_procesos, ver_red,        # de /proc y un socket: sin procesos
     ]
     sentido = random.choice(sentidos)
     try:
@@ -58,95 +78,109 @@ RUTAS_HUMANAS = [
     Path("/mundo/contexto-humano/psicologia-acompanamiento"),
 ]
 
-# Palabras tecnicas que ensucian los intereses
-STOP_TECNICO = {
-    'import', 'from', 'def', 'class', 'return', 'self', 'none',
-    'true', 'false', 'the', 'and', 'for', 'not', 'with', 'this',
-    'that', 'then', 'else', 'elif', 'while', 'break', 'continue',
-    'buff/cache', 'usage_index', 'node_modules', '__pycache__',
-    'localhost', 'stderr', 'stdout', 'argv', 'kwargs', 'args',
-    'isinstance', 'exception', 'traceback', 'utf-8', 'encoding',
-    'http', 'https', 'html', 'json', 'yaml', 'toml',
-    'docker', 'container', 'volume', 'network_mode',
-    'sudo', 'chmod', 'chown', 'mkdir', 'grep', 'wget', 'curl',
-    'pip', 'install', 'requirements', 'dockerfile',
-    'var', 'const', 'let', 'function', 'async', 'await',
-    'span', 'div', 'style', 'width', 'height', 'margin', 'padding',
-}
+
+# Que hay para leer: se recorre una vez y luego solo se mira lo que cambio
+_mundo = Catalogo("mundo", [RUTA_BASE], EXTENSIONES, profundidad=3)
+_humanos = Catalogo("humanos", RUTAS_HUMANAS, {'.md'}, profundidad=0)
+# Y lo que ya se leyo: un fichero que no cambio no se vuelve a abrir
+_lecturas = CacheLecturas(f"palabras.v{analisis.VERSION}")
 
 
 def leer_archivo():
     """Lee un trozo de un archivo aleatorio. Prioriza contenido humano."""
     # 40% de las veces, leer contenido humano directamente
     if random.random() < 0.4:
-        archivos_humanos = []
-        for ruta in RUTAS_HUMANAS:
-            if ruta.exists():
-                for f in ruta.glob("*.md"):
-                    archivos_humanos.append(str(f))
-        if archivos_humanos:
-            archivo = random.choice(archivos_humanos)
-            try:
-                with open(archivo, 'r', errors='ignore') as f:
-                    contenido = f.read(800)
-                if contenido.strip():
-                    nombre = os.path.relpath(archivo, str(RUTA_BASE))
-                    palabras = _extraer_palabras(contenido)
-                    muestra = random.sample(list(palabras), min(10, len(palabras))) if palabras else []
-                    return f"Lei '{nombre}'. Palabras: {', '.join(muestra)}"
-            except (PermissionError, OSError):
-                pass
+        archivo = _humanos.elegir()
+        if archivo:
+            leido = _leer(archivo)
+            if leido:
+                return leido
 
     # Resto: archivo aleatorio del workspace
-    archivos = []
-    try:
-        for root, dirs, files in os.walk(str(RUTA_BASE)):
-            depth = root.replace(str(RUTA_BASE), '').count(os.sep)
-            if depth > 3:
-                dirs.clear()
-                continue
-            dirs[:] = [d for d in dirs if not d.startswith('.')
-                       and d not in ('node_modules', '__pycache__', '.git', 'venv')]
-            for f in files:
-                if os.path.splitext(f)[1].lower() in EXTENSIONES:
-                    archivos.append(os.path.join(root, f))
-    except PermissionError:
+    archivo = _mundo.elegir()
+    if not archivo:
         return None
+    return _leer(archivo)
 
-    if not archivos:
-        return None
 
-    archivo = random.choice(archivos)
+def _cargar_ventanas():
     try:
-        with open(archivo, 'r', errors='ignore') as f:
-            contenido = f.read(800)
-    except (PermissionError, OSError):
-        return None
+        with open(VENTANAS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
 
-    if not contenido.strip():
+
+_ventanas = None  # archivo -> siguiente parte a leer (modo rotar)
+
+
+def _parte(archivo, tamano):
+    """Que parte del archivo toca leer: (numero, cuantas hay)."""
+    global _ventanas
+    if LECTURA == "inicio" or tamano <= VENTANA:
+        return 0, 1
+    partes = -(-tamano // VENTANA)
+    if LECTURA == "azar":
+        return random.randrange(partes), partes
+    if _ventanas is None:
+        _ventanas = _cargar_ventanas()
+    parte = _ventanas.get(archivo, 0) % partes
+    _ventanas[archivo] = (parte + 1) % partes
+    persistencia.escritor().encolar(VENTANAS_FILE, dict(_ventanas), indent=None)
+    return parte, partes
+
+
+def _leer(archivo):
+    try:
+        info = os.stat(archivo)
+        parte, partes = _parte(archivo, info.st_size)
+        clave = CacheLecturas.clave(archivo, info, "inicio" if LECTURA == "inicio" else parte)
+        palabras = _lecturas.obtener(clave,
+                                     lambda: _palabras_de(archivo, parte, info.st_size))
+    except (PermissionError, OSError, ValueError):
+        return None
+    if palabras is None:
         return None
 
     nombre = os.path.relpath(archivo, str(RUTA_BASE))
-    palabras = _extraer_palabras(contenido)
-    muestra = random.sample(list(palabras), min(10, len(palabras))) if palabras else []
-    return f"Lei '{nombre}'. Palabras: {', '.join(muestra)}"
+    donde = f" (parte {parte + 1} de {partes})" if partes > 1 else ""
+    muestra = random.sample(palabras, min(10, len(palabras))) if palabras else []
+    return f"Lei '{nombre}'{donde}. Palabras: {', '.join(muestra)}"
+
+
+def _palabras_de(archivo, parte=0, tamano=0):
+    """Palabras de una parte de un archivo (None si esta vacia)."""
+    if LECTURA == "inicio" or tamano <= VENTANA:
+        with open(archivo, 'r', errors='ignore') as f:
+            contenido = f.read(800 if LECTURA == "inicio" else VENTANA)
+    else:
+        with open(archivo, 'rb') as f:
+            inicio = parte * VENTANA
+            largo = min(VENTANA, tamano - inicio)
+            if largo <= 0:
+                return None
+            # Solo se proyecta la pagina que toca (offset alineado a la pagina)
+            with mmap.mmap(f.fileno(), largo, access=mmap.ACCESS_READ, offset=inicio) as m:
+                datos = m[:]
+        contenido = datos.decode('utf-8', errors='ignore')
+        # Los bordes de la ventana cortan palabras: fuera los trozos
+        if inicio > 0:
+            contenido = contenido.split(None, 1)[-1] if contenido[:1].strip() else contenido
+        if inicio + largo < tamano:
+            contenido = contenido.rsplit(None, 1)[0] if contenido[-1:].strip() else contenido
+    if not contenido.strip():
+        return None
+    return sorted(_extraer_palabras(contenido))
 
 
 def _extraer_palabras(contenido):
     """Extrae palabras interesantes filtrando basura tecnica."""
-    palabras = set()
-    for p in contenido.split():
-        p = p.strip('.,;:(){}[]"\'\\/`#=<>+-*&|!@%^~')
-        if (len(p) > 3 and p.lower() not in STOP_TECNICO
-                and not p.startswith(('__', '//', '0x'))
-                and not p.replace('.', '').replace('-', '').isdigit()):
-            palabras.add(p.lower())
-    return palabras
+    return set(analisis.lectura(contenido))
 
 
 def ver_hora():
     """Percibe el momento."""
-    ahora = datetime.now()
+    ahora = reloj.fecha_hora()
     h = ahora.hour
     if h < 6:
         momento = "madrugada, silencio"
@@ -163,84 +197,235 @@ def ver_hora():
     return f"Son las {ahora.strftime('%H:%M')} del {ahora.strftime('%A')}. Es de {momento}. Dia {ahora.timetuple().tm_yday} del ano."
 
 
+# --- El sistema, leido de /proc (sin lanzar procesos) ---
+
+RED_DESTINOS = [("1.1.1.1", 53), ("8.8.8.8", 53), ("1.1.1.1", 443)]
+RED_ESPERA = 0.5   # segundos; lo que tarde mas cuenta como no llegar
+DOCKER_SOCKET = "/var/run/docker.sock"
+
+
+def _leer_proc(ruta):
+    with open(ruta, "r") as f:
+        return f.read()
+
+
+def _legible(n):
+    """Bytes en unidades como las de free -h / df -h."""
+    for unidad in ("B", "Ki", "Mi", "Gi"):
+        if n < 1024:
+            return f"{n:.0f}{unidad}" if unidad == "B" else f"{n:.1f}{unidad}"
+        n /= 1024
+    return f"{n:.1f}Ti"
+
+
+def _uptime():
+    segundos = int(float(_leer_proc("/proc/uptime").split()[0]))
+    dias, resto = divmod(segundos, 86400)
+    horas, minutos = divmod(resto // 60, 60)
+    partes = [f"{n} {u}" for n, u in ((dias, "days"), (horas, "hours"), (minutos, "minutes")) if n]
+    return f"up {', '.join(partes) or '0 minutes'}"
+
+
+def _memoria():
+    campos = {}
+    for linea in _leer_proc("/proc/meminfo").splitlines():
+        nombre, _, valor = linea.partition(":")
+        if valor.split():
+            campos[nombre] = int(valor.split()[0]) * 1024
+    total = campos["MemTotal"]
+    disponible = campos.get("MemAvailable", campos.get("MemFree", 0))
+    return (f"total {_legible(total)}, usada {_legible(total - disponible)}, "
+            f"disponible {_legible(disponible)}")
+
+
+def _disco():
+    st = os.statvfs("/")
+    total = st.f_blocks * st.f_frsize
+    libre = st.f_bavail * st.f_frsize
+    usado = total - st.f_bfree * st.f_frsize
+    return (f"/ {_legible(usado)} usados de {_legible(total)} "
+            f"({-(-100 * usado // max(usado + libre, 1))}%), {_legible(libre)} libres")
+
+
+class _ConexionUnix(http.client.HTTPConnection):
+    def __init__(self, ruta, timeout=2):
+        super().__init__("localhost", timeout=timeout)
+        self.ruta = ruta
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.ruta)
+
+
+def _docker():
+    """Contenedores por el socket de docker (si esta montado), sin el cliente."""
+    conexion = _ConexionUnix(DOCKER_SOCKET)
+    try:
+        conexion.request("GET", "/containers/json")
+        contenedores = json.loads(conexion.getresponse().read())
+    finally:
+        conexion.close()
+    return ", ".join(f"{c['Names'][0].lstrip('/')}: {c['Status']}" for c in contenedores)
+
+
 def ver_sistema():
     """Estado del sistema."""
-    opciones = [
-        ("uptime -p", "uptime"),
-        ("free -h | head -2", "memoria"),
-        ("df -h / | tail -1", "disco"),
-        ("docker ps --format '{{.Names}}: {{.Status}}' 2>/dev/null", "docker"),
-    ]
-    cmd, desc = random.choice(opciones)
+    opciones = [(_uptime, "uptime"), (_memoria, "memoria"), (_disco, "disco")]
+    if os.path.exists(DOCKER_SOCKET):
+        opciones.append((_docker, "docker"))
+    leer, desc = random.choice(opciones)
     try:
-        r = subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=5)
-        if r.stdout.strip():
-            return f"[{desc}] {r.stdout.strip()}"
-    except (subprocess.TimeoutExpired, OSError):
+        texto = leer()
+        if texto:
+            return f"[{desc}] {texto}"
+    except (OSError, ValueError, KeyError, http.client.HTTPException):
         pass
     return None
 
 
+def _procesos():
+    """[(cpu media desde que arranco, nombre)] de /proc/[pid]/stat (como ps -o pcpu)."""
+    hz = os.sysconf("SC_CLK_TCK")
+    arriba = float(_leer_proc("/proc/uptime").split()[0])
+    procesos = []
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            stat = _leer_proc(f"/proc/{pid}/stat")
+        except OSError:
+            continue  # termino mientras se miraba
+        # El nombre va entre parentesis y puede llevar espacios
+        nombre = stat[stat.index("(") + 1:stat.rindex(")")]
+        campos = stat[stat.rindex(")") + 2:].split()
+        tiempo = (int(campos[11]) + int(campos[12])) / hz   # utime + stime
+        vida = arriba - int(campos[19]) / hz                 # desde starttime
+        procesos.append((tiempo / vida if vida > 0 else 0.0, nombre))
+    return procesos
+
+
 def ver_procesos():
     """Que esta corriendo."""
     try:
-        r = subprocess.run(
-            "ps aux --sort=-pcpu | head -6",
-            shell=True, capture_output=True, text=True, timeout=5
-        )
-        lines = r.stdout.strip().split('\n')[1:]
-        procs = []
-        for line in lines:
-            parts = line.split()
-            if len(parts) >= 11:
-                procs.append(parts[10].split('/')[-1])
-        if procs:
-            return f"Procesos activos: {', '.join(procs)}"
-    except (subprocess.TimeoutExpired, OSError):
-        pass
+        procs = [nombre for _, nombre in heapq.nlargest(5, _procesos())]
+    except (OSError, ValueError, IndexError):
+        return None
+    if procs:
+        return f"Procesos activos: {', '.join(procs)}"
     return None
 
 
 def ver_red():
-    """Toca la red."""
-    sitio = random.choice(["1.1.1.1", "8.8.8.8", "google.com"])
+    """Toca la red: un connect TCP sin bloquear (sin ping, sin ser root),
+    esperando como mucho RED_ESPERA segundos."""
+    sitio, puerto = random.choice(RED_DESTINOS)
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    s.setblocking(False)
+    inicio = time.perf_counter()
     try:
-        r = subprocess.run(
-            f"ping -c 1 -W 2 {sitio}",
-            shell=True, capture_output=True, text=True, timeout=5
-        )
-        if r.returncode == 0:
-            for line in r.stdout.split("\n"):
-                if "time=" in line:
-                    t = line.split("time=")[1].strip()
-                    return f"Puedo llegar a {sitio} en {t}"
+        s.connect_ex((sitio, puerto))
+        _, listo, _ = select.select([], [s], [], RED_ESPERA)
+        if listo and s.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+            ms = (time.perf_counter() - inicio) * 1000
+            return f"Puedo llegar a {sitio} en {ms:.1f} ms"
         return f"No llego a {sitio}. Estoy aislada?"
-    except (subprocess.TimeoutExpired, OSError):
+    except OSError:
         return None
+    finally:
+        s.close()
+
+
+def _benchmark(veces=20):
+    """Coste por llamada: los sentidos de /proc contra los comandos de antes."""
+    antiguos = {
+        "uptime": "uptime -p", "memoria": "free -h | head -2", "disco": "df -h / | tail -1",
+        "procesos": "ps aux --sort=-pcpu | head -6", "red": "ping -c 1 -W 2 1.1.1.1",
+    }
+    nuevos = {"uptime": _uptime, "memoria": _memoria, "disco": _disco,
+              "procesos": ver_procesos, "red": ver_red}
+    for nombre, cmd in antiguos.items():
+        t = time.perf_counter()
+        for _ in range(veces):
+            try:
+                subprocess.run(cmd, shell=True, capture_output=True, text=True, timeout=5)
+            except (subprocess.TimeoutExpired, OSError):
+                pass
+        antes = (time.perf_counter() - t) / veces
+        t = time.perf_counter()
+        for _ in range(veces):
+            try:
+                nuevos[nombre]()
+            except OSError:
+                pass
+        ahora = (time.perf_counter() - t) / veces
+        print(f"{nombre:9s} subprocess {antes * 1000:8.2f} ms   /proc {ahora * 1000:8.3f} ms")
+
+
+# --- Mensajes de los humanos (buzon.py) ---
+
+DATA_DIR = Path(__file__).parent / "data"
+_atendiendo = None   # id del mensaje que se esta respondiendo
+_timbre = None
+
+
+def _buzon_antiguo():
+    """Un mensaje dejado en el buzon.txt de antes pasa a la cola."""
+    antiguo = DATA_DIR / "buzon.txt"
+    try:
+        msg = antiguo.read_text(encoding="utf-8").strip()
+    except OSError:
+        return
+    if msg:
+        buzon.enviar(DATA_DIR, msg)
+        antiguo.write_text("", encoding="utf-8")
 
 
 def ver_mensajes():
-    """Mira si alguien le dejo un mensaje. Se llama SIEMPRE, no al azar."""
-    buzon = Path("/app/data/buzon.txt")
-    if buzon.exists():
-        with open(buzon, 'r') as f:
-            msg = f.read().strip()
-        if msg:
-            # NO borrar aqui - se borra con confirmar_mensaje() tras responder
-            return f"Mensaje de alguien: '{msg}'"
-    return None
+    """Mira si alguien le dejo un mensaje (el mas antiguo sin atender).
+    Se llama SIEMPRE, no al azar."""
+    global _atendiendo
+    _buzon_antiguo()
+    pendientes = buzon.pendientes(DATA_DIR)
+    if not pendientes:
+        _atendiendo = None
+        return None
+    # NO se quita aqui - se quita con confirmar_mensaje() tras responder
+    _atendiendo, msg = pendientes[0]
+    return f"Mensaje de alguien: '{msg}'"
+
+
+def hay_mensajes():
+    """Si hay algun mensaje sin atender (solo mira la cola: no toca la mente)."""
+    _buzon_antiguo()
+    return bool(buzon.pendientes(DATA_DIR))
 
 
 def confirmar_mensaje():
-    """Borra el buzon SOLO despues de haber procesado y respondido."""
-    buzon = Path("/app/data/buzon.txt")
-    if buzon.exists():
-        with open(buzon, 'w') as f:
-            f.write("")
+    """Quita el mensaje de la cola SOLO despues de haber procesado y respondido."""
+    global _atendiendo
+    if _atendiendo:
+        buzon.confirmar(DATA_DIR, _atendiendo)
+        _atendiendo = None
 
 
 def responder(texto):
-    """Ianae deja una respuesta para que la lean."""
-    respuesta = Path("/app/data/respuesta.txt")
-    with open(respuesta, 'w', encoding='utf-8') as f:
-        f.write(texto)
+    """Ianae deja una respuesta al mensaje que esta atendiendo."""
+    if _atendiendo:
+        buzon.responder(DATA_DIR, _atendiendo, texto)
+
+
+def timbre():
+    """El timbre del buzon (buzon.Timbre), o None si no se puede
+    (p. ej. un volumen que no admite sockets): entonces se mira cada ciclo."""
+    global _timbre
+    if _timbre is None:
+        try:
+            _timbre = buzon.Timbre(DATA_DIR)
+        except OSError:
+            return None
+    return _timbre
+
+
+if __name__ == "__main__":
+    _benchmark()
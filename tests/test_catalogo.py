@@ -0,0 +1,56 @@
+"""CacheLecturas: lo que saca una hermana lo aprovechan las demas, y no crece sin fin."""
+
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import persistencia
+from catalogo import CacheLecturas
+
+
+class TestCacheLecturas(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.compartido = Path(self._tmp.name)
+
+    def tearDown(self):
+        persistencia.escritor().esperar()  # nada a medio escribir al borrar
+        self._tmp.cleanup()
+
+    def cache(self, maximo=50):
+        return CacheLecturas("palabras", maximo=maximo, compartido=self.compartido)
+
+    def test_compartida_entre_hermanas(self):
+        una, otra = self.cache(), self.cache()
+        self.assertEqual(una.obtener("a|1|10|0", lambda: ["gato", "luna"]), ["gato", "luna"])
+        self.assertEqual(una.obtener("b|1|10|0", lambda: None), None)
+        persistencia.escritor().esperar()
+
+        def no_deberia():
+            raise AssertionError("ya lo saco la otra")
+        self.assertEqual(otra.obtener("a|1|10|0", no_deberia), ["gato", "luna"])
+        self.assertIsNone(otra.obtener("b|1|10|0", no_deberia))
+        self.assertEqual((otra.compartidos, otra.fallos), (2, 0))
+
+    def test_fichero_cambiado_no_acierta(self):
+        una, otra = self.cache(), self.cache()
+        una.obtener("a|1|10|0", lambda: ["viejo"])
+        persistencia.escritor().esperar()
+        self.assertEqual(otra.obtener("a|2|12|0", lambda: ["nuevo"]), ["nuevo"])
+        self.assertEqual(otra.fallos, 1)
+
+    def test_acotada(self):
+        cache = self.cache(maximo=20)
+        for i in range(65):
+            cache.obtener(f"f{i}|1|10|0", lambda: ["palabra"])
+        persistencia.escritor().esperar()
+        cache.recortar()
+        en_disco = [f for _, _, fs in os.walk(self.compartido) for f in fs]
+        self.assertEqual(len(en_disco), 20)
+        self.assertEqual(len(cache.datos), 20)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+"""La generacion de una consulta en la colmena solo cambia con lo que puede responderla."""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import indice_colmena
+import persistencia
+import rag
+import reloj
+from indice_colmena import IndiceColmena
+
+
+class TestGeneracion(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directorio = Path(self._tmp.name)
+        self.hoy = reloj.hoy().isoformat()
+
+    def tearDown(self):
+        persistencia.escritor().esperar()
+        self._tmp.cleanup()
+
+    def escribir(self, hermana, texto):
+        with open(self.directorio / f"{hermana}.jsonl", "a", encoding="utf-8") as f:
+            f.write(indice_colmena.registro(hermana, "diario", self.hoy, texto) + "\n")
+
+    def test_solo_cambia_con_lo_que_responde(self):
+        self.escribir("ianae-1", "El gato duerme junto al teclado")
+        self.escribir("ianae-2", "Musica en la sala de reuniones")
+        colmena = IndiceColmena(self.directorio)
+        antes = colmena.generacion("gato")
+        self.assertIn("ianae-1.jsonl", antes)
+        self.assertNotIn("ianae-2.jsonl", antes)
+
+        self.escribir("ianae-2", "Otra vez musica, ahora con piano")
+        self.escribir("ianae-1", "Ordeno el teclado")
+        self.assertEqual(colmena.generacion("gato"), antes)
+        self.assertEqual(colmena.generacion("gato"), IndiceColmena(self.directorio).generacion("gato"))
+
+        self.escribir("ianae-2", "Un gato entra en la sala")
+        despues = colmena.generacion("gato")
+        self.assertNotEqual(despues, antes)
+        self.assertIn("ianae-2.jsonl", despues)
+
+    def test_consulta_compartida_sustituye_la_vieja(self):
+        self.escribir("ianae-2", "El gato duerme junto al teclado")
+        with mock.patch.object(indice_colmena, "INDICE_DIR", self.directorio), \
+                mock.patch.object(rag, "_colmena", None), \
+                mock.patch.object(rag, "MI_ID", "ianae-1"):
+            consultas = self.directorio / "consultas"
+            consulta = "gato"
+            busquedas = []
+            buscar = rag.buscar_en_colmena
+
+            def contar(*args, **kwargs):
+                busquedas.append(args)
+                return buscar(*args, **kwargs)
+
+            with mock.patch.object(rag, "buscar_en_colmena", contar):
+                for _ in range(2):
+                    rag._colmena_compartida(consulta, rag._generacion_colmena(consulta))
+                    persistencia.escritor().esperar()
+                self.assertEqual(len(busquedas), 1)
+
+                self.escribir("ianae-1", "Hablo de musica")  # no cambia nada
+                rag._colmena_compartida(consulta, rag._generacion_colmena(consulta))
+                self.assertEqual(len(busquedas), 1)
+
+                self.escribir("ianae-3", "Un gato entra en la sala")
+                otras = rag._colmena_compartida(consulta, rag._generacion_colmena(consulta))
+                persistencia.escritor().esperar()
+                self.assertEqual(len(busquedas), 2)
+                self.assertEqual({r["hermana"] for r in otras}, {"ianae-2", "ianae-3"})
+                self.assertEqual(len(list(consultas.glob("*.json"))), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""Latidos con reloj falso: un dia entero en milisegundos, igual que uno de verdad."""
+
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+import diario
+import reloj
+from latidos import Latidos
+
+
+MEDIODIA = datetime(2026, 10, 18, 12, 0).timestamp()
+DIA = 24 * 3600
+
+
+def _vivir_un_dia(directorio):
+    """Dos fases con su periodo; la horaria escribe en un cuaderno con la hora de reloj.
+    Devuelve la traza [(segundo, fase)]."""
+    traza = []
+    cuaderno = diario.Cuaderno(directorio)
+
+    def fase(nombre):
+        async def latir():
+            traza.append((latidos.hora(), nombre))
+            if nombre == "hora":
+                cuaderno.anotar(reloj.fecha_hora(), f"**[{reloj.fecha_hora():%H:%M}]** latido", "nota")
+        return latir
+
+    async def principal(latidos):
+        await asyncio.gather(
+            latidos.cada("hora", 3600, fase("hora")),
+            latidos.cada("lenta", 5400, fase("lenta"), inicio=900),
+        )
+
+    latidos = Latidos(falso=True, inicio=MEDIODIA)
+    latidos.correr(principal, hasta=DIA)
+    cuaderno.cerrar()
+    return traza
+
+
+class TestDiaSimulado(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.directorio = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_fases_en_orden_y_a_su_ritmo(self):
+        t = time.monotonic()
+        traza = _vivir_un_dia(self.directorio / "a")
+        self.assertLess(time.monotonic() - t, 5)  # nada espera de verdad
+        esperado = sorted([(float(s), "hora") for s in range(0, DIA, 3600)]
+                          + [(float(s), "lenta") for s in range(900, DIA, 5400)])
+        self.assertEqual(traza, esperado)
+
+    def test_reproducible(self):
+        self.assertEqual(_vivir_un_dia(self.directorio / "a"),
+                         _vivir_un_dia(self.directorio / "b"))
+
+    def test_cambio_de_dia(self):
+        _vivir_un_dia(self.directorio)
+        dias = sorted(p.name for p in self.directorio.glob("*.md"))
+        self.assertEqual(dias, ["2026-10-18.md", "2026-10-19.md"])
+        for dia in dias:  # 12:00-23:00 un dia, 00:00-11:00 el siguiente
+            texto = (self.directorio / dia).read_text(encoding="utf-8")
+            self.assertEqual(texto.count("latido"), 12)
+
+    def test_reloj_vuelve_al_sistema(self):
+        _vivir_un_dia(self.directorio)
+        self.assertLess(abs(reloj.ahora() - time.time()), 5)
+
+    def test_aviso_corta_la_espera(self):
+        despertares = []
+
+        async def principal(latidos):
+            async def avisar():
+                await latidos.dormir(10)
+                latidos.aviso("mensaje").set()
+
+            async def dormir():
+                llego = await latidos.dormir(3600, aviso="mensaje")
+                despertares.append((latidos.hora(), llego))
+
+            await asyncio.gather(avisar(), dormir())
+
+        Latidos(falso=True, inicio=MEDIODIA).correr(principal)
+        self.assertEqual(despertares, [(10.0, True)])
+
+
+class TestTurnosDeMente(unittest.TestCase):
+
+    def test_turno_cancelado_tras_recibirlo(self):
+        """Si cancelan a quien esperaba justo cuando le pasan la mente, la suelta."""
+        hechas = []
+
+        async def principal(latidos):
+            suelta = threading.Event()
+            segunda = None
+
+            async def primera():
+                await latidos.en_mente(suelta.wait, 5)
+                segunda.cancel()  # ya tiene el turno, pero aun no ha vuelto a correr
+
+            t1 = asyncio.ensure_future(primera())
+            await asyncio.sleep(0.05)
+            segunda = asyncio.ensure_future(latidos.en_mente(hechas.append, "segunda"))
+            await asyncio.sleep(0.05)
+            suelta.set()
+            await t1
+            with self.assertRaises(asyncio.CancelledError):
+                await segunda
+            await asyncio.wait_for(latidos.en_mente(hechas.append, "tercera"), 2)
+
+        Latidos().correr(principal)
+        self.assertEqual(hechas, ["tercera"])
+
+
+if __name__ == "__main__":
+    unittest.main()
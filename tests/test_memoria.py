@@ -0,0 +1,37 @@
+"""Memoria.buscar encuentra palabras cortas, y solo como palabra entera."""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import memoria
+
+
+class TestBuscar(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self._tmp.name)
+        for parche in (mock.patch.object(memoria, "MEMORIA_FILE", tmp / "recuerdos.json"),
+                       mock.patch.object(memoria, "MEMORIA_LOG", tmp / "recuerdos.jsonl")):
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.memoria = memoria.Memoria()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_palabra_corta(self):
+        r = self.memoria.recordar("mensaje", "Hoy salio el sol sobre el mar")
+        self.memoria.recordar("mensaje", "Una tarde de soledad")
+        self.assertEqual(self.memoria.buscar("sol"), [r])
+        self.assertEqual(self.memoria.buscar("mar"), [r])
+
+    def test_palabras_vacias_cortas(self):
+        self.memoria.recordar("mensaje", "Lo que paso con los gatos")
+        self.assertEqual(self.memoria.buscar("que los con"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Los contadores incrementales de Mente cuadran con un recuento completo."""
+
+import random
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import contextos
+import mente
+
+
+class TestContadores(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self._tmp.name)
+        for parche in (mock.patch.object(mente, "MENTE_FILE", tmp / "mente.json"),
+                       mock.patch.object(contextos, "CONTEXTOS_FILE", tmp / "contextos.json")):
+            parche.start()
+            self.addCleanup(parche.stop)
+        random.seed(7)
+        self.mente = mente.Mente(capacidad=60)
+        self.vistos = set()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def assertCuadra(self):
+        m = self.mente
+        self.assertEqual(m.comprobar_contadores(), [])
+        vivos = [c for c in m.conceptos.values() if c.vivo]
+        stats = m.stats()
+        self.assertEqual(stats["conceptos_vivos"], len(vivos))
+        self.assertEqual(stats["conceptos_total"], len(m.conceptos))
+        self.assertEqual(stats["conexiones"], sum(len(c.conexiones) for c in vivos))
+        # Nadie apunta a un concepto olvidado
+        olvidados = self.vistos - set(m.conceptos)
+        for c in m.conceptos.values():
+            self.assertFalse(olvidados & set(c.conexiones), c.nombre)
+
+    def percibir(self, n):
+        palabras = [f"p{i}" for i in range(30)]
+        for _ in range(n):
+            texto = " ".join(random.sample(palabras, random.randint(1, 3)))
+            self.mente.percibir(texto)
+            self.vistos.add(texto)
+
+    def test_percibir(self):
+        self.percibir(40)
+        self.assertCuadra()
+
+    def test_olvido_por_capacidad(self):
+        self.percibir(300)
+        self.assertLessEqual(len(self.mente.conceptos), self.mente.capacidad)
+        self.assertGreater(self.mente.olvidos["capacidad"], 0)
+        self.assertCuadra()
+
+    def test_envejecer(self):
+        self.percibir(50)
+        for _ in range(40):
+            self.mente.envejecer(horas=5)
+        self.assertGreater(self.mente.olvidos["envejecer"], 0)
+        self.assertCuadra()
+
+    def test_conexiones_de_un_solo_sentido(self):
+        # Como las reuniones: se refuerza una arista sin la de vuelta
+        self.percibir(30)
+        nombres = list(self.mente.conceptos)
+        for _ in range(100):
+            a, b = random.sample(nombres, 2)
+            self.mente.conceptos[a].conectar(b)
+        self.assertCuadra()
+        self.percibir(300)  # y ahora a olvidar
+        self.assertCuadra()
+
+    def test_todo_mezclado(self):
+        for _ in range(20):
+            self.percibir(15)
+            self.mente.reflexionar()
+            c = random.choice(list(self.mente.conceptos.values()))
+            c.energia = random.choice([0.0, 0.05, 0.9])
+            c.desconectar(random.choice(list(c.conexiones) or ["nadie"]))
+            if random.random() < 0.3:
+                self.mente.envejecer(horas=3)
+            self.assertCuadra()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,260 @@
+"""
+IANAE v3 - Vectores
+Recuperacion por similitud con vectores TF-IDF "hasheados".
+
+Cada termino cae en una de DIMENSION cubetas (crc32, estable entre procesos):
+no hace falta vocabulario ni modelo de embeddings, ni red.
+Esquema lnc.ltc:
+  - documento: 1 + log(tf), normalizado L2. Se calcula UNA vez al escribirlo
+    y no cambia aunque el corpus crezca.
+  - consulta: 1 + log(tf) por idf (que si depende del corpus), normalizada.
+La consulta es un producto disperso contra la matriz de documentos
+(guardada por columnas: cubeta -> {doc: peso}) y un top-k.
+"""
+
+import heapq
+import json
+import math
+import os
+import time
+import zlib
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import persistencia
+from analisis import VERSION, busqueda as tokenizar
+
+
+DIMENSION = 1 << 18
+VECTORES_FILE = Path(__file__).parent / "data" / f"vectores.v{VERSION}.jsonl"  # diarios + resumenes
+RELLENADO = VECTORES_FILE.with_name(f".{VECTORES_FILE.stem}_rellenado")  # marca de rag
+# Solo se vectoriza al escribir si rag busca por vectores (el mismo ajuste que rag)
+ALMACENAR = os.environ.get("IANAE_MOTOR_RAG", "palabras") == "vectorial"
+
+
+def cubeta(termino):
+    return zlib.crc32(termino.encode("utf-8")) % DIMENSION
+
+
+def vectorizar(tokens):
+    """Vector de documento (lnc): {cubeta: peso}, norma 1."""
+    cuentas = Counter(cubeta(t) for t in tokens)
+    vector = {b: 1 + math.log(tf) for b, tf in cuentas.items()}
+    norma = math.sqrt(sum(w * w for w in vector.values()))
+    if not norma:
+        return {}
+    return {b: round(w / norma, 5) for b, w in vector.items()}
+
+
+class IndiceVectorial:
+    """Matriz dispersa de documentos (una fila por documento, indexada tambien
+    por columnas). Los documentos son claves hashables."""
+
+    def __init__(self):
+        self.filas = {}                    # doc -> {cubeta: peso}
+        self.columnas = defaultdict(dict)  # cubeta -> {doc: peso}
+
+    def __len__(self):
+        return len(self.filas)
+
+    def __contains__(self, doc):
+        return doc in self.filas
+
+    def anadir(self, doc, tokens=None, vector=None):
+        """Anade un documento por sus tokens o por un vector ya calculado."""
+        if doc in self.filas:
+            self.quitar(doc)
+        if vector is None:
+            vector = vectorizar(tokens)
+        self.filas[doc] = vector
+        for b, w in vector.items():
+            self.columnas[b][doc] = w
+        return vector
+
+    def quitar(self, doc, tokens=None):
+        """Quita un documento ('tokens' no hace falta: como IndiceBM25.quitar)."""
+        vector = self.filas.pop(doc, None)
+        if vector is None:
+            return
+        for b in vector:
+            col = self.columnas.get(b)
+            if col is not None:
+                col.pop(doc, None)
+                if not col:
+                    del self.columnas[b]
+
+    def _consulta(self, tokens):
+        """Vector de consulta (ltc): idf segun el corpus actual."""
+        total = len(self.filas)
+        cuentas = Counter(cubeta(t) for t in tokens)
+        vector = {}
+        for b, tf in cuentas.items():
+            df = len(self.columnas.get(b, ()))
+            if df:
+                vector[b] = (1 + math.log(tf)) * math.log(1 + total / df)
+        norma = math.sqrt(sum(w * w for w in vector.values()))
+        return {b: w / norma for b, w in vector.items()} if norma else {}
+
+    def puntuar(self, tokens):
+        """doc -> coseno con la consulta (solo documentos con alguna cubeta comun)."""
+        puntos = defaultdict(float)
+        for b, q in self._consulta(tokens).items():
+            for doc, w in self.columnas[b].items():
+                puntos[doc] += q * w
+        return puntos
+
+    def buscar(self, tokens, n=5, peso=None, filtro=None):
+        """Los n mejores (doc, similitud). peso(doc) multiplica; filtro(doc) descarta."""
+        puntos = self.puntuar(tokens)
+        if filtro is not None:
+            puntos = {doc: p for doc, p in puntos.items() if filtro(doc)}
+        if peso is not None:
+            puntos = {doc: p * peso(doc) for doc, p in puntos.items()}
+        return heapq.nlargest(n, puntos.items(), key=lambda kv: kv[1])
+
+
+class AlmacenVectorial(IndiceVectorial):
+    """IndiceVectorial respaldado por un JSONL de solo-anadir.
+    Cada linea: {"m": metadatos, "v": [[cubeta, peso], ...]}. El documento es el
+    numero de fila. Varios procesos pueden escribir; cada lector se pone al dia
+    leyendo desde el ultimo byte que vio."""
+
+    def __init__(self, ruta):
+        super().__init__()
+        self.ruta = Path(ruta)
+        self.meta = []     # fila -> metadatos
+        self._leido = 0    # bytes del fichero ya cargados
+        self._inodo = None
+
+    def ponerse_al_dia(self):
+        """Carga las filas que otros (o este proceso) anadieron desde la ultima vez."""
+        try:
+            info = self.ruta.stat()
+            if info.st_ino != self._inodo:
+                if self._inodo is not None:  # reescrito (podado): se carga de nuevo
+                    IndiceVectorial.__init__(self)
+                    self.meta = []
+                    self._leido = 0
+                self._inodo = info.st_ino
+            if info.st_size <= self._leido:
+                return 0
+            nuevas = 0
+            with open(self.ruta, "rb") as f:
+                f.seek(self._leido)
+                for linea in f:
+                    if not linea.endswith(b"\n"):
+                        break  # linea a medio escribir: se lee la proxima vez
+                    self._leido += len(linea)
+                    try:
+                        fila = json.loads(linea)
+                    except json.JSONDecodeError:
+                        continue
+                    doc = len(self.meta)
+                    self.meta.append(fila["m"])
+                    IndiceVectorial.anadir(self, doc, vector={b: w for b, w in fila["v"]})
+                    nuevas += 1
+            return nuevas
+        except OSError:
+            return 0
+
+    def anexar(self, texto, meta):
+        """Vectoriza y anade al fichero (en segundo plano). Aparece al ponerse al dia."""
+        vector = vectorizar(tokenizar(texto))
+        if not vector:
+            return None
+        linea = json.dumps({"m": meta, "v": [[b, w] for b, w in vector.items()]},
+                           ensure_ascii=False)
+        persistencia.escritor().anexar(self.ruta, [linea])
+        return vector
+
+    def buscar_texto(self, query, n=5, filtro=None):
+        """Los n documentos mas parecidos: [(metadatos, similitud)]."""
+        self.ponerse_al_dia()
+        f = (lambda doc: filtro(self.meta[doc])) if filtro else None
+        return [(self.meta[doc], s) for doc, s in self.buscar(tokenizar(query), n, filtro=f)]
+
+
+_almacen = None
+_sin_almacen = False
+
+
+def almacen():
+    """El almacen de diarios y resumenes de esta hermana (se carga al primer uso)."""
+    global _almacen
+    if _almacen is None:
+        _almacen = AlmacenVectorial(VECTORES_FILE)
+    return _almacen
+
+
+def indexar(texto, fuente, fecha):
+    """Vectoriza un texto recien escrito (entrada de diario, resumen). Una sola vez."""
+    global _sin_almacen
+    if not ALMACENAR:
+        # Lo que no se vectoriza ahora lo rellena rag si un dia vuelve a este motor
+        if not _sin_almacen:
+            _sin_almacen = True
+            try:
+                RELLENADO.unlink()
+            except OSError:
+                pass
+        return
+    try:
+        almacen().anexar(texto, {"fuente": fuente, "fecha": fecha, "texto": texto[:300]})
+    except OSError:
+        pass
+
+
+def podar(quitar):
+    """Quita del almacen los textos de {(fecha, fuente)} (dias que borro la retencion)."""
+    quitar = set(quitar)
+    if not quitar or not VECTORES_FILE.exists():
+        return
+
+    def conservar(linea):
+        try:
+            meta = json.loads(linea)["m"]
+        except (ValueError, KeyError, TypeError):
+            return False
+        return (meta.get("fecha"), meta.get("fuente")) not in quitar
+    persistencia.escritor().filtrar(VECTORES_FILE, conservar)
+
+
+def _benchmark(documentos=20000, consultas=300, k=5):
+    """Recall@k y latencia: solape de palabras (rag antiguo) vs BM25 vs vectores."""
+    import random
+    from indice import IndiceBM25
+    random.seed(3)
+    vocab = [f"p{i}" for i in range(20000)]
+    pesos = [1 / (i + 1) for i in range(len(vocab))]  # Zipf
+    docs = [random.choices(vocab, weights=pesos, k=random.randint(8, 40))
+            for _ in range(documentos)]
+    objetivos = random.sample(range(documentos), consultas)
+    preguntas = [random.sample(docs[d], min(3, len(docs[d]))) + [random.choice(vocab)]
+                 for d in objetivos]
+
+    def solape(q):
+        qs = set(q)
+        puntos = [(d, len(qs & set(toks)) / len(qs)) for d, toks in enumerate(docs)]
+        return [d for d, s in heapq.nlargest(k, puntos, key=lambda x: x[1]) if s > 0]
+
+    bm25, vec = IndiceBM25(), IndiceVectorial()
+    for d, toks in enumerate(docs):
+        bm25.anadir(d, toks)
+        vec.anadir(d, toks)
+
+    motores = {
+        "solape": solape,
+        "bm25": lambda q: [d for d, _ in bm25.buscar(q, k)],
+        "vectorial": lambda q: [d for d, _ in vec.buscar(q, k)],
+    }
+    for nombre, motor in motores.items():
+        aciertos = 0
+        t = time.perf_counter()
+        for objetivo, q in zip(objetivos, preguntas):
+            aciertos += objetivo in motor(q)
+        dt = (time.perf_counter() - t) / consultas
+        print(f"{nombre:10s} recall@{k}={aciertos / consultas:.2f}  {dt * 1000:.2f} ms/consulta")
+
+
+if __name__ == "__main__":
+    _benchmark()
@@ -7,6 +7,25 @@ import time
 from datetime import datetime
 from flask import Flask, jsonify, render_template, request
 
+try:
+    # analisis.py, reloj.py, indice.py e indice_colmena.py se montan junto a app.py (docker-compose)
+    from indice_colmena import IndiceColmena, directorio
+except ImportError:
+    IndiceColmena = None
+
+try:
+    # entradas.py y comprimido.py tambien se montan junto a app.py
+    import comprimido
+    import entradas
+except ImportError:
+    comprimido = entradas = None
+
+try:
+    # buzon.py tambien (mensajes con id, sin pisarse)
+    import buzon
+except ImportError:
+    buzon = None
+
 app = Flask(__name__)
 
 BASE = os.environ.get("IANAE_BASE", "/home/mini/.openclaw/workspace/ianae-v3")
@@ -33,17 +52,28 @@ def leer_json(path):
 
 def ultimo_diario(diario_dir):
     """Devuelve las ultimas N lineas del diario mas reciente."""
-    archivos = sorted(glob.glob(os.path.join(diario_dir, "2026-*.md")))
+    if comprimido is not None:
+        # Si la hermana lleva dias parada, su ultimo dia puede estar comprimido
+        archivos = [str(p) for p in comprimido.listar(diario_dir, "2026-*.md")]
+    else:
+        archivos = sorted(glob.glob(os.path.join(diario_dir, "2026-*.md")))
     if not archivos:
         return []
     ultimo = archivos[-1]
+    fecha = os.path.basename(ultimo)[:-3]
+    if entradas is not None and entradas.existe(diario_dir, fecha):
+        # Indice de entradas: se leen solo las 30 ultimas, sin recorrer el dia
+        return entradas.leer_md(diario_dir, fecha, entradas.ultimas(diario_dir, fecha, 30))
     try:
-        with open(ultimo, "r", encoding="utf-8") as f:
-            lineas = f.readlines()
-    except FileNotFoundError:
+        if comprimido is not None:
+            lineas = comprimido.leer_texto(ultimo).splitlines()
+        else:
+            with open(ultimo, "r", encoding="utf-8") as f:
+                lineas = f.readlines()
+    except OSError:
         return []
-    entradas = [l.strip() for l in lineas if l.strip() and not l.startswith("# Diario")]
-    return entradas[-30:]
+    del_dia = [l.strip() for l in lineas if l.strip() and not l.startswith("# Diario")]
+    return del_dia[-30:]
 
 
 @app.route("/")
@@ -117,11 +147,64 @@ def api_diario(hid):
     return jsonify({"id": hid, "entradas": entradas})
 
 
+def lineas_desde_el_final(path, bloque=8192):
+    """Lineas de un fichero de la ultima a la primera, leyendo bloques desde el final."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        resto = b""
+        while pos > 0:
+            leer = min(bloque, pos)
+            pos -= leer
+            f.seek(pos)
+            trozo = f.read(leer) + resto
+            lineas = trozo.split(b"\n")
+            resto = lineas.pop(0)
+            for linea in reversed(lineas):
+                if linea.strip():
+                    yield linea.decode("utf-8", errors="replace")
+        if resto.strip():
+            yield resto.decode("utf-8", errors="replace")
+
+
+def recuerdos_recientes(path, n=20):
+    """Ultimos N recuerdos del registro JSONL sin leerlo entero.
+    Los 'nuevo' estan en orden de fecha: basta leer desde el final
+    aplicando los accesos y podas que aparecen detras de cada uno."""
+    recientes, podados, accesos = [], set(), {}
+    try:
+        for linea in lineas_desde_el_final(path):
+            try:
+                ev = json.loads(linea)
+            except json.JSONDecodeError:
+                continue
+            tipo = ev.pop("ev", None)
+            if tipo == "poda":
+                podados.update(ev.get("ids", []))
+            elif tipo == "acceso":
+                accesos.setdefault(ev.get("id"), ev)
+            elif tipo == "nuevo" and ev.get("id") not in podados:
+                acceso = accesos.get(ev.get("id"))
+                if acceso:
+                    ev["importancia"] = acceso.get("importancia", ev.get("importancia"))
+                    ev["accesos"] = acceso.get("accesos", ev.get("accesos"))
+                recientes.append(ev)
+                if len(recientes) >= n:
+                    break
+    except OSError:
+        pass
+    return recientes
+
+
 @app.route("/api/recuerdos/<hid>")
 def api_recuerdos(hid):
     """Recuerdos recientes de una hermana."""
     if hid not in HERMANAS:
         return jsonify({"error": "hermana no encontrada"}), 404
+    registro = os.path.join(BASE, HERMANAS[hid]["data"], "recuerdos.jsonl")
+    if os.path.exists(registro):
+        return jsonify({"id": hid, "recuerdos": recuerdos_recientes(registro, 20)})
+    # Hermana sin migrar todavia: formato antiguo
     path = os.path.join(BASE, HERMANAS[hid]["data"], "recuerdos.json")
     datos = leer_json(path)
     if not datos:
@@ -131,6 +214,33 @@ def api_recuerdos(hid):
     return jsonify({"id": hid, "recuerdos": recientes})
 
 
+_colmena = None
+
+
+@app.route("/api/buscar")
+def api_buscar():
+    """Busca en los diarios y resumenes de toda la colmena.
+    ?q=texto&hermana=aria,lira&fuente=diario|resumen&n=10"""
+    global _colmena
+    if IndiceColmena is None:
+        return jsonify({"error": "indice de la colmena no disponible"}), 503
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "falta q"}), 400
+    hermanas = request.args.get("hermana")
+    hermanas = [h for h in hermanas.split(",") if h in HERMANAS] if hermanas else None
+    fuente = request.args.get("fuente") or None
+    n = min(request.args.get("n", 10, type=int), 50)
+    if _colmena is None:
+        _colmena = IndiceColmena(directorio(os.path.join(BASE, "reuniones")))
+    resultados = []
+    for meta, score in _colmena.buscar_texto(query, n, hermanas=hermanas, fuente=fuente):
+        meta["score"] = round(score, 4)
+        meta["nombre"] = HERMANAS.get(meta["hermana"], {}).get("nombre", meta["hermana"])
+        resultados.append(meta)
+    return jsonify({"q": query, "resultados": resultados})
+
+
 # Historial de conversacion humano <-> colmena
 HISTORIAL_DIR = os.path.join(BASE, "chat")
 os.makedirs(HISTORIAL_DIR, exist_ok=True)
@@ -165,11 +275,16 @@ def api_mensaje():
         return jsonify({"error": "texto vacio"}), 400
 
     enviados = []
+    id_mensaje = buzon.nuevo_id() if buzon is not None else None
     for hid, info in HERMANAS.items():
-        buzon_path = os.path.join(BASE, info["data"], "buzon.txt")
+        data_dir = os.path.join(BASE, info["data"])
         try:
-            with open(buzon_path, "w", encoding="utf-8") as f:
-                f.write(texto)
+            if buzon is not None:
+                # Cola con id + timbre: la hermana despierta en el acto
+                buzon.enviar(data_dir, texto, id_mensaje)
+            else:
+                with open(os.path.join(data_dir, "buzon.txt"), "w", encoding="utf-8") as f:
+                    f.write(texto)
             enviados.append(hid)
         except OSError:
             pass
@@ -177,6 +292,7 @@ def api_mensaje():
     # Guardar en historial
     historial = cargar_historial()
     entrada = {
+        "id": id_mensaje,
         "ts": time.time(),
         "texto": texto,
         "enviado_a": enviados,
@@ -188,7 +304,10 @@ def api_mensaje():
     guardar_historial(historial)
 
     return jsonify({"ok": True, "enviado_a": enviados, "texto": texto,
-                    "msg_index": len(historial) - 1})
+                    "id": id_mensaje, "msg_index": len(historial) - 1})
+
+
+RESPUESTAS_RECIENTES = 20  # mensajes del historial que aun pueden recibir respuesta
 
 
 @app.route("/api/respuestas")
@@ -196,8 +315,27 @@ def api_respuestas():
     """Historial completo de conversacion con respuestas actualizadas."""
     historial = cargar_historial()
 
-    # Leer respuestas actuales de cada hermana y asociarlas al ultimo mensaje
-    if historial:
+    cambiado = False
+    # Respuestas por id: cada mensaje recibe las suyas aunque lleguen varios seguidos
+    for entrada in historial[-RESPUESTAS_RECIENTES:]:
+        if not entrada.get("id") or buzon is None:
+            continue
+        for hid in entrada.get("enviado_a", []):
+            if hid in entrada["respuestas"] or hid not in HERMANAS:
+                continue
+            info = HERMANAS[hid]
+            resp = buzon.respuesta(os.path.join(BASE, info["data"]), entrada["id"])
+            if resp:
+                entrada["respuestas"][hid] = {
+                    "nombre": info["nombre"],
+                    "color": info["color"],
+                    "texto": resp["texto"],
+                    "ts": resp["ts"],
+                }
+                cambiado = True
+
+    # Mensajes de antes del buzon con id: respuesta.txt, al ultimo mensaje
+    if historial and not historial[-1].get("id"):
         ultimo = historial[-1]
         for hid, info in HERMANAS.items():
             resp_path = os.path.join(BASE, info["data"], "respuesta.txt")
@@ -211,8 +349,11 @@ def api_respuestas():
                         "texto": texto,
                         "ts": time.time(),
                     }
+                    cambiado = True
             except (FileNotFoundError, OSError):
                 pass
+
+    if cambiado:
         # Persistir respuestas nuevas
         guardar_historial(historial)
 